@@ -57,6 +57,8 @@ class MeView(APIView):
 class UserViewSet(CompanyScopedModelViewSet):
     queryset = User.objects.all()
     permission_classes = (IsCompanyAdmin,)
+    # User changes do not bump the company data version
+    conditional_get = False
 
     def get_serializer_class(self):
         if self.action == 'list':
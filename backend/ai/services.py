@@ -4,7 +4,6 @@ import logging
 from django.conf import settings
 from django.db.models import Count, Sum, Q
 from django.utils import timezone
-from datetime import timedelta
 
 from ai.models import AIChatMessage, RoleChoices
 from ai.tools import TOOL_REGISTRY
@@ -185,12 +184,16 @@ def collect_company_context(user) -> str:
     Gather summary data about the user's company.
     Returns a formatted string with context for the AI.
     """
-    from fleet.models import Car, Fuel, Spare, Insurance, Inspection, Tires, Accumulator
+    from fleet.models import Car, Fuel, Spare, Insurance, Inspection, Tires, Accumulator, exclude_deleted_cars
 
     company = user.company
     if not company:
         return "User has no company assigned."
 
+    def records(model, **filters):
+        # Records of soft-deleted cars stay until the purge but are not shown
+        return exclude_deleted_cars(model.objects.filter(company=company, **filters), company.id)
+
     now = timezone.now()
     current_month = now.month
     current_year = now.year
@@ -220,8 +223,8 @@ def collect_company_context(user) -> str:
     parts.append("")
 
     # Fuel statistics
-    fuel_this_month = Fuel.objects.filter(
-        car__company=company,
+    fuel_this_month = records(
+        Fuel,
         month=current_month,
         year=current_year
     )
@@ -237,14 +240,14 @@ def collect_company_context(user) -> str:
         )
 
     # Overall fuel stats
-    all_fuel = Fuel.objects.filter(car__company=company)
+    all_fuel = records(Fuel)
     if all_fuel.exists():
         total_fuel = all_fuel.aggregate(
             total_liters=Sum('liters'),
             total_cost=Sum('total_cost'),
         )
-        records_with_data = Fuel.objects.filter(
-            car__company=company,
+        records_with_data = records(
+            Fuel,
             liters__gt=0,
             monthly_mileage__gt=0
         )
@@ -266,7 +269,7 @@ def collect_company_context(user) -> str:
     parts.append("")
 
     # Maintenance (spare parts)
-    spares = Spare.objects.filter(car__company=company)
+    spares = records(Spare)
     if spares.exists():
         spare_stats = spares.aggregate(
             total_parts=Sum('part_price'),
@@ -283,30 +286,30 @@ def collect_company_context(user) -> str:
     parts.append("")
 
     # Insurance
-    active_insurances = Insurance.objects.filter(car__company=company, end_date__gte=now.date())
-    expired_insurances = Insurance.objects.filter(car__company=company, end_date__lt=now.date())
+    active_insurances = records(Insurance, end_date__gte=now.date())
+    expired_insurances = records(Insurance, end_date__lt=now.date())
     parts.append(
         f"Insurance: {active_insurances.count()} active, {expired_insurances.count()} expired"
     )
 
     # Inspections
-    active_inspections = Inspection.objects.filter(
-        car__company=company,
-        inspected_at__gte=now.date() - timedelta(days=365)
+    active_inspections = records(
+        Inspection,
+        valid_until__gte=now.date()
     )
     parts.append(
         f"Inspections: {active_inspections.count()} within last year"
     )
 
     # Tires & Accumulators
-    tire_count = Tires.objects.filter(car__company=company).count()
-    acc_count = Accumulator.objects.filter(car__company=company).count()
+    tire_count = records(Tires).count()
+    acc_count = records(Accumulator).count()
     parts.append(f"Tires: {tire_count} | Accumulators: {acc_count}")
     parts.append("")
 
     # Monthly fuel breakdown (for analytics)
     monthly_fuel_rows = (
-        Fuel.objects.filter(car__company=company)
+        records(Fuel)
         .values('year', 'month')
         .annotate(
             total_liters=Sum('liters'),
@@ -327,7 +330,7 @@ def collect_company_context(user) -> str:
         parts.append("")
 
     # Recent records with IDs (for update/delete operations)
-    recent_fuel = Fuel.objects.filter(car__company=company).select_related('car').order_by('-year', '-month', '-id')[:10]
+    recent_fuel = records(Fuel).select_related('car').order_by('-year', '-month', '-id')[:10]
     if recent_fuel:
         parts.append("Recent fuel records:")
         for f in recent_fuel:
@@ -337,7 +340,7 @@ def collect_company_context(user) -> str:
             )
         parts.append("")
 
-    recent_spares = Spare.objects.filter(car__company=company).select_related('car').order_by('-installed_at', '-id')[:10]
+    recent_spares = records(Spare).select_related('car').order_by('-installed_at', '-id')[:10]
     if recent_spares:
         parts.append("Recent maintenance:")
         for s in recent_spares:
@@ -347,7 +350,7 @@ def collect_company_context(user) -> str:
             )
         parts.append("")
 
-    recent_insurance = Insurance.objects.filter(car__company=company).select_related('car').order_by('-end_date', '-id')[:10]
+    recent_insurance = records(Insurance).select_related('car').order_by('-end_date', '-id')[:10]
     if recent_insurance:
         parts.append("Recent insurance:")
         for i in recent_insurance:
@@ -357,7 +360,7 @@ def collect_company_context(user) -> str:
             )
         parts.append("")
 
-    recent_inspections = Inspection.objects.filter(car__company=company).select_related('car').order_by('-inspected_at', '-id')[:10]
+    recent_inspections = records(Inspection).select_related('car').order_by('-inspected_at', '-id')[:10]
     if recent_inspections:
         parts.append("Recent inspections:")
         for insp in recent_inspections:
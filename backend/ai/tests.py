@@ -0,0 +1,43 @@
+from django.test import TestCase, override_settings
+
+from accounts.models import User
+from companies.models import Company
+from fleet.models import Car, Fuel, Spare
+from fleet.purge import soft_delete_car
+
+from .services import collect_company_context
+from .tools import tool_delete_record, tool_update_fuel
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SoftDeletedCarTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        cls.user = User.objects.create_user(username='u', password='p', company=cls.company, role='COMPANY_ADMIN')
+        car_fields = dict(region='Бишкек', brand='Toyota', title='Camry', fueltype='Бензин', type='Легковой')
+        cls.car = Car.objects.create(company=cls.company, numplate='01KG001AAA', **car_fields)
+        cls.deleted = Car.objects.create(company=cls.company, numplate='01KG002AAA', **car_fields)
+        Fuel.objects.create(car=cls.car, year=2026, month=1, liters=10, total_cost=100, monthly_mileage=100)
+        cls.fuel = Fuel.objects.create(car=cls.deleted, year=2026, month=1, liters=70, total_cost=700, monthly_mileage=100)
+        cls.spare = Spare.objects.create(car=cls.deleted, title='Filter', part_price=300, job_price=200, installed_at='2026-01-10')
+
+    def setUp(self):
+        soft_delete_car(self.deleted)
+
+    def test_context_leaves_out_deleted_car_records(self):
+        context = collect_company_context(self.user)
+        self.assertIn('Fuel total: 1 records, 10L, cost: 100', context)
+        self.assertIn('Maintenance: 0 records', context)
+        self.assertNotIn(f'fuel_id={self.fuel.id}', context)
+        self.assertNotIn('01KG002AAA', context)
+
+    def test_tools_do_not_touch_deleted_car_records(self):
+        result = tool_update_fuel(self.user, self.company, self.fuel.id, {'liters': 5})
+        self.assertFalse(result['success'])
+        result = tool_delete_record(self.user, self.company, 'spare', self.spare.id)
+        self.assertFalse(result['success'])
+
+        self.fuel.refresh_from_db()
+        self.assertEqual(self.fuel.liters, 70)
+        self.assertTrue(Spare.objects.filter(pk=self.spare.pk).exists())
@@ -55,7 +55,8 @@ def _get_company_car(company, car_id):
 
 def _get_company_record(model, company, record_id):
     try:
-        return model.objects.get(id=record_id, car__company=company)
+        # Records of a soft-deleted car are gone for the API already
+        return model.objects.get(id=record_id, company=company, car__deleted_at__isnull=True)
     except model.DoesNotExist:
         return None
 
@@ -9,6 +9,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 
+from core.cache import stale_while_revalidate
 from core.permissions import IsCompanyMember
 from ai.models import AIConversation, AIChatMessage, RoleChoices
 from ai.serializers import (
@@ -298,6 +299,32 @@ class AIDeleteConversationView(APIView):
         return Response({'success': True}, status=status.HTTP_200_OK)
 
 
+@stale_while_revalidate('ai_suggestions')
+def _suggestion_context(company_id, day):
+    """Company figures the chat suggestions are built from."""
+    from fleet.models import Car, Fuel, Insurance, Spare, exclude_deleted_cars
+
+    return {
+        'cars': list(Car.objects.filter(company_id=company_id).values('id', 'brand', 'title', 'numplate', 'status')[:20]),
+        'expiring_insurances': exclude_deleted_cars(Insurance.objects.filter(
+            company_id=company_id,
+            end_date__gte=day,
+            end_date__lte=day + timedelta(days=30),
+        ), company_id).count(),
+        'fuel_this_month': exclude_deleted_cars(Fuel.objects.filter(
+            company_id=company_id,
+            month=day.month,
+            year=day.year,
+        ), company_id).aggregate(total=Sum('liters'))['total'],
+        'maintenance_count': exclude_deleted_cars(Spare.objects.filter(company_id=company_id), company_id).count(),
+    }
+
+
+def warm_suggestions_cache(company_id):
+    """Recompute cached suggestion data for today."""
+    _suggestion_context.refresh(company_id, timezone.now().date())
+
+
 class AISuggestionsView(APIView):
     """
     Generate dynamic chat suggestions based on the user's company data.
@@ -306,14 +333,12 @@ class AISuggestionsView(APIView):
     permission_classes = [IsAuthenticated, IsCompanyMember]
 
     def get(self, request):
-        from fleet.models import Car, Fuel, Insurance, Inspection, Spare
-
-        company = request.user.company
         now = timezone.now()
+        context = _suggestion_context(request.user.company_id, now.date())
         suggestions = []
 
         # --- Data-driven suggestions ---
-        cars = list(Car.objects.filter(company=company).values('id', 'brand', 'title', 'numplate', 'status')[:20])
+        cars = context['cars']
         total_cars = len(cars)
 
         # 1. Fleet overview
@@ -334,11 +359,7 @@ class AISuggestionsView(APIView):
             })
 
         # 3. Expiring insurance check
-        expiring_soon = Insurance.objects.filter(
-            car__company=company,
-            end_date__gte=now.date(),
-            end_date__lte=now.date() + timedelta(days=30),
-        ).count()
+        expiring_soon = context['expiring_insurances']
         if expiring_soon > 0:
             suggestions.append({
                 'text': f'Какие страховки истекают в ближайший месяц? ({expiring_soon} шт.)',
@@ -353,14 +374,7 @@ class AISuggestionsView(APIView):
             })
 
         # 4. Fuel analytics
-        current_month = now.month
-        current_year = now.year
-        fuel_this_month = Fuel.objects.filter(
-            car__company=company,
-            month=current_month,
-            year=current_year,
-        ).aggregate(total=Sum('liters'))['total']
-        if fuel_this_month:
+        if context['fuel_this_month']:
             suggestions.append({
                 'text': f'Анализ расходов на топливо за {now.strftime("%B %Y")}',
                 'icon': '📊',
@@ -383,8 +397,7 @@ class AISuggestionsView(APIView):
             })
 
         # 6. Maintenance
-        maintenance_count = Spare.objects.filter(car__company=company).count()
-        if maintenance_count > 0:
+        if context['maintenance_count'] > 0:
             suggestions.append({
                 'text': 'Покажи все расходы на ТО и запчасти',
                 'icon': '🔧',
@@ -113,8 +113,9 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
-        'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
+        # After OrderingFilter: ranks search results by relevance
+        'core.search.FuzzySearchFilter',
     ],
     'EXCEPTION_HANDLER': 'core.exceptions.custom_exception_handler',
     'UNICODE_JSON': True,
@@ -141,3 +142,28 @@ AI_SETTINGS = {
     'api_key': '',
     'model': 'llama-3.1-8b-instant',
 }
+
+# Technical inspection validity period. Inspection.valid_until is stored on save,
+# so changing this value affects new and edited inspections only.
+INSPECTION_VALIDITY_DAYS = 365
+
+# Dashboard bundle endpoint: max widgets computed in parallel (one DB connection each)
+DASHBOARD_BUNDLE_MAX_WORKERS = 4
+
+# Stale-while-revalidate cache: background refresh threads (0 = refresh inline)
+SWR_REFRESH_WORKERS = 2
+
+# Photo thumbnails / WebP variants: background rendering threads (0 = render inline on commit)
+IMAGE_VARIANT_WORKERS = 2
+
+# Delta sync (GET /api/v1/sync/): changes younger than the settle window wait for the
+# next sync; tokens older than the tombstone retention get a full resync
+SYNC_SETTLE_SECONDS = 5
+SYNC_TOMBSTONE_RETENTION_DAYS = 30
+
+# Soft-deleted cars: background purge threads (0 = purge inline on commit)
+CAR_PURGE_WORKERS = 1
+
+# Tracker telemetry: when on, monthly distance overwrites Fuel.monthly_mileage of the months it covers,
+# including hand-entered values (off by default; turn on for fleets whose mileage comes from trackers only)
+TELEMETRY_FEEDS_FUEL_MILEAGE = False
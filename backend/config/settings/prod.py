@@ -23,6 +23,13 @@ DATABASES = {
     }
 }
 
+# Cache - shared by all worker processes and management commands (data versions,
+# dashboard and report caches, warm_dashboard_cache). Database table by default,
+# e.g. CACHE_URL=redis://redis:6379/1 for Redis (requires the redis package)
+CACHES = {
+    'default': env.cache('CACHE_URL', default='dbcache://django_cache_table?max_entries=20000&cull_frequency=3'),
+}
+
 # Security settings
 SECURE_SSL_REDIRECT = True
 SESSION_COOKIE_SECURE = True
@@ -0,0 +1,190 @@
+"""
+Версионирование кэша по компаниям.
+
+Каждая компания имеет счетчик версии данных, который увеличивается при любом
+изменении записей автопарка. Версия входит в ключ кэша, поэтому после записи
+старые значения просто перестают читаться, а неизмененные компании не
+пересчитываются до истечения (длинного) TTL.
+
+Декоратор stale_while_revalidate хранит версию внутри записи: значение
+другой версии считается промахом и пересчитывается в запросе. После истечения
+срока свежести при той же версии запрос получает прежнее значение, а пересчет
+выполняет один фоновый воркер под кэш-блокировкой.
+"""
+import functools
+import hashlib
+import logging
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Data is invalidated by version bumps, TTL only bounds the memory footprint
+VERSIONED_CACHE_TTL = 60 * 60 * 24
+
+
+def _version_key(company_id: int) -> str:
+    return f'company_data_version_{company_id}'
+
+
+def _initial_version() -> int:
+    # Time-based start value: if the counter is evicted, the new one will not
+    # collide with versions still present in older cache keys.
+    return int(time.time() * 1000)
+
+
+def get_data_version(company_id: int) -> int:
+    """Return current data version of a company (initializing it if missing)."""
+    key = _version_key(company_id)
+    version = cache.get(key)
+    if version is None:
+        version = _initial_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_data_version(company_id: int) -> int:
+    """Invalidate all versioned caches of a company."""
+    key = _version_key(company_id)
+    version = cache.get(key)
+    # Monotonic and close to the time of the change (in ms), so the version
+    # also serves as Last-Modified. cache.incr() on some backends resets the
+    # timeout, so set it explicitly.
+    version = max(version + 1, _initial_version()) if version is not None else _initial_version()
+    cache.set(key, version, None)
+    return version
+
+
+def bump_data_version_on_commit(company_id: int) -> None:
+    """
+    Bump the version once the current transaction commits (at once outside of one).
+
+    A bump before the commit lets a concurrent reader cache pre-commit rows
+    under the new version, where they would stay until the next write.
+    """
+    transaction.on_commit(lambda: bump_data_version(company_id))
+
+
+def company_cache_key(prefix: str, company_id: int, *parts) -> str:
+    """Build a cache key bound to the current data version of the company."""
+    key = f'{prefix}_{company_id}_v{get_data_version(company_id)}'
+    if parts:
+        key += '_' + '_'.join(str(part) for part in parts)
+    return key
+
+
+_refresh_executor = None
+_refresh_executor_lock = threading.Lock()
+
+
+def _get_refresh_executor():
+    """Shared pool for background refreshes (None means refresh inline)."""
+    global _refresh_executor
+    workers = getattr(settings, 'SWR_REFRESH_WORKERS', 2)
+    if workers <= 0:
+        return None
+    with _refresh_executor_lock:
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='swr-refresh')
+    return _refresh_executor
+
+
+def _swr_key(prefix: str, company_id: int, args, kwargs) -> str:
+    parts = [*args[1:], *sorted((k, v) for k, v in kwargs.items() if k != 'company_id')]
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f'swr_{prefix}_{company_id}_{digest}'
+
+
+def _store(func, args, kwargs, key, company_id, fresh_for, keep_for):
+    # Version is read before computing: a write during the computation
+    # leaves the entry outdated, so the next read refreshes it again.
+    version = get_data_version(company_id)
+    started = time.monotonic()
+    value = func(*args, **kwargs)
+    entry = {
+        'value': value,
+        'version': version,
+        'fresh_until': time.time() + fresh_for,
+        'delta': time.monotonic() - started,
+    }
+    cache.set(key, entry, fresh_for + keep_for)
+    return value
+
+
+def _is_stale(entry, beta) -> bool:
+    # Probabilistic early expiration (XFetch): the closer fresh_until is and
+    # the slower the computation, the more likely an early refresh.
+    jitter = -entry['delta'] * beta * math.log(1.0 - random.random())
+    return time.time() + jitter >= entry['fresh_until']
+
+
+def _schedule_refresh(func, args, kwargs, key, company_id, fresh_for, keep_for, lock_timeout):
+    lock_key = f'{key}_lock'
+    if not cache.add(lock_key, 1, lock_timeout):
+        return  # Another worker is already refreshing
+
+    executor = _get_refresh_executor()
+
+    def refresh():
+        try:
+            _store(func, args, kwargs, key, company_id, fresh_for, keep_for)
+        except Exception:
+            logger.exception(f"Background refresh of {key} failed")
+        finally:
+            cache.delete(lock_key)
+            if executor is not None:
+                connections.close_all()
+
+    if executor is None:
+        refresh()
+    else:
+        executor.submit(refresh)
+
+
+def stale_while_revalidate(prefix: str, *, fresh_for: int = 300, keep_for: int = VERSIONED_CACHE_TTL,
+                           beta: float = 1.0, lock_timeout: int = 60):
+    """
+    Cache a per-company computation, serving stale values while refreshing.
+
+    The decorated function takes ``company_id`` as its first positional or
+    keyword argument; the remaining arguments form the cache key. A value
+    computed for another company data version is a miss and is recomputed in
+    the request thread. Otherwise it is fresh for ``fresh_for`` seconds; after
+    that (or on an early probabilistic expiry) it is still returned for up to
+    ``keep_for`` seconds while a single background recompute runs, guarded by
+    a cache lock.
+
+    ``func.refresh(...)`` recomputes and stores the value unconditionally
+    (used by the cache warmer).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            company_id = kwargs['company_id'] if 'company_id' in kwargs else args[0]
+            key = _swr_key(prefix, company_id, args, kwargs)
+
+            entry = cache.get(key)
+            if entry is None or entry['version'] != get_data_version(company_id):
+                return _store(func, args, kwargs, key, company_id, fresh_for, keep_for)
+
+            if _is_stale(entry, beta):
+                _schedule_refresh(func, args, kwargs, key, company_id, fresh_for, keep_for, lock_timeout)
+            return entry['value']
+
+        def refresh(*args, **kwargs):
+            company_id = kwargs['company_id'] if 'company_id' in kwargs else args[0]
+            key = _swr_key(prefix, company_id, args, kwargs)
+            return _store(func, args, kwargs, key, company_id, fresh_for, keep_for)
+
+        wrapper.uncached = func
+        wrapper.refresh = refresh
+        return wrapper
+    return decorator
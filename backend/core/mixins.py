@@ -1,4 +1,18 @@
+import hashlib
+from datetime import datetime, time
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from rest_framework import mixins
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+
+from .cache import get_data_version
+from .serializers import SparseFieldsetSerializerMixin
 
 class CompanyFilterMixin:
     """
@@ -13,6 +27,8 @@ class CompanyFilterMixin:
                 return queryset
 
             field_names = {f.name for f in model._meta.get_fields()}
+            if 'car' in field_names:
+                queryset = self._exclude_deleted_cars(queryset, model, user.company_id)
             if 'company' in field_names:
                 return queryset.filter(company_id=user.company_id)
             if 'car' in field_names:
@@ -20,3 +36,151 @@ class CompanyFilterMixin:
 
             return queryset
         return queryset.none()
+
+    @staticmethod
+    def _exclude_deleted_cars(queryset, model, company_id):
+        """Hide records of soft-deleted cars until the background purge removes them."""
+        car_model = model._meta.get_field('car').related_model
+        if car_model is None or not any(field.name == 'deleted_at' for field in car_model._meta.fields):
+            return queryset
+        deleted = car_model._base_manager.filter(company_id=company_id, deleted_at__isnull=False)
+        return queryset.exclude(car__in=deleted.values('pk'))
+
+
+class SparseFieldsetMixin:
+    """
+    Sparse fieldsets and related includes for list / retrieve.
+
+    ``?fields=id,numplate`` trims the serializer (if it supports it) and
+    loads only the matching columns with ``.only()``.
+    ``?include=insurances,fuel_records`` adds related collections listed in
+    ``include_relations`` (name -> (serializer class, queryset)), loaded with
+    one prefetch query per relation.
+    """
+    fields_param = 'fields'
+    include_param = 'include'
+    include_relations = {}
+
+    def _requested_names(self, param):
+        if self.request.method not in ('GET', 'HEAD') or self.action not in ('list', 'retrieve'):
+            return None
+        value = self.request.query_params.get(param)
+        if not value:
+            return None
+        return list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+
+    @cached_property
+    def sparse_fields(self):
+        names = self._requested_names(self.fields_param)
+        serializer_class = self.get_serializer_class()
+        if names is None or not issubclass(serializer_class, SparseFieldsetSerializerMixin):
+            return None
+        unknown = set(names) - set(serializer_class.field_names())
+        if unknown:
+            raise ValidationError({self.fields_param: f"Unknown fields: {', '.join(sorted(unknown))}"})
+        return names
+
+    @cached_property
+    def included_relations(self):
+        names = self._requested_names(self.include_param) or []
+        unknown = set(names) - set(self.include_relations)
+        if unknown:
+            raise ValidationError({self.include_param: f"Unknown relations: {', '.join(sorted(unknown))}"})
+        return names
+
+    def _prune_columns(self, queryset, fields):
+        """``.only()`` the columns behind the selected fields (unchanged if any is not a plain column)."""
+        model = queryset.model
+        columns = {model._meta.pk.name}
+        relations = set()
+        for field in self.get_serializer_class()(fields=fields).fields.values():
+            parts = field.source.split('.')
+            try:
+                model_field = model._meta.get_field(parts[0])
+            except FieldDoesNotExist:
+                return queryset
+            if not model_field.concrete or len(parts) > 2 or (len(parts) == 2 and not model_field.is_relation):
+                return queryset
+            columns.add(parts[0])
+            if len(parts) == 2:
+                columns.add('__'.join(parts))
+                relations.add(parts[0])
+
+        # Keep ordering columns loaded (keyset pagination reads them back)
+        ordering = OrderingFilter().get_ordering(self.request, queryset, self) or ()
+        for name in ordering:
+            name = name.lstrip('-')
+            try:
+                if model._meta.get_field(name).concrete:
+                    columns.add(name)
+            except FieldDoesNotExist:
+                pass
+        return queryset.select_related(None).select_related(*relations).only(*columns)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.sparse_fields:
+            queryset = self._prune_columns(queryset, self.sparse_fields)
+        for name in self.included_relations:
+            _, related_queryset = self.include_relations[name]
+            queryset = queryset.prefetch_related(Prefetch(name, queryset=related_queryset))
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if self.sparse_fields:
+            kwargs['fields'] = self.sparse_fields
+        if self.included_relations:
+            kwargs['include'] = {
+                name: (self.include_relations[name][0], name) for name in self.included_relations
+            }
+        return super().get_serializer(*args, **kwargs)
+
+
+class ConditionalGetMixin:
+    """
+    Conditional GET (ETag / Last-Modified) по версии данных компании.
+
+    Версия меняется при любом изменении автопарка компании, поэтому пока
+    данные не менялись, запрос с If-None-Match / If-Modified-Since получает
+    304 Not Modified без выполнения view и сериализации.
+    """
+    conditional_get = True
+    # Response also depends on the current date (expiry windows, current month)
+    conditional_daily = False
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._conditional = None
+
+        user = request.user
+        if not self.conditional_get or request.method not in ('GET', 'HEAD'):
+            return
+        if not user.is_authenticated or user.company_id is None:
+            return
+
+        version = get_data_version(user.company_id)
+        last_modified = version // 1000
+        parts = [user.company_id, version, request.get_full_path(), request.headers.get('Accept', '')]
+        if self.conditional_daily:
+            today = timezone.localdate()
+            parts.append(today.isoformat())
+            start_of_day = timezone.make_aware(datetime.combine(today, time.min))
+            last_modified = max(last_modified, int(start_of_day.timestamp()))
+
+        etag = '"%s"' % hashlib.md5(repr(parts).encode()).hexdigest()
+        self._conditional = (etag, last_modified)
+
+        conditional_response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if conditional_response is not None:
+            # Skip the handler: the client copy is still current
+            setattr(self, request.method.lower(), lambda *args, **kwargs: conditional_response)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        conditional = getattr(self, '_conditional', None)
+        if conditional and response.status_code in (200, 304):
+            etag, last_modified = conditional
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
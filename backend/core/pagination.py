@@ -1,5 +1,160 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import hashlib
+import json
+from functools import reduce
+from operator import attrgetter, or_
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .cache import company_cache_key
+
+# Counts are also invalidated by the company data version
+PAGINATION_COUNT_CACHE_TTL = 5 * 60
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over the view ordering.
+
+    The cursor holds the ordering values of the last row of the page, and the
+    next page is ``WHERE (ordering) > (cursor) LIMIT n``: no OFFSET and no
+    COUNT(*), so every page costs the same at any depth. Works with composite
+    orderings with mixed directions, e.g. ``['-installed_at', '-id']``; the
+    primary key is appended as a tie-breaker when missing. NULLs sort last.
+
+    ``?count=exact`` adds a total count cached per company data version,
+    ``?count=estimate`` uses the planner estimate on PostgreSQL.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        for backend in getattr(view, 'filter_backends', ()):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        ordering = list(ordering or queryset.query.order_by or queryset.model._meta.ordering or ['-pk'])
+        if not any(field.lstrip('-') in ('pk', 'id') for field in ordering):
+            ordering.append('-pk' if ordering[0].startswith('-') else 'pk')
+        return ordering
+
+    @staticmethod
+    def _resolve(model, path):
+        """Model field and instance attribute path of an ordering lookup."""
+        names = path.split('__')
+        for name in names[:-1]:
+            model = model._meta.get_field(name).related_model
+        field = model._meta.pk if names[-1] == 'pk' else model._meta.get_field(names[-1])
+        return field, '.'.join([*names[:-1], field.attname])
+
+    def _encode_cursor(self, values):
+        raw = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def _decode_cursor(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            if len(values) != len(self.keys):
+                raise ValueError
+            return [
+                None if value is None else field.to_python(value)
+                for (_, field, _, _), value in zip(self.keys, values)
+            ]
+        except Exception:
+            raise ValidationError({'cursor': 'Invalid cursor'})
+
+    def _after(self, values):
+        """Rows strictly after the cursor position in the (NULLS LAST) ordering."""
+        clauses = []
+        equal = Q()
+        for (lookup, field, _, descending), value in zip(self.keys, values):
+            if value is None:
+                # Nothing sorts after NULL on this level
+                equal &= Q(**{f'{lookup}__isnull': True})
+                continue
+            after = Q(**{f'{lookup}__{"lt" if descending else "gt"}': value})
+            if field.null:
+                after |= Q(**{f'{lookup}__isnull': True})
+            clauses.append(equal & after)
+            equal &= Q(**{lookup: value})
+        # The primary key is never NULL, so there is at least one clause
+        return reduce(or_, clauses)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.keys = []
+        order_by = []
+        for item in self.get_ordering(request, queryset, view):
+            lookup = item.lstrip('-')
+            field, attr = self._resolve(queryset.model, lookup)
+            descending = item.startswith('-')
+            self.keys.append((lookup, field, attrgetter(attr), descending))
+            expression = F(lookup)
+            order_by.append(expression.desc(nulls_last=True) if descending else expression.asc(nulls_last=True))
+
+        self.count = self.get_count(queryset, request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self._after(self._decode_cursor(cursor)))
+
+        rows = list(queryset.order_by(*order_by)[:self.page_size + 1])
+        self.next_cursor = None
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            self.next_cursor = self._encode_cursor([get(rows[-1]) for _, _, get, _ in self.keys])
+        return rows
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if not mode:
+            return None
+        queryset = queryset.order_by()
+        try:
+            if mode == 'estimate' and connections[queryset.db].vendor == 'postgresql':
+                plan = json.loads(queryset.explain(format='json'))
+                return int(plan[0]['Plan']['Plan Rows'])
+            digest = hashlib.md5(str(queryset.query).encode()).hexdigest()
+        except EmptyResultSet:
+            # .none() or a filter that can match nothing (e.g. pk__in=[]) compiles to no SQL
+            return 0
+
+        key = company_cache_key('page_count', getattr(request.user, 'company_id', None), digest)
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, PAGINATION_COUNT_CACHE_TTL)
+        return count
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'results': data,
+            'page_size': self.page_size,
+        }
+        if self.count is not None:
+            payload['count'] = self.count
+        return Response(payload)
 
 
 class CustomPagination(PageNumberPagination):
@@ -8,8 +163,19 @@ class CustomPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
     page_query_param = 'page'
+    # ?cursor= (empty for the first page) switches to keyset pagination
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination(self.get_page_size(request))
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
 
     def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
         return Response({
             'count': self.page.paginator.count,
             'next': self.get_next_link(),
@@ -79,3 +79,15 @@ class StandardJSONRenderer(JSONRenderer):
             indent=None,
             separators=(',', ':')
         ).encode('utf-8')
+
+
+class NDJSONRenderer(StandardJSONRenderer):
+    """
+    Newline-delimited JSON for streaming exports.
+
+    Successful responses are streamed by the view itself; this renderer only
+    makes ``Accept: application/x-ndjson`` negotiable and renders errors in
+    the standard envelope.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
@@ -0,0 +1,142 @@
+"""
+Индексированный нечеткий поиск.
+
+PostgreSQL: GIN-индексы pg_trgm по полям поиска, фильтр ILIKE / word
+similarity (оба используют индекс) и ранжирование по сходству.
+SQLite (локальная разработка): внешняя FTS5-таблица с trigram-токенизатором,
+синхронизируемая триггерами, ранжирование по bm25.
+Для моделей без индекса поиск работает как обычный SearchFilter.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import connections
+from django.db.models import F, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+# Model -> indexed text fields (filled by register_search_index)
+SEARCH_INDEXES = {}
+
+# The trigram tokenizer does not match shorter terms
+FTS5_MIN_TERM_LENGTH = 3
+
+_fts5_tables = {}
+
+
+def register_search_index(model, fields) -> None:
+    SEARCH_INDEXES[model] = tuple(fields)
+
+
+def fts5_table(model) -> str:
+    return f'{model._meta.db_table}_search'
+
+
+def install_fts5_indexes(using='default') -> None:
+    """
+    Create the SQLite FTS5 tables and sync triggers (idempotent).
+
+    Run after every migrate: SQLite rebuilds a table on most ALTERs, which
+    drops its triggers, so they are recreated here rather than in a migration.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for model, fields in SEARCH_INDEXES.items():
+            table = model._meta.db_table
+            search = fts5_table(model)
+            columns = ', '.join(fields)
+            new_values = ', '.join(f'new.{field}' for field in fields)
+            old_values = ', '.join(f'old.{field}' for field in fields)
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {search} USING fts5("
+                f"{columns}, content='{table}', content_rowid='id', tokenize='trigram')"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {search}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {search}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {search}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {search}({search}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {search}_au AFTER UPDATE ON {table} BEGIN "
+                f"INSERT INTO {search}({search}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+                f"INSERT INTO {search}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+            )
+            cursor.execute(f"INSERT INTO {search}({search}) VALUES ('rebuild')")
+    _fts5_tables.pop(using, None)
+
+
+def _has_fts5_table(using, model) -> bool:
+    if using not in _fts5_tables:
+        with connections[using].cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%\\_search' ESCAPE '\\'")
+            _fts5_tables[using] = {row[0] for row in cursor.fetchall()}
+    return fts5_table(model) in _fts5_tables[using]
+
+
+class FuzzySearchFilter(SearchFilter):
+    """
+    ``?search=`` over indexed fields, ranked by relevance.
+
+    Must come after OrderingFilter: without an explicit ``?ordering=`` the
+    results are ordered by ``search_rank`` first, then by the view ordering.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        fields = SEARCH_INDEXES.get(queryset.model)
+        terms = self.get_search_terms(request)
+        if not fields or not terms:
+            return super().filter_queryset(request, queryset, view)
+
+        vendor = connections[queryset.db].vendor
+        if vendor == 'postgresql':
+            queryset = self._trigram_search(queryset, fields, terms)
+        elif vendor == 'sqlite' and _has_fts5_table(queryset.db, queryset.model):
+            queryset = self._fts5_search(queryset, fields, terms)
+        else:
+            return super().filter_queryset(request, queryset, view)
+
+        if api_settings.ORDERING_PARAM not in request.query_params:
+            ordering = queryset.query.order_by or queryset.model._meta.ordering
+            queryset = queryset.order_by('-search_rank', *ordering)
+        return queryset
+
+    def _trigram_search(self, queryset, fields, terms):
+        from django.contrib.postgres.lookups import TrigramWordSimilar
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        for term in terms:
+            # Both ILIKE and %> are served by the gin_trgm_ops indexes
+            queryset = queryset.filter(reduce(or_, (
+                Q(**{f'{field}__icontains': term}) | Q(TrigramWordSimilar(F(field), Value(term)))
+                for field in fields
+            )))
+        similarities = [TrigramWordSimilarity(Value(' '.join(terms)), field) for field in fields]
+        rank = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+        return queryset.annotate(search_rank=rank)
+
+    def _fts5_search(self, queryset, fields, terms):
+        table = queryset.model._meta.db_table
+        search = fts5_table(queryset.model)
+        long_terms = [term for term in terms if len(term) >= FTS5_MIN_TERM_LENGTH]
+        for term in terms:
+            if len(term) < FTS5_MIN_TERM_LENGTH:
+                queryset = queryset.filter(reduce(or_, (Q(**{f'{field}__icontains': term}) for field in fields)))
+        if not long_terms:
+            return queryset.annotate(search_rank=Value(0.0))
+
+        match = ' '.join('"{}"'.format(term.replace('"', '""')) for term in long_terms)
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {search} WHERE {search} MATCH %s', [match]),
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT -bm25({search}) FROM {search} WHERE {search} MATCH %s AND rowid = {table}.id',
+                [match],
+            ),
+        )
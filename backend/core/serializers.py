@@ -0,0 +1,33 @@
+from rest_framework import serializers
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Serializer that can be trimmed to a subset of its fields.
+
+    ``fields`` (iterable of field names) keeps only those fields;
+    ``include`` maps extra keys to ``(serializer_class, attribute)`` pairs for
+    related collections that the view has prefetched.
+    """
+
+    def __init__(self, *args, fields=None, include=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        self._include = include or {}
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        for name, (serializer_class, attribute) in self._include.items():
+            data[name] = serializer_class(getattr(instance, attribute).all(), many=True, context=self.context).data
+        return data
+
+    @classmethod
+    def field_names(cls):
+        """Names of all fields (for validating ``?fields=``)."""
+        return list(cls().fields)
+
+
+class SparseFieldsetModelSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    pass
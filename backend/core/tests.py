@@ -1,3 +1,263 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from accounts.models import User
+
+from companies.models import Company
+from fleet.models import Car, Fuel, Spare
+
+from .cache import bump_data_version, company_cache_key, stale_while_revalidate
+from .pagination import KeysetPagination
+
+
+class CompanyDataVersionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        cls.other = Company.objects.create(name='Other Fleet', slug='other-fleet')
+
+    def test_fleet_writes_change_cache_key(self):
+        key = company_cache_key('dashboard_stats', self.company.id)
+        other_key = company_cache_key('dashboard_stats', self.other.id)
+        self.assertEqual(company_cache_key('dashboard_stats', self.company.id), key)
+
+        # The version is bumped when the write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            car = Car.objects.create(
+                company=self.company, region='Бишкек', brand='Toyota', title='Camry',
+                numplate='01KG001AAA', fueltype='Бензин', type='Легковой',
+            )
+            self.assertEqual(company_cache_key('dashboard_stats', self.company.id), key)
+        after_car = company_cache_key('dashboard_stats', self.company.id)
+        self.assertNotEqual(after_car, key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            fuel = Fuel.objects.create(car=car, year=2026, month=1, liters=10, total_cost=100, monthly_mileage=100)
+        after_fuel = company_cache_key('dashboard_stats', self.company.id)
+        self.assertNotEqual(after_fuel, after_car)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            fuel.delete()
+        self.assertNotEqual(company_cache_key('dashboard_stats', self.company.id), after_fuel)
+        self.assertEqual(company_cache_key('dashboard_stats', self.other.id), other_key)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    SWR_REFRESH_WORKERS=0,
+)
+class StaleWhileRevalidateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+
+        @stale_while_revalidate('test_swr', fresh_for=60)
+        def compute(company_id, suffix):
+            self.calls.append(company_id)
+            return f'{len(self.calls)}-{suffix}'
+
+        self.compute = compute
+
+    def test_fresh_value_is_cached(self):
+        self.assertEqual(self.compute(1, 'a'), '1-a')
+        self.assertEqual(self.compute(1, 'a'), '1-a')
+        self.assertEqual(self.compute(1, 'b'), '2-b')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_data_change_is_a_miss(self):
+        self.compute(1, 'a')
+        bump_data_version(1)
+
+        # Computed in the request even when a refresh is already running
+        with mock.patch('core.cache.cache.add', return_value=False):
+            self.assertEqual(self.compute(1, 'a'), '2-a')
+        self.assertEqual(self.compute(1, 'a'), '2-a')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_expired_value_served_while_refreshing(self):
+        self.compute(1, 'a')
+
+        with mock.patch('core.cache.time.time', return_value=time.time() + 61):
+            self.assertEqual(self.compute(1, 'a'), '1-a')
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.compute(1, 'a'), '2-a')
+
+    def test_locked_refresh_is_skipped(self):
+        self.compute(1, 'a')
+
+        with mock.patch('core.cache.time.time', return_value=time.time() + 61), \
+                mock.patch('core.cache.cache.add', return_value=False):
+            self.assertEqual(self.compute(1, 'a'), '1-a')
+        self.assertEqual(len(self.calls), 1)
+
+    def test_early_probabilistic_refresh(self):
+        compute = stale_while_revalidate('test_swr_early', fresh_for=60, beta=1e12)(self.compute.uncached)
+        compute(1, 'a')
+
+        # random() -> 0 gives no jitter: the value is still fresh
+        with mock.patch('core.cache.random.random', return_value=0.0):
+            compute(1, 'a')
+        self.assertEqual(len(self.calls), 1)
+
+        # random() -> 1 makes the jitter huge: refresh ahead of expiry
+        with mock.patch('core.cache.random.random', return_value=1.0 - 1e-12):
+            compute(1, 'a')
+        self.assertEqual(len(self.calls), 2)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    SWR_REFRESH_WORKERS=0,
+)
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        cls.user = User.objects.create_user(username='u', password='p', company=cls.company)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _create_car(self, numplate):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Car.objects.create(
+                company=self.company, region='Бишкек', brand='Toyota', title='Camry',
+                numplate=numplate, fueltype='Бензин', type='Легковой',
+            )
+
+    def test_list_not_modified_until_data_changes(self):
+        self._create_car('01KG001AAA')
+        response = self.client.get('/api/v1/cars/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/cars/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        self._create_car('01KG002AAA')
+        response = self.client.get('/api/v1/cars/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_only_after_commit(self):
+        self._create_car('01KG001AAA')
+        etag = self.client.get('/api/v1/cars/')['ETag']
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                Car.objects.create(
+                    company=self.company, region='Бишкек', brand='Toyota', title='Camry',
+                    numplate='01KG002AAA', fueltype='Бензин', type='Легковой',
+                )
+                # A reader during the transaction still gets the committed version
+                response = self.client.get('/api/v1/cars/', HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+        response = self.client.get('/api/v1/cars/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        for callback in callbacks:
+            callback()
+        response = self.client.get('/api/v1/cars/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_dashboard_reflects_data_change(self):
+        self._create_car('01KG001AAA')
+        response = self.client.get('/api/v1/dashboard/stats/')
+        self.assertEqual(response.json()['data']['total_cars'], 1)
+        etag = response['ETag']
+
+        self._create_car('01KG002AAA')
+        response = self.client.get('/api/v1/dashboard/stats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['total_cars'], 2)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        cls.user = User.objects.create_user(username='u', password='p', company=cls.company, role='COMPANY_ADMIN')
+        car_fields = dict(region='Бишкек', brand='Toyota', title='Camry', fueltype='Бензин', type='Легковой')
+        cls.car = Car.objects.create(company=cls.company, numplate='01KG001AAA', year=2015, **car_fields)
+        for index, year in enumerate([None, 2018, 2015, None, 2020]):
+            Car.objects.create(company=cls.company, numplate=f'01KG10{index}BBB', year=year, **car_fields)
+        for day in [10, 12, 10, 11, 10, 12, 9]:
+            Spare.objects.create(car=cls.car, title='Filter', part_price=300, job_price=200, installed_at=f'2026-01-{day:02d}')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _walk(self, url):
+        ids = []
+        response = self.client.get(url)
+        while True:
+            data = response.json()['data']
+            self.assertNotIn('previous', data)
+            ids.extend(row['id'] for row in data['results'])
+            if data['next'] is None:
+                return ids, data
+            response = self.client.get(data['next'])
+
+    def test_walks_composite_ordering(self):
+        expected = list(Spare.objects.order_by('-installed_at', '-id').values_list('id', flat=True))
+        ids, _ = self._walk('/api/v1/spares/?cursor=&page_size=3')
+        self.assertEqual(ids, expected)
+
+    def test_nullable_ordering_field(self):
+        expected = [
+            car.id for car in sorted(Car.objects.all(), key=lambda car: (car.year is None, car.year or 0, car.id))
+        ]
+        factory = APIRequestFactory()
+        ids, cursor = [], ''
+        while cursor is not None:
+            request = Request(factory.get('/', {'cursor': cursor}))
+            paginator = KeysetPagination(page_size=2)
+            ids.extend(car.id for car in paginator.paginate_queryset(Car.objects.order_by('year'), request))
+            cursor = paginator.next_cursor
+        self.assertEqual(ids, expected)
+
+    def test_count_of_empty_queryset(self):
+        factory = APIRequestFactory()
+        for mode in ('exact', 'estimate'):
+            for queryset in (Car.objects.none(), Car.objects.filter(pk__in=[])):
+                paginator = KeysetPagination(page_size=2)
+                request = Request(factory.get('/', {'cursor': '', 'count': mode}))
+                self.assertEqual(paginator.paginate_queryset(queryset.order_by('year'), request), [])
+                self.assertEqual(paginator.count, 0)
+
+    def test_no_count_query_unless_requested(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/spares/?cursor=&page_size=3')
+        self.assertNotIn('count', response.json()['data'])
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+
+        response = self.client.get('/api/v1/spares/?cursor=&page_size=3&count=exact')
+        self.assertEqual(response.json()['data']['count'], 7)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/spares/?cursor=&page_size=3&count=exact')
+        self.assertEqual(response.json()['data']['count'], 7)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/spares/?cursor=bogus')
+        self.assertEqual(response.status_code, 400)
+
+    def test_page_mode_unchanged(self):
+        data = self.client.get('/api/v1/spares/?page_size=3&page=2').json()['data']
+        self.assertEqual((data['count'], data['page'], data['total_pages']), (7, 2, 3))
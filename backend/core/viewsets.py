@@ -1,9 +1,14 @@
 from rest_framework import viewsets
 
-from .mixins import CompanyFilterMixin
+from .mixins import CompanyFilterMixin, ConditionalGetMixin, SparseFieldsetMixin
 
 
-class CompanyScopedModelViewSet(CompanyFilterMixin, viewsets.ModelViewSet):
-    """Базовый ModelViewSet с автоматической фильтрацией queryset по company текущего пользователя."""
+class CompanyScopedModelViewSet(ConditionalGetMixin, SparseFieldsetMixin, CompanyFilterMixin, viewsets.ModelViewSet):
+    """
+    Базовый ModelViewSet с автоматической фильтрацией queryset по company текущего пользователя.
+
+    GET-запросы поддерживают ETag / 304 по версии данных компании, а также
+    ?fields= и ?include= (см. SparseFieldsetMixin).
+    """
 
     pass
@@ -0,0 +1,66 @@
+"""Precompute dashboard and AI suggestion caches for active companies"""
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ai.views import warm_suggestions_cache
+from companies.models import Company
+from dashboard.views import warm_dashboard_cache
+
+
+def _warm_company(company_id):
+    started = time.monotonic()
+    try:
+        warm_dashboard_cache(company_id)
+        warm_suggestions_cache(company_id)
+    finally:
+        connections.close_all()
+    return time.monotonic() - started
+
+
+class Command(BaseCommand):
+    help = 'Warm dashboard stats, cost by month, expiring items and AI suggestions caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, action='append', default=None,
+                            help='Company ID to warm (repeatable, default: all active)')
+        parser.add_argument('--concurrency', type=int, default=4, help='Companies warmed in parallel')
+        parser.add_argument('--loop', action='store_true', help='Keep running and re-warm every --interval seconds')
+        parser.add_argument('--interval', type=int, default=300, help='Seconds between runs in --loop mode')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                self._warm_all(options['company'], max(options['concurrency'], 1))
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped')
+
+    def _warm_all(self, company_ids, concurrency):
+        companies = Company.objects.filter(is_active=True)
+        if company_ids:
+            companies = companies.filter(id__in=company_ids)
+        company_ids = list(companies.values_list('id', flat=True))
+
+        started = time.monotonic()
+        failed = 0
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='cache-warmer') as executor:
+            futures = {executor.submit(_warm_company, company_id): company_id for company_id in company_ids}
+            for future in as_completed(futures):
+                company_id = futures[future]
+                try:
+                    elapsed = future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(self.style.ERROR(f'Company {company_id}: failed ({exc})'))
+                else:
+                    self.stdout.write(f'Company {company_id}: {elapsed:.2f}s')
+
+        total = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Warmed {len(company_ids) - failed}/{len(company_ids)} companies in {total:.2f}s'
+        ))
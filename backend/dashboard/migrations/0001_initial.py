@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('fleet', '0008_auto_20260402_2340'),
+        ('companies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('car_numplate', models.CharField(blank=True, max_length=20)),
+                ('event_type', models.CharField(choices=[('fuel', 'Fuel'), ('maintenance', 'Maintenance'), ('car_added', 'Car added'), ('car_edited', 'Car edited')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField(help_text='ID of the source record')),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('cost', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('car', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activity_events', to='fleet.car')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_events', to='companies.company')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['company', '-created_at', '-id'], name='dashboard_a_company_7650bf_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+from datetime import datetime, time
+
+from django.db import migrations
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def _car_events(Car, ActivityEvent):
+    for car in Car.objects.all().iterator(chunk_size=BATCH_SIZE):
+        yield ActivityEvent(
+            company_id=car.company_id,
+            car_id=car.id,
+            car_numplate=car.numplate,
+            event_type='car_added',
+            object_id=car.id,
+            title=f"Vehicle added: {car.brand} {car.title or ''}",
+            description=f"VIN: {car.vin or 'N/A'}",
+            cost=0,
+            created_at=car.created_at,
+        )
+
+
+def _fuel_events(Fuel, ActivityEvent):
+    for fuel in Fuel.objects.select_related('car').iterator(chunk_size=BATCH_SIZE):
+        yield ActivityEvent(
+            company_id=fuel.car.company_id,
+            car_id=fuel.car_id,
+            car_numplate=fuel.car.numplate,
+            event_type='fuel',
+            object_id=fuel.id,
+            title=f"Fuel: {fuel.month_name} {fuel.year}",
+            description=f"{fuel.liters}L - {fuel.total_cost} с.",
+            cost=fuel.total_cost or 0,
+            created_at=fuel.created_at,
+        )
+
+
+def _spare_events(Spare, ActivityEvent):
+    for spare in Spare.objects.select_related('car').iterator(chunk_size=BATCH_SIZE):
+        yield ActivityEvent(
+            company_id=spare.car.company_id,
+            car_id=spare.car_id,
+            car_numplate=spare.car.numplate,
+            event_type='maintenance',
+            object_id=spare.id,
+            title=f"Maintenance: {spare.title}",
+            description=f"Parts: {spare.part_price} с. + Labor: {spare.job_price} с.",
+            cost=(spare.part_price or 0) + (spare.job_price or 0),
+            # Same as the feed before the log: maintenance is dated by the installation day
+            created_at=timezone.make_aware(datetime.combine(spare.installed_at, time.min)),
+        )
+
+
+def backfill_activity_events(apps, schema_editor):
+    """Seed the activity log from existing cars, fuel and spare records."""
+    ActivityEvent = apps.get_model('dashboard', 'ActivityEvent')
+    sources = (
+        _car_events(apps.get_model('fleet', 'Car'), ActivityEvent),
+        _fuel_events(apps.get_model('fleet', 'Fuel'), ActivityEvent),
+        _spare_events(apps.get_model('fleet', 'Spare'), ActivityEvent),
+    )
+
+    events = []
+    for source in sources:
+        for event in source:
+            events.append(event)
+            if len(events) >= BATCH_SIZE:
+                ActivityEvent.objects.bulk_create(events)
+                events = []
+    ActivityEvent.objects.bulk_create(events)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_activity_events, migrations.RunPython.noop),
+    ]
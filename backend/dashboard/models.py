@@ -0,0 +1,42 @@
+from django.db import models
+from django.utils import timezone
+
+
+class ActivityType(models.TextChoices):
+    FUEL = 'fuel', 'Fuel'
+    MAINTENANCE = 'maintenance', 'Maintenance'
+    CAR_ADDED = 'car_added', 'Car added'
+    CAR_EDITED = 'car_edited', 'Car edited'
+
+
+class ActivityEvent(models.Model):
+    """Append-only log of fleet activity shown in the dashboard feed."""
+
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.CASCADE,
+        related_name='activity_events',
+    )
+    car = models.ForeignKey(
+        'fleet.Car',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='activity_events',
+    )
+    car_numplate = models.CharField(max_length=20, blank=True)
+    event_type = models.CharField(max_length=20, choices=ActivityType.choices)
+    object_id = models.PositiveBigIntegerField(help_text='ID of the source record')
+    title = models.CharField(max_length=255)
+    description = models.CharField(max_length=255, blank=True)
+    cost = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['company', '-created_at', '-id']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.title} ({self.created_at:%Y-%m-%d %H:%M})"
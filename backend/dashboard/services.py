@@ -0,0 +1,310 @@
+"""
+Сервисы расчета показателей дашборда.
+"""
+from __future__ import annotations
+
+import base64
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple, TypedDict
+
+from django.db.models import Count, ExpressionWrapper, F, FloatField, IntegerField, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from companies.models import Company
+from fleet.models import Car, CarStatus, Fuel, Inspection, Insurance, Spare, exclude_deleted_cars
+
+from .models import ActivityEvent
+
+EXPIRING_WARNING_DAYS = 30
+
+
+class DashboardStats(TypedDict):
+    total_cars: int
+    active_cars: int
+    maintenance_cars: int
+    inactive_cars: int
+    total_fuel_cost_month: float
+    total_fuel_cost_prev_month: float
+    total_spare_parts_cost_month: float
+    total_spare_parts_cost_prev_month: float
+    total_operational_cost: float
+    prev_operational_cost: float
+    active_insurances: int
+    active_inspections: int
+    expiring_items_count: int
+    avg_fuel_consumption: float
+    prev_avg_fuel_consumption: float
+
+
+class VehicleConsumptionRow(TypedDict):
+    id: int
+    numplate: str
+    brand: str
+    title: str
+    total_fuel_liters: int
+    total_cost: float
+    avg_consumption: float
+    records_count: int
+    last_updated: Optional[str]
+
+
+class ActivityFeedItem(TypedDict):
+    id: int
+    type: str
+    car_id: Optional[int]
+    car_numplate: str
+    title: str
+    description: str
+    date: str
+    cost: float
+
+
+def _month_bounds(year: int, month: int) -> Tuple[date, date]:
+    """Return [first day of month, first day of next month)."""
+    start = date(year, month, 1)
+    if month == 12:
+        return start, date(year + 1, 1, 1)
+    return start, date(year, month + 1, 1)
+
+
+def _previous_month(year: int, month: int) -> Tuple[int, int]:
+    if month == 1:
+        return year - 1, 12
+    return year, month - 1
+
+
+def _company_subquery(queryset, company_field: str, expression):
+    """
+    Scalar subquery with a single aggregate over ``queryset`` for the outer company.
+
+    Grouping by the company column makes the subquery yield exactly one row,
+    so several of them can be evaluated in one round trip.
+    """
+    subquery = (
+        queryset.filter(**{company_field: OuterRef('pk')})
+        .order_by()
+        .values(company_field)
+        .annotate(value=expression)
+        .values('value')[:1]
+    )
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), 0)
+
+
+def _consumption(liters: int, mileage: int) -> float:
+    if liters and mileage and mileage > 0:
+        return (liters / mileage) * 100
+    return 0
+
+
+def get_dashboard_stats(*, company_id: int) -> DashboardStats:
+    """
+    Показатели дашборда компании за три запроса к БД.
+
+    1. Количество машин по статусам (условная агрегация).
+    2. Топливо, сгруппированное по месяцам (одна строка на месяц).
+    3. Запчасти, страховки и техосмотры скалярными подзапросами.
+    """
+    now = timezone.now()
+    today = now.date()
+    current_year, current_month = now.year, now.month
+    prev_year, prev_month = _previous_month(current_year, current_month)
+    month_start, next_month_start = _month_bounds(current_year, current_month)
+    prev_month_start, _ = _month_bounds(prev_year, prev_month)
+
+    # 1. Car statistics
+    cars = Car.objects.filter(company_id=company_id).aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status=CarStatus.ACTIVE)),
+        maintenance=Count('id', filter=Q(status=CarStatus.MAINTENANCE)),
+        inactive=Count('id', filter=Q(status=CarStatus.INACTIVE)),
+    )
+
+    # 2. Fuel statistics per month
+    with_data = Q(liters__gt=0, monthly_mileage__gt=0)
+    fuel_months: Dict[Tuple[int, int], dict] = {
+        (row['year'], row['month']): row
+        for row in exclude_deleted_cars(Fuel.objects.filter(company_id=company_id), company_id)
+        .order_by()
+        .values('year', 'month')
+        .annotate(
+            cost_sum=Sum('total_cost'),
+            liters_sum=Sum('liters', filter=with_data),
+            mileage_sum=Sum('monthly_mileage', filter=with_data),
+        )
+    }
+
+    # If no data for current month, use the most recent month with data
+    current_fuel = fuel_months.get((current_year, current_month))
+    if current_fuel is None and fuel_months:
+        current_fuel = fuel_months[max(fuel_months)]
+    prev_fuel = fuel_months.get((prev_year, prev_month)) or {}
+
+    total_fuel_cost_month = (current_fuel or {}).get('cost_sum') or 0
+    total_fuel_cost_prev_month = prev_fuel.get('cost_sum') or 0
+    avg_fuel_consumption = round(
+        _consumption(
+            sum(row['liters_sum'] or 0 for row in fuel_months.values()),
+            sum(row['mileage_sum'] or 0 for row in fuel_months.values()),
+        ),
+        2,
+    )
+    prev_avg_consumption = _consumption(prev_fuel.get('liters_sum') or 0, prev_fuel.get('mileage_sum') or 0)
+
+    # 3. Spare parts, insurances and inspections
+    expiring_to = today + timedelta(days=EXPIRING_WARNING_DAYS)
+    spares = exclude_deleted_cars(Spare.objects.all(), company_id)
+    insurances = exclude_deleted_cars(Insurance.objects.all(), company_id)
+    inspections = exclude_deleted_cars(Inspection.objects.all(), company_id)
+
+    counters = Company.objects.filter(pk=company_id).annotate(
+        spare_cost_month=_company_subquery(
+            spares.filter(installed_at__gte=month_start, installed_at__lt=next_month_start),
+            'company_id',
+            Sum(F('part_price') + F('job_price')),
+        ),
+        spare_cost_prev_month=_company_subquery(
+            spares.filter(installed_at__gte=prev_month_start, installed_at__lt=month_start),
+            'company_id',
+            Sum(F('part_price') + F('job_price')),
+        ),
+        active_insurances=_company_subquery(
+            insurances.filter(end_date__gte=today),
+            'company_id',
+            Count('id'),
+        ),
+        expiring_insurances=_company_subquery(
+            insurances.filter(end_date__gte=today, end_date__lte=expiring_to),
+            'company_id',
+            Count('id'),
+        ),
+        active_inspections=_company_subquery(
+            inspections.filter(valid_until__gte=today),
+            'company_id',
+            Count('id'),
+        ),
+        expiring_inspections=_company_subquery(
+            inspections.filter(valid_until__gte=today, valid_until__lte=expiring_to),
+            'company_id',
+            Count('id'),
+        ),
+    ).values(
+        'spare_cost_month',
+        'spare_cost_prev_month',
+        'active_insurances',
+        'expiring_insurances',
+        'active_inspections',
+        'expiring_inspections',
+    ).first() or {}
+
+    spare_parts_cost_month = counters.get('spare_cost_month') or 0
+    prev_spare_parts = counters.get('spare_cost_prev_month') or 0
+
+    return {
+        'total_cars': cars['total'],
+        'active_cars': cars['active'],
+        'maintenance_cars': cars['maintenance'],
+        'inactive_cars': cars['inactive'],
+        'total_fuel_cost_month': round(float(total_fuel_cost_month), 2),
+        'total_fuel_cost_prev_month': round(float(total_fuel_cost_prev_month), 2),
+        'total_spare_parts_cost_month': round(float(spare_parts_cost_month), 2),
+        'total_spare_parts_cost_prev_month': round(float(prev_spare_parts), 2),
+        'total_operational_cost': round(float(total_fuel_cost_month + spare_parts_cost_month), 2),
+        'prev_operational_cost': round(float(total_fuel_cost_prev_month + prev_spare_parts), 2),
+        'active_insurances': counters.get('active_insurances') or 0,
+        'active_inspections': counters.get('active_inspections') or 0,
+        'expiring_items_count': (counters.get('expiring_insurances') or 0) + (counters.get('expiring_inspections') or 0),
+        'avg_fuel_consumption': avg_fuel_consumption,
+        'prev_avg_fuel_consumption': round(prev_avg_consumption, 2) if prev_avg_consumption else 0,
+    }
+
+
+def get_vehicle_consumption(*, company_id: int, limit: int) -> List[VehicleConsumptionRow]:
+    """
+    Средний расход топлива по машинам (л/100км), top-N одним запросом.
+
+    Группировка, расчет расхода, сортировка и LIMIT выполняются в БД.
+    """
+    fuel = Fuel.objects.filter(company_id=company_id, liters__gt=0, monthly_mileage__gt=0)
+    rows = (
+        exclude_deleted_cars(fuel, company_id)
+        .order_by()
+        .values('car_id', 'car__numplate', 'car__brand', 'car__title')
+        .annotate(
+            liters_sum=Sum('liters'),
+            mileage_sum=Sum('monthly_mileage'),
+            cost_sum=Sum('total_cost'),
+            records=Count('id'),
+            latest_period=Max(F('year') * 100 + F('month')),
+        )
+        .annotate(
+            consumption=ExpressionWrapper(
+                Cast('liters_sum', FloatField()) * 100 / F('mileage_sum'),
+                output_field=FloatField(),
+            ),
+        )
+        .order_by('-consumption', 'car_id')[:limit]
+    )
+
+    data = []
+    for row in rows:
+        latest_year, latest_month = divmod(row['latest_period'], 100)
+        data.append({
+            'id': row['car_id'],
+            'numplate': row['car__numplate'],
+            'brand': row['car__brand'],
+            'title': row['car__title'],
+            'total_fuel_liters': row['liters_sum'],
+            'total_cost': round(float(row['cost_sum'] or 0), 2),
+            'avg_consumption': round(row['consumption'] or 0, 2),
+            'records_count': row['records'],
+            'last_updated': f"{Fuel._month_name(latest_month)} {latest_year}",
+        })
+    return data
+
+
+def _encode_cursor(event: ActivityEvent) -> str:
+    raw = f'{event.created_at.isoformat()}|{event.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValidationError({'cursor': 'Invalid cursor'})
+
+
+def get_activity_feed(
+    *, company_id: int, limit: int, cursor: str | None = None
+) -> Tuple[List[ActivityFeedItem], Optional[str]]:
+    """
+    Лента активности компании с keyset-пагинацией по (created_at, id).
+
+    Возвращает элементы страницы и курсор следующей страницы (или None).
+    """
+    qs = ActivityEvent.objects.filter(company_id=company_id).order_by('-created_at', '-id')
+    qs = exclude_deleted_cars(qs, company_id)
+    if cursor:
+        created_at, pk = _decode_cursor(cursor)
+        qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+
+    events = list(qs[:limit + 1])
+    next_cursor = _encode_cursor(events[limit - 1]) if len(events) > limit else None
+
+    items = [
+        {
+            'id': event.object_id,
+            'type': event.event_type,
+            'car_id': event.car_id,
+            'car_numplate': event.car_numplate,
+            'title': event.title,
+            'description': event.description,
+            'date': event.created_at.isoformat(),
+            'cost': float(event.cost),
+        }
+        for event in events[:limit]
+    ]
+    return items, next_cursor
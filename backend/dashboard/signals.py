@@ -0,0 +1,99 @@
+from datetime import datetime, time
+
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from fleet.models import Car, Fuel, Spare
+from fleet.signals import bulk_saved
+
+from .models import ActivityEvent, ActivityType
+
+
+def _car_event(car, created):
+    if created:
+        return {
+            'event_type': ActivityType.CAR_ADDED,
+            'title': f"Vehicle added: {car.brand} {car.title or ''}",
+            'description': f"VIN: {car.vin or 'N/A'}",
+            'cost': 0,
+            'created_at': car.created_at,
+        }
+    return {
+        'event_type': ActivityType.CAR_EDITED,
+        'title': f"Vehicle updated: {car.brand} {car.title or ''}",
+        'description': f"Last modified: {car.updated_at.strftime('%d.%m.%Y %H:%M')}",
+        'cost': 0,
+        'created_at': car.updated_at,
+    }
+
+
+def _fuel_event(fuel, created):
+    if not created:
+        return None
+    return {
+        'event_type': ActivityType.FUEL,
+        'title': f"Fuel: {fuel.month_name} {fuel.year}",
+        'description': f"{fuel.liters}L - {fuel.total_cost} с.",
+        'cost': fuel.total_cost or 0,
+        'created_at': fuel.created_at,
+    }
+
+
+def _installed_day(spare):
+    # Maintenance is placed in the feed by the installation day, not by when it was entered
+    installed_at = Spare._meta.get_field('installed_at').to_python(spare.installed_at)
+    return timezone.make_aware(datetime.combine(installed_at, time.min))
+
+
+def _spare_event(spare, created):
+    if not created:
+        return None
+    return {
+        'event_type': ActivityType.MAINTENANCE,
+        'title': f"Maintenance: {spare.title}",
+        'description': f"Parts: {spare.part_price} с. + Labor: {spare.job_price} с.",
+        'cost': (spare.part_price or 0) + (spare.job_price or 0),
+        'created_at': _installed_day(spare),
+    }
+
+
+EVENT_BUILDERS = {
+    Car: _car_event,
+    Fuel: _fuel_event,
+    Spare: _spare_event,
+}
+
+
+def _build_event(sender, instance, created):
+    event = EVENT_BUILDERS[sender](instance, created)
+    if event is None:
+        return None
+    car = instance if sender is Car else instance.car
+    return ActivityEvent(
+        company_id=car.company_id,
+        car=car,
+        car_numplate=car.numplate,
+        object_id=instance.pk,
+        **event,
+    )
+
+
+def _record_activity(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    event = _build_event(sender, instance, created)
+    if event is not None:
+        event.save()
+
+
+def _record_bulk_activity(sender, instances, created, **kwargs):
+    if sender not in EVENT_BUILDERS:
+        return
+    events = [_build_event(sender, instance, instance.pk in created) for instance in instances]
+    ActivityEvent.objects.bulk_create([event for event in events if event is not None], batch_size=1000)
+
+
+def connect_signals():
+    bulk_saved.connect(_record_bulk_activity, dispatch_uid='dashboard_activity_bulk_saved')
+    for model in EVENT_BUILDERS:
+        post_save.connect(_record_activity, sender=model, dispatch_uid=f'dashboard_activity_{model.__name__}')
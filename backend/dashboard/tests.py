@@ -0,0 +1,294 @@
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from companies.models import Company
+from fleet.models import Car, CarStatus, Fuel, Inspection, Insurance, Spare
+from fleet.purge import soft_delete_car
+
+from .models import ActivityEvent, ActivityType
+from .services import get_activity_feed, get_dashboard_stats, get_vehicle_consumption
+from .views import cost_by_month_widget, expiring_widget, stats_widget
+
+
+class DashboardStatsServiceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        other = Company.objects.create(name='Other Fleet', slug='other-fleet')
+
+        now = timezone.now()
+        today = now.date()
+        car_fields = dict(region='Бишкек', brand='Toyota', title='Camry', fueltype='Бензин', type='Легковой')
+        cls.car = Car.objects.create(company=cls.company, numplate='01KG001AAA', **car_fields)
+        Car.objects.create(company=cls.company, numplate='01KG002AAA', status=CarStatus.MAINTENANCE, **car_fields)
+        other_car = Car.objects.create(company=other, numplate='01KG003AAA', **car_fields)
+
+        Fuel.objects.create(car=cls.car, year=now.year, month=now.month, liters=100, total_cost=5000, monthly_mileage=1000)
+        Fuel.objects.create(car=other_car, year=now.year, month=now.month, liters=10, total_cost=999, monthly_mileage=10)
+        Spare.objects.create(car=cls.car, title='Filter', part_price=300, job_price=200, installed_at=today)
+
+        Insurance.objects.create(car=cls.car, number='I-1', start_date=today, end_date=today + timedelta(days=10), cost=100)
+        Inspection.objects.create(car=cls.car, number='T-1', inspected_at=today - timedelta(days=350), cost=50)
+        Inspection.objects.create(car=cls.car, number='T-2', inspected_at=today - timedelta(days=400), cost=50)
+
+    def test_query_budget(self):
+        with self.assertNumQueries(3):
+            get_dashboard_stats(company_id=self.company.id)
+
+    def test_values(self):
+        stats = get_dashboard_stats(company_id=self.company.id)
+
+        self.assertEqual(stats['total_cars'], 2)
+        self.assertEqual(stats['active_cars'], 1)
+        self.assertEqual(stats['maintenance_cars'], 1)
+        self.assertEqual(stats['inactive_cars'], 0)
+        self.assertEqual(stats['total_fuel_cost_month'], 5000)
+        self.assertEqual(stats['total_spare_parts_cost_month'], 500)
+        self.assertEqual(stats['total_operational_cost'], 5500)
+        self.assertEqual(stats['active_insurances'], 1)
+        self.assertEqual(stats['active_inspections'], 1)
+        self.assertEqual(stats['expiring_items_count'], 2)
+        self.assertEqual(stats['avg_fuel_consumption'], 10.0)
+
+
+class VehicleConsumptionServiceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        car_fields = dict(region='Бишкек', brand='Toyota', title='Camry', fueltype='Бензин', type='Легковой')
+        cls.economical = Car.objects.create(company=cls.company, numplate='01KG001AAA', **car_fields)
+        cls.thirsty = Car.objects.create(company=cls.company, numplate='01KG002AAA', **car_fields)
+        Car.objects.create(company=cls.company, numplate='01KG003AAA', **car_fields)
+
+        Fuel.objects.create(car=cls.economical, year=2026, month=1, liters=50, total_cost=3000, monthly_mileage=1000)
+        Fuel.objects.create(car=cls.economical, year=2026, month=2, liters=70, total_cost=4000, monthly_mileage=1000)
+        Fuel.objects.create(car=cls.thirsty, year=2025, month=12, liters=200, total_cost=9000, monthly_mileage=1000)
+
+    def test_single_query_top_n(self):
+        with self.assertNumQueries(1):
+            rows = get_vehicle_consumption(company_id=self.company.id, limit=1)
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['id'], self.thirsty.id)
+        self.assertEqual(rows[0]['avg_consumption'], 20.0)
+
+    def test_row_values(self):
+        rows = get_vehicle_consumption(company_id=self.company.id, limit=10)
+
+        self.assertEqual([row['id'] for row in rows], [self.thirsty.id, self.economical.id])
+        economical = rows[1]
+        self.assertEqual(economical['total_fuel_liters'], 120)
+        self.assertEqual(economical['total_cost'], 7000)
+        self.assertEqual(economical['avg_consumption'], 6.0)
+        self.assertEqual(economical['records_count'], 2)
+        self.assertEqual(economical['last_updated'], 'February 2026')
+
+
+class ActivityFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        cls.car = Car.objects.create(
+            company=cls.company, region='Бишкек', brand='Toyota', title='Camry',
+            numplate='01KG001AAA', fueltype='Бензин', type='Легковой',
+        )
+        Fuel.objects.create(car=cls.car, year=2026, month=1, liters=50, total_cost=3000, monthly_mileage=500)
+        Spare.objects.create(car=cls.car, title='Filter', part_price=300, job_price=200, installed_at='2026-01-10')
+        cls.car.status = CarStatus.MAINTENANCE
+        cls.car.save()
+
+    def test_signals_write_events(self):
+        types = set(ActivityEvent.objects.filter(company=self.company).values_list('event_type', flat=True))
+        self.assertEqual(types, {
+            ActivityType.CAR_ADDED, ActivityType.FUEL, ActivityType.MAINTENANCE, ActivityType.CAR_EDITED,
+        })
+
+    def test_cursor_pagination(self):
+        seen = []
+        cursor = None
+        while True:
+            with self.assertNumQueries(1):
+                items, cursor = get_activity_feed(company_id=self.company.id, limit=3, cursor=cursor)
+            seen.extend(item['type'] for item in items)
+            if cursor is None:
+                break
+
+        # Maintenance is dated by its installation day
+        self.assertEqual(seen, [
+            ActivityType.CAR_EDITED, ActivityType.FUEL, ActivityType.CAR_ADDED, ActivityType.MAINTENANCE,
+        ])
+
+    def test_backfill_migration_matches_signals(self):
+        migration = import_module('dashboard.migrations.0002_backfill_activity_events')
+        expected = sorted(
+            ActivityEvent.objects.exclude(event_type=ActivityType.CAR_EDITED)
+            .values_list('event_type', 'object_id', 'created_at')
+        )
+        ActivityEvent.objects.all().delete()
+
+        with mock.patch.object(migration, 'BATCH_SIZE', 2):
+            migration.backfill_activity_events(apps, None)
+
+        self.assertEqual(sorted(ActivityEvent.objects.values_list('event_type', 'object_id', 'created_at')), expected)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    SWR_REFRESH_WORKERS=0,
+)
+class DashboardEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        cls.user = User.objects.create_user(username='u', password='p', company=cls.company)
+        car = Car.objects.create(
+            company=cls.company, region='Бишкек', brand='Toyota', title='Camry',
+            numplate='01KG001AAA', fueltype='Бензин', type='Легковой',
+        )
+        today = timezone.localdate()
+        Fuel.objects.create(car=car, year=today.year, month=today.month, liters=10, total_cost=100, monthly_mileage=100)
+        Spare.objects.create(car=car, title='Filter', part_price=5, job_price=5, installed_at=today)
+        Insurance.objects.create(car=car, number='I-1', start_date=today, end_date=today, cost=7)
+        Inspection.objects.create(car=car, number='T-1', inspected_at=today, cost=3)
+
+    def setUp(self):
+        # Cached widgets would outlive the rolled back data of the previous test
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _get(self, path):
+        response = self.client.get(f'/api/v1/dashboard/{path}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def test_stats(self):
+        data = self._get('stats/')
+        self.assertEqual(data['total_cars'], 1)
+        self.assertEqual(data['total_fuel_cost_month'], 100)
+        self.assertEqual(data['total_spare_parts_cost_month'], 10)
+        self.assertEqual(data['total_operational_cost'], 110)
+        self.assertEqual(data['active_insurances'], 1)
+
+    def test_cost_by_month(self):
+        current = self._get('cost-by-month/')[-1]
+        self.assertEqual(
+            (current['fuel_cost'], current['spare_cost'], current['insurance_cost'], current['inspection_cost']),
+            (100, 10, 7, 3),
+        )
+        self.assertEqual(current['total_cost'], 120)
+
+    def test_expiring(self):
+        data = self._get('expiring/')
+        self.assertEqual([item['type'] for item in data['items']], ['insurance'])
+        self.assertEqual(data['total_renewal_cost'], 7)
+
+    def test_activity_feed(self):
+        types = {item['type'] for item in self._get('activity-feed/')}
+        self.assertEqual(types, {ActivityType.CAR_ADDED, ActivityType.FUEL, ActivityType.MAINTENANCE})
+
+    def test_vehicle_consumption(self):
+        [row] = self._get('vehicle-consumption/')
+        self.assertEqual((row['numplate'], row['total_fuel_liters'], row['avg_consumption']), ('01KG001AAA', 10, 10.0))
+
+    def test_recent_fuel(self):
+        [row] = self._get('recent-fuel/')
+        self.assertEqual((row['car_numplate'], row['liters'], row['total_cost']), ('01KG001AAA', 10, 100))
+
+    def test_soft_deleted_car_is_not_counted(self):
+        soft_delete_car(Car.objects.get())
+
+        stats = self._get('stats/')
+        self.assertEqual(
+            (stats['total_cars'], stats['total_operational_cost'], stats['active_insurances'], stats['active_inspections']),
+            (0, 0, 0, 0),
+        )
+        self.assertEqual(self._get('cost-by-month/')[-1]['total_cost'], 0)
+        self.assertEqual(self._get('expiring/'), {'items': [], 'total_renewal_cost': 0})
+        self.assertEqual(self._get('activity-feed/'), [])
+        self.assertEqual(self._get('vehicle-consumption/'), [])
+        self.assertEqual(self._get('recent-fuel/'), [])
+
+    def test_ai_suggestions(self):
+        # Warmed together with the dashboard by warm_dashboard_cache
+        with mock.patch('ai.views.random.shuffle'):
+            response = self.client.get('/api/v1/ai/suggestions/')
+        self.assertEqual(response.status_code, 200)
+        suggestions = {item['category']: item['text'] for item in response.json()['data']['suggestions']}
+        self.assertEqual(list(suggestions), ['fleet', 'fuel', 'insurance', 'analytics'])
+        self.assertIn('(1 шт.)', suggestions['insurance'])
+        self.assertTrue(suggestions['analytics'].startswith('Анализ расходов на топливо'))
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    SWR_REFRESH_WORKERS=0,
+)
+class DashboardBundleViewTests(TransactionTestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        car = Car.objects.create(
+            company=self.company, region='Бишкек', brand='Toyota', title='Camry',
+            numplate='01KG001AAA', fueltype='Бензин', type='Легковой',
+        )
+        Fuel.objects.create(car=car, year=2026, month=1, liters=50, total_cost=3000, monthly_mileage=500)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='u', password='p', company=self.company))
+
+    def _get(self, query):
+        response = self.client.get(f'/api/v1/dashboard/bundle/?{query}')
+        return response.status_code, response.json().get('data')
+
+    def test_widgets_in_parallel(self):
+        with override_settings(DASHBOARD_BUNDLE_MAX_WORKERS=3):
+            status, data = self._get('widgets=stats,activity,vehicle-consumption&activity.limit=1')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(data['errors'], {})
+        self.assertEqual(set(data['widgets']), {'stats', 'activity', 'vehicle-consumption'})
+        self.assertEqual(data['widgets']['stats']['total_cars'], 1)
+        self.assertEqual(len(data['widgets']['activity']), 1)
+        self.assertEqual(data['widgets']['vehicle-consumption'][0]['avg_consumption'], 10.0)
+
+    def test_widget_error_is_isolated(self):
+        with override_settings(DASHBOARD_BUNDLE_MAX_WORKERS=1):
+            status, data = self._get('widgets=stats,activity&activity.limit=many')
+
+        self.assertEqual(status, 200)
+        self.assertIn('stats', data['widgets'])
+        self.assertIn('activity', data['errors'])
+
+    def test_unknown_widget(self):
+        status, _ = self._get('widgets=stats,nope')
+        self.assertEqual(status, 400)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class WarmDashboardCacheCommandTests(TransactionTestCase):
+    def test_warms_active_companies(self):
+        company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        Company.objects.create(name='Inactive Fleet', slug='inactive-fleet', is_active=False)
+        Car.objects.create(
+            company=company, region='Бишкек', brand='Toyota', title='Camry',
+            numplate='01KG001AAA', fueltype='Бензин', type='Легковой',
+        )
+
+        out = StringIO()
+        call_command('warm_dashboard_cache', concurrency=2, stdout=out)
+
+        self.assertIn(f'Company {company.id}:', out.getvalue())
+        self.assertIn('Warmed 1/1 companies', out.getvalue())
+        with self.assertNumQueries(0):
+            stats_widget(company.id, {})
+            expiring_widget(company.id, {})
+            cost_by_month_widget(company.id, {})
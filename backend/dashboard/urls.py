@@ -8,6 +8,7 @@ from .views import (
     DashboardActivityFeedView,
     DashboardCostByMonthView,
     DashboardVehicleConsumptionView,
+    DashboardBundleView,
 )
 
 urlpatterns = [
@@ -18,4 +19,5 @@ urlpatterns = [
     path('activity-feed/', DashboardActivityFeedView.as_view(), name='dashboard-activity-feed'),
     path('cost-by-month/', DashboardCostByMonthView.as_view(), name='dashboard-cost-by-month'),
     path('vehicle-consumption/', DashboardVehicleConsumptionView.as_view(), name='dashboard-vehicle-consumption'),
+    path('bundle/', DashboardBundleView.as_view(), name='dashboard-bundle'),
 ]
@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class FleetConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'fleet'
+
+    def ready(self):
+        from .images import connect_signals as connect_image_signals
+        from .search import register_search_indexes
+        from .signals import connect_signals
+        from .sync import connect_signals as connect_sync_signals
+
+        connect_signals()
+        connect_image_signals()
+        connect_sync_signals()
+        register_search_indexes()
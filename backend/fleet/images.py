@@ -0,0 +1,193 @@
+"""
+Уменьшенные варианты загруженных фотографий.
+
+Для каждой фотографии создаются варианты thumb / medium в WebP и JPEG
+(Pillow). Генерация запускается после коммита транзакции в фоновом пуле
+потоков, имена файлов сохраняются в ``<поле>_variants`` модели. Варианты
+замененной или удаленной фотографии удаляются из хранилища.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, Dict, List
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.cache import bump_data_version_on_commit
+
+from .models import Accumulator, CarPhoto, Tires
+
+logger = logging.getLogger(__name__)
+
+# variant -> max (width, height); the aspect ratio is kept
+IMAGE_VARIANTS = {
+    'thumb': (320, 320),
+    'medium': (1024, 1024),
+}
+IMAGE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Model -> image field; variants are stored in "<field>_variants"
+IMAGE_FIELDS = {
+    CarPhoto: 'image',
+    Tires: 'photo',
+    Accumulator: 'photo',
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variants_field(model) -> str:
+    return f'{IMAGE_FIELDS[model]}_variants'
+
+
+def _variant_name(source: str, variant: str, ext: str) -> str:
+    directory, filename = os.path.split(source)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'variants', f'{stem}_{variant}.{ext}')
+
+
+def _render(image, size, image_format, options) -> bytes:
+    variant = image.copy()
+    variant.thumbnail(size, Image.Resampling.LANCZOS)
+    if image_format == 'JPEG' and variant.mode != 'RGB':
+        variant = variant.convert('RGB')
+    buffer = BytesIO()
+    variant.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def render_variants(field_file) -> Dict[str, Any]:
+    """Write all variants of ``field_file`` to its storage and return their names."""
+    storage = field_file.storage
+    with field_file.open('rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    variants = {'source': field_file.name}
+    for variant, size in IMAGE_VARIANTS.items():
+        variants[variant] = {}
+        for ext, (image_format, options) in IMAGE_FORMATS.items():
+            name = _variant_name(field_file.name, variant, ext)
+            if storage.exists(name):
+                storage.delete(name)
+            variants[variant][ext] = storage.save(name, ContentFile(_render(image, size, image_format, options)))
+    return variants
+
+
+def variant_names(variants) -> List[str]:
+    """Stored file names listed in a ``<field>_variants`` value."""
+    return [name for variant, files in (variants or {}).items() if variant != 'source' for name in files.values()]
+
+
+def delete_variant_files(storage, names) -> None:
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.exception(f"Deleting image variant {name} failed")
+
+
+def needs_variants(instance) -> bool:
+    field_file = getattr(instance, IMAGE_FIELDS[type(instance)])
+    variants = getattr(instance, variants_field(type(instance))) or {}
+    if not field_file:
+        # Variants of a removed image are left to clean up
+        return bool(variants)
+    return variants.get('source') != field_file.name
+
+
+def generate_variants(model, pk, force=False) -> bool:
+    """Render and store variants of one record, dropping those of a replaced image; False if nothing was done."""
+    instance = model.objects.select_related('car').filter(pk=pk).first()
+    if instance is None or not (force or needs_variants(instance)):
+        return False
+    image_field = IMAGE_FIELDS[model]
+    field_file = getattr(instance, image_field)
+    previous = variant_names(getattr(instance, variants_field(model)))
+    if field_file:
+        variants = render_variants(field_file)
+        source = Q(**{image_field: field_file.name})
+    elif previous:
+        # The image was removed: only the old files are left to drop
+        variants = {}
+        source = Q(**{image_field: ''}) | Q(**{f'{image_field}__isnull': True})
+    else:
+        return False
+
+    changes = {variants_field(model): variants}
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        # Picked up by the delta sync feed
+        changes['updated_at'] = timezone.now()
+    # update() does not fire post_save, so bump the version for cached lists
+    updated = model.objects.filter(source, pk=pk).update(**changes)
+    current = variant_names(variants)
+    if updated:
+        delete_variant_files(field_file.storage, [name for name in previous if name not in current])
+    else:
+        # The image was replaced while rendering: the render of the new one follows
+        delete_variant_files(field_file.storage, current)
+    bump_data_version_on_commit(instance.car.company_id)
+    return bool(updated)
+
+
+def _get_executor():
+    """Shared pool for variant rendering (None means render inline)."""
+    global _executor
+    workers = getattr(settings, 'IMAGE_VARIANT_WORKERS', 2)
+    if workers <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-variants')
+    return _executor
+
+
+def schedule_variants(model, pk) -> None:
+    """Render variants after the current transaction commits, off the request thread."""
+    executor = _get_executor()
+
+    def run():
+        try:
+            generate_variants(model, pk)
+        except Exception:
+            logger.exception(f"Rendering image variants of {model.__name__}#{pk} failed")
+        finally:
+            if executor is not None:
+                connections.close_all()
+
+    transaction.on_commit(run if executor is None else lambda: executor.submit(run))
+
+
+def _schedule_on_save(sender, instance, raw=False, **kwargs):
+    if not raw and needs_variants(instance):
+        schedule_variants(sender, instance.pk)
+
+
+def _delete_on_delete(sender, instance, **kwargs):
+    names = variant_names(getattr(instance, variants_field(sender)))
+    if names:
+        storage = getattr(instance, IMAGE_FIELDS[sender]).storage
+        # Files go only once the row is really gone
+        transaction.on_commit(lambda: delete_variant_files(storage, names))
+
+
+def connect_signals():
+    for model in IMAGE_FIELDS:
+        post_save.connect(_schedule_on_save, sender=model, dispatch_uid=f'fleet_image_variants_{model.__name__}')
+        post_delete.connect(
+            _delete_on_delete, sender=model, dispatch_uid=f'fleet_image_variants_delete_{model.__name__}',
+        )
@@ -0,0 +1,382 @@
+"""
+Импорт автопарка из CSV/XLSX.
+
+Файл читается потоково (csv.reader / openpyxl в режиме read-only), строки
+сопоставляются с полями моделей по заголовкам, валидируются и
+нормализуются пачками и записываются через bulk_create. Ошибочные строки
+не прерывают импорт: они попадают в отчет об ошибках (CSV в кэше).
+"""
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import secrets
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TypedDict
+from zipfile import BadZipFile
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Car, Insurance, Inspection, Spare
+from .signals import bulk_saved
+
+IMPORT_BATCH_SIZE = 500
+IMPORT_PREVIEW_ROWS = 20
+IMPORT_MAX_ERRORS_IN_RESPONSE = 100
+IMPORT_ERROR_REPORT_TTL = 60 * 60
+# Spreadsheets exported by Excel on Russian-locale Windows are saved as cp1251
+IMPORT_CSV_ENCODINGS = ('utf-8-sig', 'cp1251')
+IMPORT_ENCODING_SAMPLE = 64 * 1024
+
+# kind -> model and accepted column names per field ("car" is a numplate or a car ID)
+IMPORT_SPECS = {
+    'cars': {
+        'model': Car,
+        'columns': {
+            'numplate': ('numplate', 'plate', 'номер', 'госномер'),
+            'brand': ('brand', 'марка'),
+            'title': ('title', 'model', 'модель'),
+            'region': ('region', 'регион'),
+            'year': ('year', 'год'),
+            'vin': ('vin',),
+            'fueltype': ('fueltype', 'fuel_type', 'топливо'),
+            'type': ('type', 'тип'),
+            'driver': ('driver', 'водитель'),
+            'drivers_phone': ('drivers_phone', 'phone', 'телефон'),
+            'fuel_card': ('fuel_card', 'топливная_карта'),
+            'status': ('status', 'статус'),
+            'commissioned_at': ('commissioned_at', 'дата_ввода'),
+        },
+    },
+    'spares': {
+        'model': Spare,
+        'columns': {
+            'car': ('car', 'car_numplate', 'numplate', 'номер'),
+            'title': ('title', 'название'),
+            'description': ('description', 'описание'),
+            'part_price': ('part_price', 'цена_запчасти'),
+            'job_description': ('job_description', 'работа'),
+            'job_price': ('job_price', 'цена_работы'),
+            'installed_at': ('installed_at', 'дата'),
+        },
+    },
+    'insurances': {
+        'model': Insurance,
+        'columns': {
+            'car': ('car', 'car_numplate', 'numplate', 'номер'),
+            'insurance_type': ('insurance_type', 'тип'),
+            'number': ('number', 'номер_полиса'),
+            'start_date': ('start_date', 'начало'),
+            'end_date': ('end_date', 'окончание'),
+            'cost': ('cost', 'стоимость'),
+        },
+    },
+    'inspections': {
+        'model': Inspection,
+        'columns': {
+            'car': ('car', 'car_numplate', 'numplate', 'номер'),
+            'number': ('number', 'номер_талона'),
+            'inspected_at': ('inspected_at', 'дата'),
+            'cost': ('cost', 'стоимость'),
+        },
+    },
+}
+
+
+class ImportRowError(TypedDict):
+    row: int
+    errors: Dict[str, List[str]]
+
+
+class ImportResult(TypedDict):
+    kind: str
+    dry_run: bool
+    total_rows: int
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
+    preview: List[Dict[str, Any]]
+    error_report: Optional[str]
+
+
+def _normalize_header(value) -> str:
+    return str(value or '').strip().lower().replace(' ', '_')
+
+
+def _clean_cell(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    # Spreadsheet numbers come as floats: 2018.0 -> 2018
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _detect_encoding(binary) -> str:
+    """First encoding of IMPORT_CSV_ENCODINGS that decodes the beginning of the file."""
+    sample = binary.read(IMPORT_ENCODING_SAMPLE)
+    binary.seek(0)
+    for encoding in IMPORT_CSV_ENCODINGS:
+        try:
+            # Incremental: a character cut at the end of the sample is not an error
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        except UnicodeDecodeError:
+            continue
+        return encoding
+    raise ValidationError({'file': ['Unsupported text encoding, save the file as UTF-8']})
+
+
+def _iter_csv(file) -> Iterator[list]:
+    # Uploaded files proxy a binary file object; decode it lazily
+    binary = getattr(file, 'file', file)
+    text = io.TextIOWrapper(binary, encoding=_detect_encoding(binary), newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    try:
+        yield from csv.reader(text, dialect)
+    finally:
+        text.detach()
+
+
+def _iter_xlsx(file) -> Iterator[list]:
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except (InvalidFileException, KeyError):
+        # A zip archive without a workbook in it
+        raise ValidationError({'file': ['File is not a valid .xlsx workbook']})
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+
+def _read_errors_as_validation(rows: Iterator[list]) -> Iterator[list]:
+    # Rows are read lazily, so a broken file can fail on any row
+    try:
+        yield from rows
+    except UnicodeDecodeError:
+        raise ValidationError({'file': ['File contains bytes that are not valid text in its encoding']})
+    except BadZipFile:
+        raise ValidationError({'file': ['File is not a valid .xlsx workbook']})
+
+
+def iter_rows(file, filename: str) -> Iterator[list]:
+    """Stream raw rows (header first) of an uploaded CSV or XLSX file."""
+    if filename.lower().endswith('.xlsx'):
+        return _read_errors_as_validation(_iter_xlsx(file))
+    if filename.lower().endswith('.csv'):
+        return _read_errors_as_validation(_iter_csv(file))
+    raise ValidationError({'file': ['Only .csv and .xlsx files are supported']})
+
+
+def _map_columns(kind: str, header: list) -> Dict[int, str]:
+    """Column index -> model field."""
+    aliases = {
+        _normalize_header(alias): field
+        for field, names in IMPORT_SPECS[kind]['columns'].items()
+        for alias in names
+    }
+    mapping = {}
+    for index, name in enumerate(header):
+        field = aliases.get(_normalize_header(name))
+        if field is not None and field not in mapping.values():
+            mapping[index] = field
+    return mapping
+
+
+class _Importer:
+    """Validates, normalizes and writes one import batch by batch."""
+
+    def __init__(self, kind: str, company_id: int, dry_run: bool):
+        self.kind = kind
+        self.model = IMPORT_SPECS[kind]['model']
+        self.company_id = company_id
+        self.dry_run = dry_run
+        # Derived (non-editable) fields are filled by normalize(), relations separately
+        self.exclude = [f.name for f in self.model._meta.fields if not f.editable] + ['car', 'company']
+        self.seen_numplates = set()
+        self.seen_vins = set()
+        self.imported = 0
+        self.errors: List[Tuple[int, Dict[str, List[str]], list]] = []
+        self.preview: List[Dict[str, Any]] = []
+
+    def _fail(self, row_number: int, errors: Dict[str, List[str]], raw: list) -> None:
+        self.errors.append((row_number, errors, raw))
+
+    def _build(self, values: Dict[str, Any]):
+        car_ref = values.pop('car', None)
+        if isinstance(values.get('status'), str):
+            values['status'] = values['status'].upper()
+        instance = self.model(**values)
+        instance.full_clean(exclude=self.exclude, validate_unique=False, validate_constraints=False)
+        if hasattr(instance, 'normalize'):
+            instance.normalize()
+        return instance, car_ref
+
+    def _accept_cars(self, built) -> List[Car]:
+        """Numplate / VIN must be unique within the company and within the file."""
+        plates = {instance.numplate for _, instance, _, _ in built}
+        vins = {instance.vin for _, instance, _, _ in built if instance.vin}
+        existing = list(
+            Car.objects.filter(company_id=self.company_id)
+            .filter(Q(numplate__in=plates) | Q(vin__in=vins))
+            .values_list('numplate', 'vin')
+        )
+        taken_plates = self.seen_numplates | {plate for plate, _ in existing}
+        taken_vins = self.seen_vins | {vin for _, vin in existing if vin}
+
+        accepted = []
+        for row_number, instance, _, raw in built:
+            if instance.numplate in taken_plates:
+                self._fail(row_number, {'numplate': ['Car with this numplate already exists']}, raw)
+                continue
+            if instance.vin and instance.vin in taken_vins:
+                self._fail(row_number, {'vin': ['Car with this VIN already exists']}, raw)
+                continue
+            instance.company_id = self.company_id
+            taken_plates.add(instance.numplate)
+            self.seen_numplates.add(instance.numplate)
+            if instance.vin:
+                taken_vins.add(instance.vin)
+                self.seen_vins.add(instance.vin)
+            accepted.append(instance)
+        return accepted
+
+    def _accept_records(self, built) -> list:
+        """Resolve the car column (numplate or ID) of the whole batch in one query."""
+        refs = {str(car_ref).strip().upper() for _, _, car_ref, _ in built if car_ref is not None}
+        cars = {}
+        for car in Car.objects.filter(company_id=self.company_id).filter(
+            Q(numplate__in=refs) | Q(pk__in={int(ref) for ref in refs if ref.isdigit()})
+        ).only('id', 'company_id', 'numplate'):
+            cars[car.numplate] = car
+            cars.setdefault(str(car.pk), car)
+
+        accepted = []
+        for row_number, instance, car_ref, raw in built:
+            car = cars.get(str(car_ref).strip().upper()) if car_ref is not None else None
+            if car is None:
+                self._fail(row_number, {'car': ['Car not found in your company']}, raw)
+                continue
+            instance.car = car
+            instance.sync_company()
+            accepted.append(instance)
+        return accepted
+
+    def _preview_row(self, instance) -> Dict[str, Any]:
+        row = {}
+        for field in IMPORT_SPECS[self.kind]['columns']:
+            row[field] = instance.car.numplate if field == 'car' else getattr(instance, field)
+        return row
+
+    def process(self, batch: List[Tuple[int, Dict[str, Any], list]]) -> None:
+        built = []
+        for row_number, values, raw in batch:
+            try:
+                instance, car_ref = self._build(values)
+            except ValidationError as exc:
+                self._fail(row_number, exc.message_dict, raw)
+                continue
+            built.append((row_number, instance, car_ref, raw))
+
+        instances = self._accept_cars(built) if self.model is Car else self._accept_records(built)
+
+        for instance in instances[:max(IMPORT_PREVIEW_ROWS - len(self.preview), 0)]:
+            self.preview.append(self._preview_row(instance))
+
+        if instances and not self.dry_run:
+            self.model.objects.bulk_create(instances, batch_size=IMPORT_BATCH_SIZE)
+            # bulk_create skips post_save: rollup, activity feed and cache version
+            bulk_saved.send(
+                sender=self.model,
+                company_id=self.company_id,
+                instances=instances,
+                created={instance.pk for instance in instances},
+            )
+        self.imported += len(instances)
+
+
+def _store_error_report(company_id: int, header: list, errors) -> str:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['row', 'errors', *header])
+    for row_number, row_errors, raw in errors:
+        messages = '; '.join(f"{field}: {' '.join(map(str, msgs))}" for field, msgs in row_errors.items())
+        writer.writerow([row_number, messages, *raw])
+
+    token = secrets.token_urlsafe(16)
+    cache.set(error_report_key(company_id, token), output.getvalue(), IMPORT_ERROR_REPORT_TTL)
+    return token
+
+
+def error_report_key(company_id: int, token: str) -> str:
+    return f'fleet_import_errors_{company_id}_{token}'
+
+
+def run_import(*, kind: str, company_id: int, file, filename: str, dry_run: bool = False) -> Tuple[ImportResult, Optional[str]]:
+    """
+    Импорт строк файла в модель ``IMPORT_SPECS[kind]``.
+
+    Возвращает результат и токен отчета об ошибках (или None). При dry_run
+    все проверки выполняются, но ничего не записывается.
+    """
+    rows = iter_rows(file, filename)
+    header = next(rows, None)
+    if not header:
+        raise ValidationError({'file': ['File is empty']})
+    header = [str(name) if name is not None else '' for name in header]
+    mapping = _map_columns(kind, header)
+    if not mapping:
+        raise ValidationError({'file': ['No known columns in the header row']})
+
+    importer = _Importer(kind, company_id, dry_run)
+    total = 0
+    batch = []
+    with transaction.atomic():
+        # Row 1 is the header, so data rows are numbered like in the spreadsheet
+        for row_number, raw in enumerate(rows, start=2):
+            raw = list(raw)
+            if not any(_clean_cell(value) is not None for value in raw):
+                continue
+            total += 1
+            values = {}
+            for index, field in mapping.items():
+                value = _clean_cell(raw[index]) if index < len(raw) else None
+                if value is not None:
+                    values[field] = value
+            batch.append((row_number, values, raw))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                importer.process(batch)
+                batch = []
+        if batch:
+            importer.process(batch)
+
+    # Validation and car checks fail rows in separate passes
+    importer.errors.sort(key=lambda error: error[0])
+    token = _store_error_report(company_id, header, importer.errors) if importer.errors else None
+    result = {
+        'kind': kind,
+        'dry_run': dry_run,
+        'total_rows': total,
+        'imported': importer.imported,
+        'failed': len(importer.errors),
+        'errors': [
+            {'row': row_number, 'errors': errors}
+            for row_number, errors, _ in importer.errors[:IMPORT_MAX_ERRORS_IN_RESPONSE]
+        ],
+        'preview': importer.preview if dry_run else [],
+        'error_report': None,
+    }
+    return result, token
@@ -0,0 +1,149 @@
+"""Simulate GPS trackers: cars drive around and post odometer/GPS points to the telemetry endpoint"""
+import json
+import math
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from fleet.telemetry import TELEMETRY_MAX_POINTS
+
+# Around Bishkek
+ORIGIN = (42.8746, 74.5698)
+
+
+class Command(BaseCommand):
+    help = 'Generate tracker load: post simulated odometer/GPS readings of the given cars to a running server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Server base URL')
+        parser.add_argument('--username', help='Login of a company admin or dispatcher')
+        parser.add_argument('--password')
+        parser.add_argument('--token', help='Access token (instead of username/password)')
+        parser.add_argument('--cars', required=True, help='Comma-separated car IDs of the company')
+        parser.add_argument('--hours', type=float, default=24, help='Simulated history per car, ending now')
+        parser.add_argument('--interval', type=int, default=30, help='Seconds between readings of a car')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Points per request')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent requests')
+        parser.add_argument('--seed', type=int, help='Random seed (repeatable runs)')
+
+    def handle(self, *args, **options):
+        try:
+            car_ids = [int(car_id) for car_id in options['cars'].split(',') if car_id.strip()]
+        except ValueError:
+            raise CommandError('--cars expects comma-separated IDs')
+        if not car_ids:
+            raise CommandError('--cars expects at least one car ID')
+        batch_size = min(max(options['batch_size'], 1), TELEMETRY_MAX_POINTS)
+        base_url = options['url'].rstrip('/')
+        token = options['token'] or self._login(base_url, options['username'], options['password'])
+        random.seed(options['seed'])
+
+        latencies, totals = [], {'requests': 0, 'accepted': 0, 'duplicates': 0, 'failed': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def send(batch):
+            started = time.monotonic()
+            try:
+                result = self._post(f'{base_url}/api/v1/telemetry/points/', token, batch)
+            except (HTTPError, URLError) as exc:
+                with lock:
+                    totals['requests'] += 1
+                    totals['errors'] += 1
+                self.stderr.write(f'Request failed: {exc}')
+                return
+            with lock:
+                latencies.append(time.monotonic() - started)
+                totals['requests'] += 1
+                for key in ('accepted', 'duplicates', 'failed'):
+                    totals[key] += result[key]
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as executor:
+            batch = []
+            for point in self._readings(car_ids, options['hours'], max(options['interval'], 1)):
+                batch.append(point)
+                if len(batch) >= batch_size:
+                    executor.submit(send, batch)
+                    batch = []
+            if batch:
+                executor.submit(send, batch)
+        elapsed = time.monotonic() - started
+
+        points = totals['accepted'] + totals['duplicates'] + totals['failed']
+        summary = (
+            f"{totals['requests']} requests, {points} points in {elapsed:.1f}s ({points / max(elapsed, 1e-9):.0f} points/s); "
+            f"accepted {totals['accepted']}, duplicates {totals['duplicates']}, failed {totals['failed']}, "
+            f"request errors {totals['errors']}"
+        )
+        if latencies:
+            latencies.sort()
+            summary += (
+                f"; latency p50 {statistics.median(latencies) * 1000:.0f}ms, "
+                f"p95 {latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000:.0f}ms"
+            )
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def _readings(self, car_ids, hours, interval):
+        """Readings of all cars in time order, as a gateway forwarding several trackers would send them."""
+        states = {
+            car_id: {
+                'odometer': random.uniform(10_000, 200_000),
+                'lat': ORIGIN[0] + random.uniform(-0.05, 0.05),
+                'lon': ORIGIN[1] + random.uniform(-0.05, 0.05),
+                'heading': random.uniform(0, 2 * math.pi),
+                'speed': 0.0,
+            }
+            for car_id in car_ids
+        }
+        moment = timezone.now() - timedelta(hours=hours)
+        end = timezone.now()
+        while moment <= end:
+            for car_id, state in states.items():
+                # Parked at night, random walk of the speed during the day
+                hour = timezone.localtime(moment).hour
+                if hour < 7 or hour >= 21 or random.random() < 0.02:
+                    state['speed'] = 0.0
+                else:
+                    state['speed'] = min(max(state['speed'] + random.uniform(-10, 12), 0.0), 90.0)
+                    state['heading'] += random.uniform(-0.3, 0.3)
+                distance = state['speed'] * interval / 3600
+                state['odometer'] += distance
+                state['lat'] += distance * math.cos(state['heading']) / 111.0
+                state['lon'] += distance * math.sin(state['heading']) / (111.0 * math.cos(math.radians(state['lat'])))
+                yield {
+                    'car': car_id,
+                    'ts': moment.isoformat(),
+                    'odometer': f"{state['odometer']:.3f}",
+                    'lat': round(state['lat'], 6),
+                    'lon': round(state['lon'], 6),
+                    'speed': round(state['speed'], 1),
+                }
+            moment += timedelta(seconds=interval)
+
+    def _login(self, base_url, username, password):
+        if not (username and password):
+            raise CommandError('Pass --token or --username and --password')
+        try:
+            data = self._post(f'{base_url}/api/v1/auth/login/', None, {'username': username, 'password': password})
+        except (HTTPError, URLError) as exc:
+            raise CommandError(f'Login failed: {exc}')
+        return data['access']
+
+    @staticmethod
+    def _post(url, token, payload):
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        request = Request(url, data=json.dumps(payload).encode(), headers=headers, method='POST')
+        with urlopen(request, timeout=60) as response:
+            body = json.loads(response.read())
+        # Responses are wrapped by StandardJSONRenderer
+        return body.get('data', body)
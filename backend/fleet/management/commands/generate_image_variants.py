@@ -0,0 +1,48 @@
+"""Render thumbnail / WebP variants for photos uploaded before the image pipeline"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from fleet.images import IMAGE_FIELDS, generate_variants
+
+
+def _generate(model, pk, force):
+    try:
+        return generate_variants(model, pk, force=force)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG variants of car, tire and accumulator photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=[model.__name__.lower() for model in IMAGE_FIELDS], action='append',
+                            default=None, help='Model to process (repeatable, default: all)')
+        parser.add_argument('--force', action='store_true', help='Re-render variants that already exist')
+        parser.add_argument('--concurrency', type=int, default=4, help='Images rendered in parallel')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        for model, field in IMAGE_FIELDS.items():
+            if options['model'] and model.__name__.lower() not in options['model']:
+                continue
+            # Records with variants of the current file are skipped by generate_variants (unless --force)
+            queryset = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            pks = list(queryset.values_list('pk', flat=True))
+
+            generated = failed = 0
+            with ThreadPoolExecutor(max_workers=max(options['concurrency'], 1), thread_name_prefix='image-variants') as executor:
+                futures = {pk: executor.submit(_generate, model, pk, options['force']) for pk in pks}
+                for pk, future in futures.items():
+                    try:
+                        generated += bool(future.result())
+                    except Exception as exc:
+                        failed += 1
+                        self.stderr.write(self.style.ERROR(f'{model.__name__}#{pk}: failed ({exc})'))
+
+            self.stdout.write(f'{model.__name__}: {generated} generated, {len(pks) - generated - failed} up to date, {failed} failed')
+
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.monotonic() - started:.2f}s'))
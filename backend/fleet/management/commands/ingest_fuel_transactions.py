@@ -0,0 +1,68 @@
+"""Load a fuel card provider export (CSV/XLSX) into FuelTransaction and the monthly Fuel rows"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from companies.models import Company
+from fleet.importers import _clean_cell, _normalize_header, iter_rows
+from fleet.services import FUEL_TXN_CHUNK_SIZE, ingest_fuel_transactions
+
+# Row field -> accepted column names of the provider file
+FUEL_TXN_COLUMNS = {
+    'txn_id': ('txn_id', 'transaction_id', 'id'),
+    'occurred_at': ('occurred_at', 'datetime', 'date', 'дата'),
+    'liters': ('liters', 'volume', 'литры'),
+    'amount': ('amount', 'total', 'сумма'),
+    'car': ('car', 'car_id'),
+    'numplate': ('numplate', 'plate', 'номер'),
+    'card_number': ('card_number', 'card', 'карта'),
+    'station': ('station', 'азс'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Ingest fuel card transactions from a CSV/XLSX file (duplicates by transaction ID are skipped)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Provider export (.csv or .xlsx)')
+        parser.add_argument('--company', type=int, required=True, help='Company ID')
+        parser.add_argument('--batch-size', type=int, default=FUEL_TXN_CHUNK_SIZE, help='Rows per batch')
+
+    def handle(self, *args, **options):
+        if not Company.objects.filter(pk=options['company']).exists():
+            raise CommandError(f"Company {options['company']} does not exist")
+        aliases = {_normalize_header(alias): field for field, names in FUEL_TXN_COLUMNS.items() for alias in names}
+
+        started = time.monotonic()
+        totals = {'created': 0, 'duplicates': 0, 'failed': 0}
+        with open(options['path'], 'rb') as file:
+            rows = iter_rows(file, options['path'])
+            header = next(rows, None) or []
+            mapping = {}
+            for index, name in enumerate(header):
+                field = aliases.get(_normalize_header(name))
+                if field is not None and field not in mapping.values():
+                    mapping[index] = field
+
+            batch = []
+            for line, raw in enumerate(rows, start=2):
+                row = {field: _clean_cell(raw[index]) for index, field in mapping.items() if index < len(raw)}
+                batch.append((line, {field: value for field, value in row.items() if value is not None}))
+                if len(batch) >= max(options['batch_size'], 1):
+                    self._ingest(options['company'], batch, totals)
+                    batch = []
+            if batch:
+                self._ingest(options['company'], batch, totals)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {totals['created']}, duplicates {totals['duplicates']}, failed {totals['failed']} "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
+
+    def _ingest(self, company_id, batch, totals):
+        result = ingest_fuel_transactions(company_id=company_id, rows=[row for _, row in batch])
+        for key in totals:
+            totals[key] += result[key]
+        for (line, _), row_result in zip(batch, result['results']):
+            if row_result['status'] == 'error':
+                self.stderr.write(f"Row {line}: {row_result['errors']}")
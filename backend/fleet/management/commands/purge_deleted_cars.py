@@ -0,0 +1,19 @@
+"""Physically delete soft-deleted cars whose background purge did not run (e.g. after a restart)"""
+from django.core.management.base import BaseCommand
+
+from fleet.models import Car
+from fleet.purge import purge_car
+
+
+class Command(BaseCommand):
+    help = 'Purge soft-deleted cars with all their records and media files'
+
+    def handle(self, *args, **options):
+        purged = failed = 0
+        for car_id in list(Car.all_objects.soft_deleted().values_list('pk', flat=True)):
+            try:
+                purged += purge_car(car_id)
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'Car #{car_id}: {exc}')
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} cars, {failed} failed'))
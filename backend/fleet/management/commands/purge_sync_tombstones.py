@@ -0,0 +1,23 @@
+"""Delete tombstones older than the delta sync retention (clients with older tokens get a full resync)"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from fleet.models import Tombstone
+from fleet.sync import tombstone_retention
+
+PURGE_CHUNK_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = 'Delete delta sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS'
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - tombstone_retention()
+        deleted = 0
+        while True:
+            # Chunks keep each DELETE short on large tables
+            pks = list(Tombstone.objects.filter(deleted_at__lt=cutoff).values_list('pk', flat=True)[:PURGE_CHUNK_SIZE])
+            if not pks:
+                break
+            deleted += Tombstone.objects.filter(pk__in=pks).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones older than {cutoff:%Y-%m-%d}'))
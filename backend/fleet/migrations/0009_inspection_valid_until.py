@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_valid_until(apps, schema_editor):
+    Inspection = apps.get_model('fleet', 'Inspection')
+    validity = timedelta(days=settings.INSPECTION_VALIDITY_DAYS)
+
+    batch = []
+    for inspection in Inspection.objects.only('id', 'inspected_at').iterator(chunk_size=1000):
+        inspection.valid_until = inspection.inspected_at + validity
+        batch.append(inspection)
+        if len(batch) >= 1000:
+            Inspection.objects.bulk_update(batch, ['valid_until'])
+            batch = []
+    if batch:
+        Inspection.objects.bulk_update(batch, ['valid_until'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fleet', '0008_auto_20260402_2340'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspection',
+            name='valid_until',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_valid_until, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='inspection',
+            name='valid_until',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(fields=['car', 'valid_until'], name='fleet_insp_car_valid_idx'),
+        ),
+    ]
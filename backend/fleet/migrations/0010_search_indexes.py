@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# Table -> columns with a pg_trgm GIN index (see fleet.search.SEARCH_FIELDS).
+# SQLite gets FTS5 tables instead, installed after migrate by core.search.
+TRIGRAM_INDEXES = {
+    'fleet_car': ('numplate', 'vin', 'driver', 'title', 'drivers_phone', 'fuel_card'),
+    'fleet_spare': ('title', 'description', 'job_description'),
+    'fleet_tires': ('model', 'size'),
+    'fleet_accumulator': ('model', 'serial_number', 'capacity'),
+}
+
+
+def _index_name(table, column):
+    return f'{table}_{column}_trgm_idx'
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, columns in TRIGRAM_INDEXES.items():
+        for column in columns:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {_index_name(table, column)} '
+                f'ON {table} USING gin ({column} gin_trgm_ops)'
+            )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, columns in TRIGRAM_INDEXES.items():
+        for column in columns:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {_index_name(table, column)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fleet', '0009_inspection_valid_until'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
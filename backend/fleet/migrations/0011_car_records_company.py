@@ -0,0 +1,153 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+CAR_RECORD_MODELS = ('Accumulator', 'Fuel', 'Inspection', 'Insurance', 'Spare', 'Tires')
+
+
+def backfill_company(apps, schema_editor):
+    Car = apps.get_model('fleet', 'Car')
+    car_company = Subquery(Car.objects.filter(pk=OuterRef('car_id')).values('company_id')[:1])
+    for name in CAR_RECORD_MODELS:
+        # One set-based UPDATE per table
+        apps.get_model('fleet', name).objects.filter(company__isnull=True).update(company_id=car_company)
+
+
+def check_constraints_now(apps, schema_editor):
+    # The backfill sets a deferrable FK, so PostgreSQL keeps a pending check per
+    # row and refuses the following ALTER TABLE ("pending trigger events")
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('fleet', '0010_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accumulator',
+            name='company',
+            field=models.ForeignKey(
+                null=True, editable=False, on_delete=django.db.models.deletion.CASCADE,
+                related_name='+', to='companies.company',
+            ),
+        ),
+        migrations.AddField(
+            model_name='fuel',
+            name='company',
+            field=models.ForeignKey(
+                null=True, editable=False, on_delete=django.db.models.deletion.CASCADE,
+                related_name='+', to='companies.company',
+            ),
+        ),
+        migrations.AddField(
+            model_name='inspection',
+            name='company',
+            field=models.ForeignKey(
+                null=True, editable=False, on_delete=django.db.models.deletion.CASCADE,
+                related_name='+', to='companies.company',
+            ),
+        ),
+        migrations.AddField(
+            model_name='insurance',
+            name='company',
+            field=models.ForeignKey(
+                null=True, editable=False, on_delete=django.db.models.deletion.CASCADE,
+                related_name='+', to='companies.company',
+            ),
+        ),
+        migrations.AddField(
+            model_name='spare',
+            name='company',
+            field=models.ForeignKey(
+                null=True, editable=False, on_delete=django.db.models.deletion.CASCADE,
+                related_name='+', to='companies.company',
+            ),
+        ),
+        migrations.AddField(
+            model_name='tires',
+            name='company',
+            field=models.ForeignKey(
+                null=True, editable=False, on_delete=django.db.models.deletion.CASCADE,
+                related_name='+', to='companies.company',
+            ),
+        ),
+        migrations.RunPython(backfill_company, migrations.RunPython.noop),
+        migrations.RunPython(check_constraints_now, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='accumulator',
+            name='company',
+            field=models.ForeignKey(
+                editable=False, on_delete=django.db.models.deletion.CASCADE,
+                related_name='+', to='companies.company',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='fuel',
+            name='company',
+            field=models.ForeignKey(
+                editable=False, on_delete=django.db.models.deletion.CASCADE,
+                related_name='+', to='companies.company',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='inspection',
+            name='company',
+            field=models.ForeignKey(
+                editable=False, on_delete=django.db.models.deletion.CASCADE,
+                related_name='+', to='companies.company',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='insurance',
+            name='company',
+            field=models.ForeignKey(
+                editable=False, on_delete=django.db.models.deletion.CASCADE,
+                related_name='+', to='companies.company',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='spare',
+            name='company',
+            field=models.ForeignKey(
+                editable=False, on_delete=django.db.models.deletion.CASCADE,
+                related_name='+', to='companies.company',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='tires',
+            name='company',
+            field=models.ForeignKey(
+                editable=False, on_delete=django.db.models.deletion.CASCADE,
+                related_name='+', to='companies.company',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='accumulator',
+            index=models.Index(fields=['company', 'installed_at'], name='fleet_accum_comp_inst_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fuel',
+            index=models.Index(fields=['company', 'year', 'month'], name='fleet_fuel_comp_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(fields=['company', 'valid_until'], name='fleet_insp_comp_valid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='insurance',
+            index=models.Index(fields=['company', 'end_date'], name='fleet_insur_comp_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='spare',
+            index=models.Index(fields=['company', 'installed_at'], name='fleet_spare_comp_inst_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tires',
+            index=models.Index(fields=['company', 'installed_at'], name='fleet_tires_comp_inst_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('fleet', '0012_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=30)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+                ('company', models.ForeignKey(
+                    db_constraint=False,
+                    on_delete=models.deletion.DO_NOTHING,
+                    related_name='+',
+                    to='companies.company',
+                )),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['company', 'deleted_at', 'id'], name='fleet_tomb_comp_del_idx'),
+                ],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['company', 'updated_at', 'id'], name='fleet_car_comp_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='insurance',
+            index=models.Index(fields=['company', 'updated_at', 'id'], name='fleet_insur_comp_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(fields=['company', 'updated_at', 'id'], name='fleet_insp_comp_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='spare',
+            index=models.Index(fields=['company', 'updated_at', 'id'], name='fleet_spare_comp_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tires',
+            index=models.Index(fields=['company', 'updated_at', 'id'], name='fleet_tires_comp_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accumulator',
+            index=models.Index(fields=['company', 'updated_at', 'id'], name='fleet_accum_comp_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fuel',
+            index=models.Index(fields=['company', 'updated_at', 'id'], name='fleet_fuel_comp_upd_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fleet', '0013_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RemoveConstraint(
+            model_name='car',
+            name='uq_car_company_numplate',
+        ),
+        migrations.RemoveConstraint(
+            model_name='car',
+            name='uq_car_company_vin',
+        ),
+        migrations.AddConstraint(
+            model_name='car',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('deleted_at__isnull', True)),
+                fields=('company', 'numplate'),
+                name='uq_car_company_numplate',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='car',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(
+                    ('vin__isnull', False), models.Q(('vin', ''), _negated=True), ('deleted_at__isnull', True),
+                ),
+                fields=('company', 'vin'),
+                name='uq_car_company_vin',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(
+                condition=models.Q(('deleted_at__isnull', False)),
+                fields=['company'],
+                name='fleet_car_deleted_idx',
+            ),
+        ),
+    ]
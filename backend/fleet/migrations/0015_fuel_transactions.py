@@ -0,0 +1,46 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('fleet', '0014_car_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FuelTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider_txn_id', models.CharField(max_length=100)),
+                ('occurred_at', models.DateTimeField()),
+                ('liters', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('card_number', models.CharField(blank=True, max_length=80)),
+                ('station', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('car', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='fuel_transactions',
+                    to='fleet.car',
+                )),
+                ('company', models.ForeignKey(
+                    editable=False,
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='+',
+                    to='companies.company',
+                )),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(fields=('company', 'provider_txn_id'), name='uq_fueltxn_company_provider_id'),
+                ],
+                'indexes': [
+                    models.Index(fields=['car', 'occurred_at'], name='fleet_fueltxn_car_occ_idx'),
+                    models.Index(fields=['company', 'occurred_at'], name='fleet_fueltxn_comp_occ_idx'),
+                ],
+            },
+        ),
+    ]
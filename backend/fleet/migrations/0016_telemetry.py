@@ -0,0 +1,102 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('fleet', '0015_fuel_transactions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelemetryBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('samples', models.BinaryField()),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('odometer_min', models.PositiveBigIntegerField()),
+                ('odometer_max', models.PositiveBigIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('car', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='telemetry_buckets',
+                    to='fleet.car',
+                )),
+                ('company', models.ForeignKey(
+                    editable=False,
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='+',
+                    to='companies.company',
+                )),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(fields=('car', 'bucket_start'), name='uq_telemetry_car_bucket'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyMileage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_odometer', models.PositiveBigIntegerField()),
+                ('end_odometer', models.PositiveBigIntegerField()),
+                ('distance', models.PositiveIntegerField(default=0)),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('car', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='mileage_days',
+                    to='fleet.car',
+                )),
+                ('company', models.ForeignKey(
+                    editable=False,
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='+',
+                    to='companies.company',
+                )),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(fields=('car', 'date'), name='uq_daily_mileage_car_date'),
+                ],
+                'indexes': [
+                    models.Index(fields=['company', 'date'], name='fleet_daymile_comp_date_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyMileage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('distance', models.PositiveBigIntegerField(default=0)),
+                ('active_days', models.PositiveSmallIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('car', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='mileage_months',
+                    to='fleet.car',
+                )),
+                ('company', models.ForeignKey(
+                    editable=False,
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='+',
+                    to='companies.company',
+                )),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(fields=('car', 'year', 'month'), name='uq_monthly_mileage_car_period'),
+                ],
+                'indexes': [
+                    models.Index(fields=['company', 'year', 'month'], name='fleet_monmile_comp_period_idx'),
+                ],
+            },
+        ),
+    ]
@@ -1,5 +1,9 @@
+from datetime import date, timedelta
+
+from django.conf import settings
 from django.db import models
-from django.db.models import Q
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 
@@ -9,6 +13,37 @@ class CarStatus(models.TextChoices):
     MAINTENANCE = 'MAINTENANCE', 'Maintenance'
 
 
+# Related records of a car (related_name), counted by CarQuerySet.with_related_counts()
+CAR_RELATED_COUNTS = ('fuel_records', 'spares', 'insurances', 'inspections', 'tires', 'accumulators', 'photos')
+
+
+class CarQuerySet(models.QuerySet):
+    def with_related_counts(self):
+        """Annotate ``<related_name>_count`` for every CAR_RELATED_COUNTS relation via subqueries."""
+        annotations = {}
+        for name in CAR_RELATED_COUNTS:
+            related_model = self.model._meta.get_field(name).related_model
+            subquery = (
+                related_model.objects.filter(car=OuterRef('pk'))
+                .order_by()
+                .values('car')
+                .annotate(total=Count('id'))
+                .values('total')[:1]
+            )
+            annotations[f'{name}_count'] = Coalesce(Subquery(subquery, output_field=models.IntegerField()), 0)
+        return self.annotate(**annotations)
+
+    def soft_deleted(self):
+        return self.filter(deleted_at__isnull=False)
+
+
+class CarManager(models.Manager.from_queryset(CarQuerySet)):
+    """Default manager: soft-deleted cars (waiting for the purge) are hidden."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Car(models.Model):
     company = models.ForeignKey(
         'companies.Company',
@@ -35,13 +70,22 @@ class Car(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set by DELETE; the rows are removed later by the background purge (fleet.purge)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = CarManager()
+    all_objects = CarQuerySet.as_manager()
 
     class Meta:
         constraints = [
-            models.UniqueConstraint(fields=['company', 'numplate'], name='uq_car_company_numplate'),
+            models.UniqueConstraint(
+                fields=['company', 'numplate'],
+                condition=Q(deleted_at__isnull=True),
+                name='uq_car_company_numplate',
+            ),
             models.UniqueConstraint(
                 fields=['company', 'vin'],
-                condition=Q(vin__isnull=False) & ~Q(vin=''),
+                condition=Q(vin__isnull=False) & ~Q(vin='') & Q(deleted_at__isnull=True),
                 name='uq_car_company_vin',
             ),
         ]
@@ -49,11 +93,19 @@ class Car(models.Model):
             models.Index(fields=['company', 'numplate']),
             models.Index(fields=['company', 'brand']),
             models.Index(fields=['company', 'status']),
+            models.Index(fields=['company', 'updated_at', 'id'], name='fleet_car_comp_upd_idx'),
+            models.Index(fields=['company'], condition=Q(deleted_at__isnull=False), name='fleet_car_deleted_idx'),
         ]
 
     def __str__(self):
         return f"{self.brand} {self.title} [{self.numplate}]"
 
+    def related_counts(self):
+        """Counts from with_related_counts() annotations plus their total."""
+        counts = {name: getattr(self, f'{name}_count') for name in CAR_RELATED_COUNTS}
+        counts['total'] = sum(counts.values())
+        return counts
+
     @staticmethod
     def _normalize_driver(value: str) -> str:
         value = (value or '').strip()
@@ -62,21 +114,62 @@ class Car(models.Model):
         parts = [p for p in value.replace('\t', ' ').split(' ') if p]
         return ' '.join([p.capitalize() for p in parts])
 
-    def save(self, *args, **kwargs):
+    def normalize(self):
+        """Normalization applied on save (also used by bulk imports that bypass save)."""
         if self.numplate:
             self.numplate = self.numplate.strip().upper()
         self.driver = self._normalize_driver(self.driver)
         if self.commissioned_at is None:
             self.commissioned_at = timezone.localdate()
+
+    def save(self, *args, **kwargs):
+        self.normalize()
         super().save(*args, **kwargs)
 
 
-class Insurance(models.Model):
+def exclude_deleted_cars(queryset, company_id: int):
+    """
+    Drop rows of the company's soft-deleted cars from a queryset with a ``car`` relation.
+
+    The rows stay in the tables until the background purge; tenant-wide
+    aggregates must not count them in the meantime.
+    """
+    return queryset.exclude(car__in=Car.all_objects.soft_deleted().filter(company_id=company_id).values('pk'))
+
+
+class CarRecordMixin:
+    """
+    Child record of a car with ``company`` denormalized from ``car``.
+
+    Tenant-wide queries filter on the record's own company column (and its
+    composite indexes) instead of joining fleet_car.
+    """
+
+    def sync_company(self):
+        if self.car_id is not None:
+            self.company_id = self.car.company_id
+
+    def save(self, *args, **kwargs):
+        self.sync_company()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'car' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'company'}
+        super().save(*args, **kwargs)
+
+
+class Insurance(CarRecordMixin, models.Model):
     car = models.ForeignKey(
         Car,
         on_delete=models.CASCADE,
         related_name='insurances',
     )
+    # Denormalized from car, set on save (see CarRecordMixin)
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.CASCADE,
+        related_name='+',
+        editable=False,
+    )
     insurance_type = models.CharField(max_length=50, default='OSAGO')
     number = models.CharField(max_length=100)
     start_date = models.DateField()
@@ -90,20 +183,31 @@ class Insurance(models.Model):
         ordering = ['-end_date', '-id']
         indexes = [
             models.Index(fields=['car', 'end_date']),
+            models.Index(fields=['company', 'end_date'], name='fleet_insur_comp_end_idx'),
+            models.Index(fields=['company', 'updated_at', 'id'], name='fleet_insur_comp_upd_idx'),
         ]
 
     def __str__(self):
         return f"Insurance {self.number} car_id={self.car_id}"
 
 
-class Inspection(models.Model):
+class Inspection(CarRecordMixin, models.Model):
     car = models.ForeignKey(
         Car,
         on_delete=models.CASCADE,
         related_name='inspections',
     )
+    # Denormalized from car, set on save (see CarRecordMixin)
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.CASCADE,
+        related_name='+',
+        editable=False,
+    )
     number = models.CharField(max_length=100)
     inspected_at = models.DateField()
+    # Stored on save: inspected_at + INSPECTION_VALIDITY_DAYS at the time of the inspection
+    valid_until = models.DateField(editable=False)
     cost = models.PositiveIntegerField(default=0)
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -113,11 +217,31 @@ class Inspection(models.Model):
         ordering = ['-inspected_at', '-id']
         indexes = [
             models.Index(fields=['car', 'inspected_at']),
+            models.Index(fields=['car', 'valid_until'], name='fleet_insp_car_valid_idx'),
+            models.Index(fields=['company', 'valid_until'], name='fleet_insp_comp_valid_idx'),
+            models.Index(fields=['company', 'updated_at', 'id'], name='fleet_insp_comp_upd_idx'),
         ]
 
     def __str__(self):
         return f"Inspection {self.number} car_id={self.car_id}"
 
+    @staticmethod
+    def compute_valid_until(inspected_at):
+        if isinstance(inspected_at, str):
+            inspected_at = date.fromisoformat(inspected_at)
+        return inspected_at + timedelta(days=settings.INSPECTION_VALIDITY_DAYS)
+
+    def normalize(self):
+        """Derived fields set on save (also used by bulk imports that bypass save)."""
+        self.valid_until = self.compute_valid_until(self.inspected_at)
+
+    def save(self, *args, **kwargs):
+        self.normalize()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'inspected_at' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'valid_until'}
+        super().save(*args, **kwargs)
+
 
 class CarPhoto(models.Model):
     car = models.ForeignKey(
@@ -126,6 +250,8 @@ class CarPhoto(models.Model):
         related_name='photos',
     )
     image = models.ImageField(upload_to='car_photos/')
+    # Resized copies, filled in the background (see fleet.images)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     comment = models.CharField(max_length=255, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
@@ -136,12 +262,19 @@ class CarPhoto(models.Model):
         return f"CarPhoto#{self.pk} car_id={self.car_id}"
 
 
-class Spare(models.Model):
+class Spare(CarRecordMixin, models.Model):
     car = models.ForeignKey(
         Car,
         on_delete=models.CASCADE,
         related_name='spares',
     )
+    # Denormalized from car, set on save (see CarRecordMixin)
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.CASCADE,
+        related_name='+',
+        editable=False,
+    )
     title = models.CharField(max_length=150)
     description = models.TextField(blank=True)
     part_price = models.PositiveIntegerField(default=0)
@@ -156,22 +289,33 @@ class Spare(models.Model):
         ordering = ['-installed_at', '-id']
         indexes = [
             models.Index(fields=['car', 'installed_at']),
+            models.Index(fields=['company', 'installed_at'], name='fleet_spare_comp_inst_idx'),
+            models.Index(fields=['company', 'updated_at', 'id'], name='fleet_spare_comp_upd_idx'),
         ]
 
     def __str__(self):
         return f"{self.title} (car_id={self.car_id})"
 
 
-class Tires(models.Model):
+class Tires(CarRecordMixin, models.Model):
     car = models.ForeignKey(
         Car,
         on_delete=models.CASCADE,
         related_name='tires',
     )
+    # Denormalized from car, set on save (see CarRecordMixin)
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.CASCADE,
+        related_name='+',
+        editable=False,
+    )
     model = models.CharField(max_length=120)
     size = models.CharField(max_length=50)
     price = models.PositiveIntegerField(default=0)
     photo = models.ImageField(upload_to='tire_photos/', blank=True, null=True)
+    # Resized copies, filled in the background (see fleet.images)
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
     installed_at = models.DateField()
     expires_at = models.DateField(null=True, blank=True)
 
@@ -182,18 +326,27 @@ class Tires(models.Model):
         ordering = ['-installed_at', '-id']
         indexes = [
             models.Index(fields=['car', 'installed_at']),
+            models.Index(fields=['company', 'installed_at'], name='fleet_tires_comp_inst_idx'),
+            models.Index(fields=['company', 'updated_at', 'id'], name='fleet_tires_comp_upd_idx'),
         ]
 
     def __str__(self):
         return f"{self.model} {self.size} (car_id={self.car_id})"
 
 
-class Accumulator(models.Model):
+class Accumulator(CarRecordMixin, models.Model):
     car = models.ForeignKey(
         Car,
         on_delete=models.CASCADE,
         related_name='accumulators',
     )
+    # Denormalized from car, set on save (see CarRecordMixin)
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.CASCADE,
+        related_name='+',
+        editable=False,
+    )
     model = models.CharField(max_length=120)
     serial_number = models.CharField(max_length=120, blank=True)
     capacity = models.CharField(max_length=50, blank=True)
@@ -201,6 +354,8 @@ class Accumulator(models.Model):
     installed_at = models.DateField()
     expires_at = models.DateField(null=True, blank=True)
     photo = models.ImageField(upload_to='accumulator_photos/', blank=True, null=True)
+    # Resized copies, filled in the background (see fleet.images)
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -209,18 +364,27 @@ class Accumulator(models.Model):
         ordering = ['-installed_at', '-id']
         indexes = [
             models.Index(fields=['car', 'installed_at']),
+            models.Index(fields=['company', 'installed_at'], name='fleet_accum_comp_inst_idx'),
+            models.Index(fields=['company', 'updated_at', 'id'], name='fleet_accum_comp_upd_idx'),
         ]
 
     def __str__(self):
         return f"{self.model} {self.serial_number} (car_id={self.car_id})"
 
 
-class Fuel(models.Model):
+class Fuel(CarRecordMixin, models.Model):
     car = models.ForeignKey(
         Car,
         on_delete=models.CASCADE,
         related_name='fuel_records',
     )
+    # Denormalized from car, set on save (see CarRecordMixin)
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.CASCADE,
+        related_name='+',
+        editable=False,
+    )
     year = models.PositiveIntegerField()
     month = models.PositiveSmallIntegerField()
     liters = models.PositiveIntegerField(default=0)
@@ -238,6 +402,8 @@ class Fuel(models.Model):
         ]
         indexes = [
             models.Index(fields=['car', 'year', 'month']),
+            models.Index(fields=['company', 'year', 'month'], name='fleet_fuel_comp_period_idx'),
+            models.Index(fields=['company', 'updated_at', 'id'], name='fleet_fuel_comp_upd_idx'),
         ]
 
     def __str__(self):
@@ -261,15 +427,182 @@ class Fuel(models.Model):
         }
         return names.get(month, '')
 
-    def save(self, *args, **kwargs):
-        month = int(self.month or 0)
-        self.month_name = self._month_name(month)
-
-        mileage = int(self.monthly_mileage or 0)
-        liters = int(self.liters or 0)
+    @staticmethod
+    def _consumption(liters, mileage) -> float:
+        """Liters per 100 km."""
+        mileage = int(mileage or 0)
+        liters = int(liters or 0)
         if mileage > 0:
-            self.consumption = round((liters / mileage) * 100, 2)
-        else:
-            self.consumption = 0
+            return round((liters / mileage) * 100, 2)
+        return 0
+
+    def normalize(self):
+        """Derived fields set on save (also used by bulk writes that bypass save)."""
+        self.month_name = self._month_name(int(self.month or 0))
+        self.consumption = self._consumption(self.liters, self.monthly_mileage)
 
+    def save(self, *args, **kwargs):
+        self.normalize()
         super().save(*args, **kwargs)
+
+
+class Tombstone(models.Model):
+    """Deleted fleet record, kept for the delta sync feed (GET /sync/)."""
+    # No FK constraint: tombstones are written while a company's cars are
+    # being cascade-deleted and must not block or follow that delete
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+    )
+    model = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'deleted_at', 'id'], name='fleet_tomb_comp_del_idx'),
+        ]
+
+    def __str__(self):
+        return f"Tombstone {self.model}#{self.object_id}"
+
+
+class FuelTransaction(CarRecordMixin, models.Model):
+    """Fill-up from the fuel card provider; summed into the monthly Fuel row on ingestion."""
+    car = models.ForeignKey(
+        Car,
+        on_delete=models.CASCADE,
+        related_name='fuel_transactions',
+    )
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.CASCADE,
+        related_name='+',
+        editable=False,
+    )
+    provider_txn_id = models.CharField(max_length=100)
+    occurred_at = models.DateTimeField()
+    liters = models.DecimalField(max_digits=10, decimal_places=2)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    card_number = models.CharField(max_length=80, blank=True)
+    station = models.CharField(max_length=255, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['company', 'provider_txn_id'], name='uq_fueltxn_company_provider_id'),
+        ]
+        indexes = [
+            models.Index(fields=['car', 'occurred_at'], name='fleet_fueltxn_car_occ_idx'),
+            models.Index(fields=['company', 'occurred_at'], name='fleet_fueltxn_comp_occ_idx'),
+        ]
+
+    def __str__(self):
+        return f"FuelTransaction {self.provider_txn_id} car_id={self.car_id}"
+
+
+class TelemetryBucket(CarRecordMixin, models.Model):
+    """
+    One local hour of tracker readings of a car.
+
+    Readings are packed into ``samples`` (see fleet.telemetry.SAMPLE), one
+    16-byte record per second of the hour, so a car reporting every 10 s
+    costs one ~6 KB row per hour instead of 360 rows.
+    """
+    car = models.ForeignKey(
+        Car,
+        on_delete=models.CASCADE,
+        related_name='telemetry_buckets',
+    )
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.CASCADE,
+        related_name='+',
+        editable=False,
+    )
+    bucket_start = models.DateTimeField()
+    samples = models.BinaryField()
+    sample_count = models.PositiveIntegerField(default=0)
+    # Meters, summary of the packed samples used by the daily rollup
+    odometer_min = models.PositiveBigIntegerField()
+    odometer_max = models.PositiveBigIntegerField()
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['car', 'bucket_start'], name='uq_telemetry_car_bucket'),
+        ]
+
+    def __str__(self):
+        return f"TelemetryBucket {self.bucket_start:%Y-%m-%d %H:00} car_id={self.car_id}"
+
+
+class DailyMileage(CarRecordMixin, models.Model):
+    """Distance of a car per local day, downsampled from its telemetry buckets."""
+    car = models.ForeignKey(
+        Car,
+        on_delete=models.CASCADE,
+        related_name='mileage_days',
+    )
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.CASCADE,
+        related_name='+',
+        editable=False,
+    )
+    date = models.DateField()
+    # Meters
+    start_odometer = models.PositiveBigIntegerField()
+    end_odometer = models.PositiveBigIntegerField()
+    distance = models.PositiveIntegerField(default=0)
+    samples = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['car', 'date'], name='uq_daily_mileage_car_date'),
+        ]
+        indexes = [
+            models.Index(fields=['company', 'date'], name='fleet_daymile_comp_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"DailyMileage {self.date} car_id={self.car_id}"
+
+
+class MonthlyMileage(CarRecordMixin, models.Model):
+    """Sum of DailyMileage per month; feeds Fuel.monthly_mileage when TELEMETRY_FEEDS_FUEL_MILEAGE is on (off by default)."""
+    car = models.ForeignKey(
+        Car,
+        on_delete=models.CASCADE,
+        related_name='mileage_months',
+    )
+    company = models.ForeignKey(
+        'companies.Company',
+        on_delete=models.CASCADE,
+        related_name='+',
+        editable=False,
+    )
+    year = models.PositiveIntegerField()
+    month = models.PositiveSmallIntegerField()
+    # Meters
+    distance = models.PositiveBigIntegerField(default=0)
+    active_days = models.PositiveSmallIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['car', 'year', 'month'], name='uq_monthly_mileage_car_period'),
+        ]
+        indexes = [
+            models.Index(fields=['company', 'year', 'month'], name='fleet_monmile_comp_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"MonthlyMileage {self.year}-{self.month:02d} car_id={self.car_id}"
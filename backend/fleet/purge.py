@@ -0,0 +1,129 @@
+"""
+Мягкое удаление машин и фоновая очистка.
+
+DELETE /cars/<id>/ только проставляет ``Car.deleted_at``: машина и ее
+записи сразу скрываются из API. Физическое удаление (каскад по связанным
+таблицам и файлы фотографий) выполняется в фоновом пуле потоков
+небольшими пачками, каждая в своей транзакции, чтобы не держать долгих
+блокировок. Оставшиеся после перезапуска машины дочищает команда
+``purge_deleted_cars``.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.utils import timezone
+
+from core.cache import bump_data_version, bump_data_version_on_commit
+
+from .models import Car
+
+logger = logging.getLogger(__name__)
+
+PURGE_CHUNK_SIZE = 500
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def soft_delete_cars(*, company_id: int, car_ids) -> int:
+    """Hide the cars immediately and schedule their physical delete."""
+    now = timezone.now()
+    # update(): a soft delete is not an edit (no post_save activity event)
+    hidden = Car.all_objects.filter(company_id=company_id, pk__in=car_ids, deleted_at__isnull=True).update(
+        deleted_at=now, updated_at=now,
+    )
+    bump_data_version_on_commit(company_id)
+    for car_id in car_ids:
+        schedule_purge(car_id)
+    return hidden
+
+
+def soft_delete_car(car: Car) -> None:
+    soft_delete_cars(company_id=car.company_id, car_ids=[car.pk])
+
+
+def _media_names(instance) -> List[str]:
+    """Stored files of a record (image variants are dropped by the post_delete handler of fleet.images)."""
+    names = []
+    for field in instance._meta.concrete_fields:
+        if isinstance(field, models.FileField):
+            field_file = getattr(instance, field.attname)
+            if field_file:
+                names.append(field_file.name)
+    return names
+
+
+def _delete_media(storage_names) -> None:
+    for storage, name in storage_names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.exception(f"Deleting media file {name} failed")
+
+
+def _delete_in_chunks(queryset) -> int:
+    """Delete ``queryset`` PURGE_CHUNK_SIZE rows per transaction; files go after each commit."""
+    model = queryset.model
+    file_fields = [field for field in model._meta.concrete_fields if isinstance(field, models.FileField)]
+    deleted = 0
+    while True:
+        pks = list(queryset.order_by().values_list('pk', flat=True)[:PURGE_CHUNK_SIZE])
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            chunk = model._base_manager.filter(pk__in=pks)
+            media = []
+            if file_fields:
+                for instance in chunk:
+                    media.extend((field.storage, name) for field in file_fields for name in _media_names(instance))
+            # QuerySet.delete still sends post_delete (rollups, tombstones, cache version)
+            deleted += chunk.delete()[0]
+            if media:
+                transaction.on_commit(lambda media=media: _delete_media(media))
+
+
+def purge_car(car_id: int) -> bool:
+    """Physically delete a soft-deleted car and everything that cascades from it."""
+    car = Car.all_objects.soft_deleted().filter(pk=car_id).only('id', 'company_id').first()
+    if car is None:
+        return False
+    for relation in Car._meta.related_objects:
+        if relation.on_delete is models.CASCADE:
+            _delete_in_chunks(relation.related_model._base_manager.filter(**{relation.field.name: car_id}))
+    # Only the car row and SET_NULL references are left
+    with transaction.atomic():
+        Car.all_objects.filter(pk=car_id).delete()
+    bump_data_version(car.company_id)
+    return True
+
+
+def _get_executor():
+    """Shared pool for car purges (None means purge inline)."""
+    global _executor
+    workers = getattr(settings, 'CAR_PURGE_WORKERS', 1)
+    if workers <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='car-purge')
+    return _executor
+
+
+def schedule_purge(car_id: int) -> None:
+    """Purge the car after the current transaction commits, off the request thread."""
+    executor = _get_executor()
+
+    def run():
+        try:
+            purge_car(car_id)
+        except Exception:
+            logger.exception(f"Purging car #{car_id} failed")
+        finally:
+            if executor is not None:
+                connections.close_all()
+
+    transaction.on_commit(run if executor is None else lambda: executor.submit(run))
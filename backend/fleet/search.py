@@ -0,0 +1,28 @@
+"""
+Поисковые индексы автопарка (см. core.search).
+
+Поля должны совпадать с search_fields соответствующих viewset'ов и с
+GIN-индексами миграции 0010_search_indexes.
+"""
+from django.db.models.signals import post_migrate
+
+from core.search import install_fts5_indexes, register_search_index
+
+from .models import Accumulator, Car, Spare, Tires
+
+SEARCH_FIELDS = {
+    Car: ('numplate', 'vin', 'driver', 'title', 'drivers_phone', 'fuel_card'),
+    Spare: ('title', 'description', 'job_description'),
+    Tires: ('model', 'size'),
+    Accumulator: ('model', 'serial_number', 'capacity'),
+}
+
+
+def _install_fts5_indexes(sender, using='default', **kwargs):
+    install_fts5_indexes(using)
+
+
+def register_search_indexes():
+    for model, fields in SEARCH_FIELDS.items():
+        register_search_index(model, fields)
+    post_migrate.connect(_install_fts5_indexes, dispatch_uid='fleet_install_fts5_indexes')
@@ -1,9 +1,68 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.utils import timezone
 from rest_framework import serializers
 
+from core.serializers import SparseFieldsetModelSerializer
+
 from .models import Accumulator, Car, CarPhoto, Fuel, Insurance, Inspection, Spare, Tires
 
 
-class CarListSerializer(serializers.ModelSerializer):
+class ImageVariantsField(serializers.Field):
+    """
+    URLs of the resized copies of an image field: ``{"thumb": {"webp": url, "jpeg": url}, "medium": {...}}``.
+
+    ``null`` while the variants are not rendered yet (clients fall back to the original).
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field)
+        variants = getattr(instance, f'{self.image_field}_variants') or {}
+        if not image or variants.get('source') != image.name:
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for variant, names in variants.items():
+            if variant == 'source':
+                continue
+            urls[variant] = {}
+            for ext, name in names.items():
+                url = default_storage.url(name)
+                urls[variant][ext] = request.build_absolute_uri(url) if request is not None else url
+        return urls
+
+
+class CompanyCarField(serializers.PrimaryKeyRelatedField):
+    """Car reference resolved from the company cars preloaded for a whole batch (no query per row)."""
+    default_error_messages = {
+        'not_owned': 'Car does not belong to your company',
+    }
+
+    def __init__(self, cars, **kwargs):
+        self.cars = cars
+        kwargs.setdefault('queryset', Car.objects.none())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        car = self.cars.get(pk)
+        if car is None:
+            self.fail('not_owned')
+        return car
+
+
+class CarListSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = Car
         fields = [
@@ -16,7 +75,7 @@ class CarListSerializer(serializers.ModelSerializer):
         ]
 
 
-class CarDetailSerializer(serializers.ModelSerializer):
+class CarDetailSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = Car
         fields = [
@@ -50,6 +109,28 @@ class CarCreateUpdateSerializer(CarDetailSerializer):
     pass
 
 
+class CarListWithCountsSerializer(CarListSerializer):
+    """List serializer for ``?with_counts=1`` (queryset annotated with related counts)."""
+    related_counts = serializers.SerializerMethodField()
+
+    class Meta(CarListSerializer.Meta):
+        fields = CarListSerializer.Meta.fields + ['related_counts']
+
+    def get_related_counts(self, obj):
+        return obj.related_counts()
+
+
+class CarDetailWithCountsSerializer(CarDetailSerializer):
+    """Detail serializer for ``?with_counts=1`` (queryset annotated with related counts)."""
+    related_counts = serializers.SerializerMethodField()
+
+    class Meta(CarDetailSerializer.Meta):
+        fields = CarDetailSerializer.Meta.fields + ['related_counts']
+
+    def get_related_counts(self, obj):
+        return obj.related_counts()
+
+
 class CarRelatedStatsSerializer(serializers.Serializer):
     """Serializer для подсчета связанных записей автомобиля"""
     fuel_records = serializers.IntegerField()
@@ -62,13 +143,16 @@ class CarRelatedStatsSerializer(serializers.Serializer):
     total = serializers.IntegerField()
 
 
-class CarPhotoSerializer(serializers.ModelSerializer):
+class CarPhotoSerializer(SparseFieldsetModelSerializer):
+    image_variants = ImageVariantsField('image')
+
     class Meta:
         model = CarPhoto
         fields = [
             'id',
             'car',
             'image',
+            'image_variants',
             'comment',
             'uploaded_at',
         ]
@@ -79,7 +163,7 @@ class CarPhotoSerializer(serializers.ModelSerializer):
         ]
 
 
-class SpareListSerializer(serializers.ModelSerializer):
+class SpareListSerializer(SparseFieldsetModelSerializer):
     car_numplate = serializers.CharField(source='car.numplate', read_only=True)
 
     class Meta:
@@ -96,7 +180,7 @@ class SpareListSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'car_numplate']
 
 
-class SpareDetailSerializer(serializers.ModelSerializer):
+class SpareDetailSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = Spare
         fields = [
@@ -118,8 +202,9 @@ class SpareCreateUpdateSerializer(SpareDetailSerializer):
     pass
 
 
-class TiresListSerializer(serializers.ModelSerializer):
+class TiresListSerializer(SparseFieldsetModelSerializer):
     car_numplate = serializers.CharField(source='car.numplate', read_only=True)
+    photo_variants = ImageVariantsField('photo')
 
     class Meta:
         model = Tires
@@ -130,13 +215,16 @@ class TiresListSerializer(serializers.ModelSerializer):
             'model',
             'size',
             'price',
+            'photo_variants',
             'installed_at',
             'expires_at',
         ]
         read_only_fields = ['id', 'car_numplate']
 
 
-class TiresDetailSerializer(serializers.ModelSerializer):
+class TiresDetailSerializer(SparseFieldsetModelSerializer):
+    photo_variants = ImageVariantsField('photo')
+
     class Meta:
         model = Tires
         fields = [
@@ -146,6 +234,7 @@ class TiresDetailSerializer(serializers.ModelSerializer):
             'size',
             'price',
             'photo',
+            'photo_variants',
             'installed_at',
             'expires_at',
             'created_at',
@@ -158,8 +247,9 @@ class TiresCreateUpdateSerializer(TiresDetailSerializer):
     pass
 
 
-class AccumulatorListSerializer(serializers.ModelSerializer):
+class AccumulatorListSerializer(SparseFieldsetModelSerializer):
     car_numplate = serializers.CharField(source='car.numplate', read_only=True)
+    photo_variants = ImageVariantsField('photo')
 
     class Meta:
         model = Accumulator
@@ -171,13 +261,16 @@ class AccumulatorListSerializer(serializers.ModelSerializer):
             'serial_number',
             'capacity',
             'price',
+            'photo_variants',
             'installed_at',
             'expires_at',
         ]
         read_only_fields = ['id', 'car_numplate']
 
 
-class AccumulatorDetailSerializer(serializers.ModelSerializer):
+class AccumulatorDetailSerializer(SparseFieldsetModelSerializer):
+    photo_variants = ImageVariantsField('photo')
+
     class Meta:
         model = Accumulator
         fields = [
@@ -190,6 +283,7 @@ class AccumulatorDetailSerializer(serializers.ModelSerializer):
             'installed_at',
             'expires_at',
             'photo',
+            'photo_variants',
             'created_at',
             'updated_at',
         ]
@@ -200,7 +294,7 @@ class AccumulatorCreateUpdateSerializer(AccumulatorDetailSerializer):
     pass
 
 
-class FuelListSerializer(serializers.ModelSerializer):
+class FuelListSerializer(SparseFieldsetModelSerializer):
     car_numplate = serializers.CharField(source='car.numplate', read_only=True)
 
     class Meta:
@@ -220,7 +314,7 @@ class FuelListSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'car_numplate', 'month_name', 'consumption']
 
 
-class FuelDetailSerializer(serializers.ModelSerializer):
+class FuelDetailSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = Fuel
         fields = [
@@ -243,7 +337,56 @@ class FuelCreateUpdateSerializer(FuelDetailSerializer):
     pass
 
 
-class InsuranceListSerializer(serializers.ModelSerializer):
+class FuelBulkRowSerializer(serializers.Serializer):
+    """One row of POST /fuel/bulk/ (car ownership is checked for all rows at once)."""
+    car = serializers.IntegerField(min_value=1)
+    year = serializers.IntegerField(min_value=1)
+    month = serializers.IntegerField(min_value=1, max_value=12)
+    liters = serializers.IntegerField(min_value=0, default=0)
+    total_cost = serializers.IntegerField(min_value=0, default=0)
+    monthly_mileage = serializers.IntegerField(min_value=0, default=0)
+
+
+class FuelTransactionRowSerializer(serializers.Serializer):
+    """One fuel card transaction; the car is matched by ID, numplate or fuel card (in that order)."""
+    txn_id = serializers.CharField(max_length=100)
+    occurred_at = serializers.DateTimeField()
+    liters = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0)
+    car = serializers.IntegerField(min_value=1, required=False)
+    numplate = serializers.CharField(max_length=20, required=False)
+    card_number = serializers.CharField(max_length=80, required=False, allow_blank=True)
+    station = serializers.CharField(max_length=255, required=False, allow_blank=True)
+
+    def validate(self, attrs):
+        if not (attrs.get('car') or attrs.get('numplate') or attrs.get('card_number')):
+            raise serializers.ValidationError('One of car, numplate or card_number is required')
+        return attrs
+
+
+class TelemetryPointSerializer(serializers.Serializer):
+    """One tracker reading (odometer in km); the car is matched by ID or numplate."""
+    car = serializers.IntegerField(min_value=1, required=False)
+    numplate = serializers.CharField(max_length=20, required=False)
+    ts = serializers.DateTimeField()
+    # Packed as whole meters into 32 bits
+    odometer = serializers.DecimalField(max_digits=10, decimal_places=3, min_value=0, max_value=4_000_000)
+    lat = serializers.FloatField(min_value=-90, max_value=90, required=False, allow_null=True)
+    lon = serializers.FloatField(min_value=-180, max_value=180, required=False, allow_null=True)
+    speed = serializers.FloatField(min_value=0, max_value=6000, required=False, allow_null=True)
+
+    def validate_ts(self, value):
+        if value > timezone.now() + timedelta(minutes=5):
+            raise serializers.ValidationError('Reading is in the future')
+        return value
+
+    def validate(self, attrs):
+        if not (attrs.get('car') or attrs.get('numplate')):
+            raise serializers.ValidationError('One of car or numplate is required')
+        return attrs
+
+
+class InsuranceListSerializer(SparseFieldsetModelSerializer):
     car_numplate = serializers.CharField(source='car.numplate', read_only=True)
 
     class Meta:
@@ -261,7 +404,7 @@ class InsuranceListSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'car_numplate']
 
 
-class InsuranceDetailSerializer(serializers.ModelSerializer):
+class InsuranceDetailSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = Insurance
         fields = [
@@ -282,7 +425,7 @@ class InsuranceCreateUpdateSerializer(InsuranceDetailSerializer):
     pass
 
 
-class InspectionListSerializer(serializers.ModelSerializer):
+class InspectionListSerializer(SparseFieldsetModelSerializer):
     car_numplate = serializers.CharField(source='car.numplate', read_only=True)
 
     class Meta:
@@ -293,12 +436,13 @@ class InspectionListSerializer(serializers.ModelSerializer):
             'car_numplate',
             'number',
             'inspected_at',
+            'valid_until',
             'cost',
         ]
-        read_only_fields = ['id', 'car_numplate']
+        read_only_fields = ['id', 'car_numplate', 'valid_until']
 
 
-class InspectionDetailSerializer(serializers.ModelSerializer):
+class InspectionDetailSerializer(SparseFieldsetModelSerializer):
     class Meta:
         model = Inspection
         fields = [
@@ -306,11 +450,12 @@ class InspectionDetailSerializer(serializers.ModelSerializer):
             'car',
             'number',
             'inspected_at',
+            'valid_until',
             'cost',
             'created_at',
             'updated_at',
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'valid_until', 'created_at', 'updated_at']
 
 
 class InspectionCreateUpdateSerializer(InspectionDetailSerializer):
@@ -0,0 +1,575 @@
+"""
+Сервисы массовой записи данных автопарка.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from copy import copy
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, List, Optional, TypedDict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DecimalField, F, FloatField, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Cast, ExtractMonth, ExtractYear, Round
+from django.utils import timezone
+
+from .models import Accumulator, Car, Fuel, FuelTransaction, Inspection, Insurance, Spare, Tires
+from .purge import soft_delete_cars
+from .serializers import (
+    AccumulatorCreateUpdateSerializer,
+    CarCreateUpdateSerializer,
+    CompanyCarField,
+    FuelBulkRowSerializer,
+    FuelCreateUpdateSerializer,
+    FuelTransactionRowSerializer,
+    InspectionCreateUpdateSerializer,
+    InsuranceCreateUpdateSerializer,
+    SpareCreateUpdateSerializer,
+    TiresCreateUpdateSerializer,
+)
+from .signals import bulk_saved
+
+FUEL_BULK_MAX_ROWS = 5000
+FUEL_BULK_CHUNK_SIZE = 500
+FUEL_UPSERT_FIELDS = ['liters', 'total_cost', 'monthly_mileage', 'consumption', 'month_name', 'updated_at']
+
+FUEL_TXN_MAX_ROWS = 5000
+FUEL_TXN_CHUNK_SIZE = 1000
+
+BATCH_MAX_OPERATIONS = 1000
+BATCH_CHUNK_SIZE = 500
+BATCH_OPERATIONS = ('create', 'update', 'delete')
+
+# model name (as in the API routes) -> model and its create/update serializer
+BATCH_MODELS = {
+    'cars': (Car, CarCreateUpdateSerializer),
+    'spares': (Spare, SpareCreateUpdateSerializer),
+    'tires': (Tires, TiresCreateUpdateSerializer),
+    'accumulators': (Accumulator, AccumulatorCreateUpdateSerializer),
+    'fuel': (Fuel, FuelCreateUpdateSerializer),
+    'insurances': (Insurance, InsuranceCreateUpdateSerializer),
+    'inspections': (Inspection, InspectionCreateUpdateSerializer),
+}
+
+# Fields recomputed by normalize(): written by bulk_update along with the edited ones
+BATCH_DERIVED_FIELDS = {
+    Car: ['numplate', 'driver', 'commissioned_at'],
+    Fuel: ['month_name', 'consumption'],
+    Inspection: ['valid_until'],
+}
+
+
+class BulkRowResult(TypedDict):
+    index: int
+    status: str  # 'created', 'updated', 'deleted', 'duplicate', 'error' or 'skipped'
+    id: Optional[int]
+    errors: Optional[Dict[str, Any]]
+
+
+class BulkResult(TypedDict):
+    created: int
+    updated: int
+    failed: int
+    results: List[BulkRowResult]
+
+
+class FuelTransactionResult(TypedDict):
+    created: int
+    duplicates: int
+    failed: int
+    months_updated: int
+    results: List[BulkRowResult]
+
+
+class BatchResult(TypedDict):
+    applied: bool
+    created: int
+    updated: int
+    deleted: int
+    failed: int
+    results: List[BulkRowResult]
+
+
+def _row_error(index: int, errors: Dict[str, Any]) -> BulkRowResult:
+    return {'index': index, 'status': 'error', 'id': None, 'errors': errors}
+
+
+def _fuel_keys_q(keys) -> Q:
+    """Records of the given cars in the given months (superset of ``keys``)."""
+    period_q = Q()
+    for year, month in {(year, month) for _, year, month in keys}:
+        period_q |= Q(year=year, month=month)
+    return Q(car_id__in={car_id for car_id, _, _ in keys}) & period_q
+
+
+def bulk_upsert_fuel(*, company_id: int, rows: List[dict]) -> BulkResult:
+    """
+    Массовая запись помесячного топлива: создание или обновление по (car, year, month).
+
+    Каждая строка валидируется отдельно, принадлежность машин компании
+    проверяется одним запросом. Валидные строки пишутся пачками через
+    bulk_create(update_conflicts=True) в одной транзакции; результат
+    возвращается по каждой строке.
+    """
+    results: List[Optional[BulkRowResult]] = [None] * len(rows)
+
+    valid: Dict[tuple, tuple] = {}  # (car_id, year, month) -> (index, data)
+    for index, row in enumerate(rows):
+        serializer = FuelBulkRowSerializer(data=row)
+        if not serializer.is_valid():
+            results[index] = _row_error(index, serializer.errors)
+            continue
+        data = serializer.validated_data
+        key = (data['car'], data['year'], data['month'])
+        if key in valid:
+            results[index] = _row_error(index, {'non_field_errors': ['Duplicate car/year/month in this request']})
+            continue
+        valid[key] = (index, data)
+
+    cars = Car.objects.filter(
+        company_id=company_id, pk__in={car_id for car_id, _, _ in valid}
+    ).only('id', 'company_id', 'numplate').in_bulk()
+
+    instances: Dict[tuple, Fuel] = {}
+    for key, (index, data) in valid.items():
+        car = cars.get(data['car'])
+        if car is None:
+            results[index] = _row_error(index, {'car': ['Car does not belong to your company']})
+            continue
+        instances[key] = Fuel(
+            car=car,
+            company_id=company_id,
+            year=data['year'],
+            month=data['month'],
+            liters=data['liters'],
+            total_cost=data['total_cost'],
+            monthly_mileage=data['monthly_mileage'],
+            month_name=Fuel._month_name(data['month']),
+            consumption=Fuel._consumption(data['liters'], data['monthly_mileage']),
+        )
+
+    created = set()
+    if instances:
+        keys_q = _fuel_keys_q(instances)
+        with transaction.atomic():
+            existing = {
+                key for key in Fuel.objects.filter(keys_q).values_list('car_id', 'year', 'month')
+                if key in instances
+            }
+            objs = list(instances.values())
+            for start in range(0, len(objs), FUEL_BULK_CHUNK_SIZE):
+                Fuel.objects.bulk_create(
+                    objs[start:start + FUEL_BULK_CHUNK_SIZE],
+                    update_conflicts=True,
+                    unique_fields=['car', 'year', 'month'],
+                    update_fields=FUEL_UPSERT_FIELDS,
+                )
+
+            # Upserted rows do not reliably get their pk back, read them in one query
+            for car_id, year, month, pk in Fuel.objects.filter(keys_q).values_list('car_id', 'year', 'month', 'id'):
+                instance = instances.get((car_id, year, month))
+                if instance is not None:
+                    instance.pk = pk
+                    if (car_id, year, month) not in existing:
+                        created.add(pk)
+
+            bulk_saved.send(sender=Fuel, company_id=company_id, instances=objs, created=created)
+
+    for key, instance in instances.items():
+        index, _ = valid[key]
+        results[index] = {
+            'index': index,
+            'status': 'created' if instance.pk in created else 'updated',
+            'id': instance.pk,
+            'errors': None,
+        }
+
+    failed = sum(1 for result in results if result['status'] == 'error')
+    return {
+        'created': len(created),
+        'updated': len(instances) - len(created),
+        'failed': failed,
+        'results': results,
+    }
+
+
+def _operation_error(operation) -> Optional[Dict[str, Any]]:
+    if not isinstance(operation, dict):
+        return {'non_field_errors': ['Expected an object']}
+    errors = {}
+    if operation.get('op') not in BATCH_OPERATIONS:
+        errors['op'] = [f"Expected one of: {', '.join(BATCH_OPERATIONS)}"]
+    if operation.get('model') not in BATCH_MODELS:
+        errors['model'] = [f"Expected one of: {', '.join(BATCH_MODELS)}"]
+    if operation.get('op') in ('update', 'delete'):
+        if isinstance(operation.get('id'), bool) or not isinstance(operation.get('id'), int):
+            errors['id'] = ['Expected an integer']
+    if operation.get('op') in ('create', 'update') and not isinstance(operation.get('data'), dict):
+        errors['data'] = ['Expected an object']
+    return errors or None
+
+
+def _batch_serializer(serializer_class, cars, data, instance=None):
+    serializer = serializer_class(instance, data=data, partial=instance is not None)
+    if 'car' in serializer.fields:
+        # Car ownership is checked against the cars loaded once for the batch
+        serializer.fields['car'] = CompanyCarField(cars)
+    return serializer
+
+
+def apply_batch(*, company_id: int, operations: List[dict]) -> BatchResult:
+    """
+    Пакетные create / update / delete по моделям автопарка в одной транзакции.
+
+    Операция: {"op": "create"|"update"|"delete", "model": "cars"|"spares"|...,
+    "id": <для update/delete>, "data": {...}}. Все записи и машины пакета
+    загружаются несколькими запросами с фильтром по компании, затем каждая
+    операция валидируется сериализатором модели. Если хоть одна операция
+    невалидна, ничего не записывается; иначе записи пишутся через
+    bulk_create / bulk_update / QuerySet.delete по моделям.
+    """
+    results: List[Optional[BulkRowResult]] = [None] * len(operations)
+
+    # Load update/delete targets and referenced cars, one query per model
+    targets = defaultdict(set)
+    car_ids = set()
+    for index, operation in enumerate(operations):
+        errors = _operation_error(operation)
+        if errors:
+            results[index] = _row_error(index, errors)
+            continue
+        if operation['op'] != 'create':
+            targets[operation['model']].add(operation['id'])
+        # "data" may be absent or null on deletes
+        data = operation.get('data')
+        car_ref = data.get('car') if isinstance(data, dict) else None
+        if isinstance(car_ref, int) and not isinstance(car_ref, bool):
+            car_ids.add(car_ref)
+
+    loaded = {
+        name: BATCH_MODELS[name][0].objects.filter(company_id=company_id, pk__in=ids).in_bulk()
+        for name, ids in targets.items()
+    }
+    # numplate is read by the activity events of created records
+    cars = Car.objects.filter(company_id=company_id, pk__in=car_ids).only('id', 'company_id', 'numplate').in_bulk()
+    if 'cars' in loaded:
+        cars.update(loaded['cars'])
+
+    creates = defaultdict(list)  # model -> [(index, instance)]
+    updates = defaultdict(dict)  # model -> {pk: (index, instance, previous, fields)}
+    deletes = defaultdict(dict)  # model -> {pk: index}
+    touched = set()
+    for index, operation in enumerate(operations):
+        if results[index] is not None:
+            continue
+        model, serializer_class = BATCH_MODELS[operation['model']]
+        op = operation['op']
+
+        instance = None
+        if op != 'create':
+            key = (model, operation['id'])
+            instance = loaded[operation['model']].get(operation['id'])
+            if instance is None:
+                results[index] = _row_error(index, {'id': ['Not found in your company']})
+                continue
+            if key in touched:
+                results[index] = _row_error(index, {'id': ['Duplicate operation on this record']})
+                continue
+            touched.add(key)
+            if op == 'delete':
+                deletes[model][instance.pk] = index
+                continue
+
+        serializer = _batch_serializer(serializer_class, cars, operation['data'], instance)
+        if not serializer.is_valid():
+            results[index] = _row_error(index, serializer.errors)
+            continue
+        data = dict(serializer.validated_data)
+
+        if op == 'create':
+            instance = model(**data)
+            if model is Car:
+                instance.company_id = company_id
+            else:
+                instance.sync_company()
+            creates[model].append((index, instance))
+            continue
+
+        car = data.pop('car', None)
+        if car is not None and car.pk != instance.car_id:
+            results[index] = _row_error(index, {'car': ['Changing car is not allowed']})
+            continue
+        previous = copy(instance)
+        for field, value in data.items():
+            setattr(instance, field, value)
+        updates[model][instance.pk] = (index, instance, previous, set(data))
+
+    failed = sum(1 for result in results if result is not None)
+    if failed:
+        for index, result in enumerate(results):
+            if result is None:
+                results[index] = {'index': index, 'status': 'skipped', 'id': None, 'errors': None}
+        return {'applied': False, 'created': 0, 'updated': 0, 'deleted': 0, 'failed': failed, 'results': results}
+
+    try:
+        with transaction.atomic():
+            _write_batch(company_id, creates, updates, deletes, results)
+    except IntegrityError as exc:
+        return {
+            'applied': False,
+            'created': 0,
+            'updated': 0,
+            'deleted': 0,
+            'failed': len(operations),
+            'results': [_row_error(index, {'non_field_errors': [str(exc)]}) for index in range(len(operations))],
+        }
+
+    statuses = [result['status'] for result in results]
+    return {
+        'applied': True,
+        'created': statuses.count('created'),
+        'updated': statuses.count('updated'),
+        'deleted': statuses.count('deleted'),
+        'failed': 0,
+        'results': results,
+    }
+
+
+def _write_batch(company_id, creates, updates, deletes, results) -> None:
+    for model, items in creates.items():
+        instances = [instance for _, instance in items]
+        for instance in instances:
+            if hasattr(instance, 'normalize'):
+                instance.normalize()
+        model.objects.bulk_create(instances, batch_size=BATCH_CHUNK_SIZE)
+        for index, instance in items:
+            results[index] = {'index': index, 'status': 'created', 'id': instance.pk, 'errors': None}
+        # bulk writes skip post_save: rollup, activity feed and cache version
+        bulk_saved.send(
+            sender=model,
+            company_id=company_id,
+            instances=instances,
+            created={instance.pk for instance in instances},
+        )
+
+    now = timezone.now()
+    for model, items in updates.items():
+        fields = {'updated_at', *BATCH_DERIVED_FIELDS.get(model, ())}
+        instances = []
+        for index, instance, _, changed in items.values():
+            fields |= changed
+            if hasattr(instance, 'normalize'):
+                instance.normalize()
+            instance.updated_at = now
+            instances.append(instance)
+            results[index] = {'index': index, 'status': 'updated', 'id': instance.pk, 'errors': None}
+        model.objects.bulk_update(instances, sorted(fields), batch_size=BATCH_CHUNK_SIZE)
+        bulk_saved.send(
+            sender=model,
+            company_id=company_id,
+            instances=instances,
+            created=set(),
+            previous=[previous for _, _, previous, _ in items.values()],
+        )
+
+    for model, indexes in deletes.items():
+        if model is Car:
+            # Cars are soft-deleted; their records are purged in the background
+            soft_delete_cars(company_id=company_id, car_ids=list(indexes))
+        else:
+            # One DELETE per model; post_delete still runs for rollups and the cache version
+            model.objects.filter(company_id=company_id, pk__in=indexes).delete()
+        for pk, index in indexes.items():
+            results[index] = {'index': index, 'status': 'deleted', 'id': pk, 'errors': None}
+
+
+def _whole(value: Decimal) -> int:
+    return int(value.quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def _resolve_transaction_cars(company_id: int, rows: List[dict]) -> Dict[tuple, Optional[Car]]:
+    """(kind, value) -> car for every car reference of the batch, in one query."""
+    ids = {row['car'] for row in rows if row.get('car')}
+    plates = {row['numplate'].strip().upper() for row in rows if row.get('numplate')}
+    cards = {row['card_number'].strip() for row in rows if row.get('card_number')}
+    refs: Dict[tuple, Optional[Car]] = {}
+    for car in Car.objects.filter(company_id=company_id).filter(
+        Q(pk__in=ids) | Q(numplate__in=plates) | Q(fuel_card__in=cards - {'-'})
+    ).only('id', 'company_id', 'numplate', 'fuel_card'):
+        refs[('car', car.pk)] = car
+        refs[('numplate', car.numplate)] = car
+        if car.fuel_card in cards:
+            # A card shared by several cars cannot be matched
+            refs[('card_number', car.fuel_card)] = None if ('card_number', car.fuel_card) in refs else car
+    return refs
+
+
+def _match_car(refs, data) -> Optional[Car]:
+    if data.get('car'):
+        return refs.get(('car', data['car']))
+    if data.get('numplate'):
+        return refs.get(('numplate', data['numplate'].strip().upper()))
+    return refs.get(('card_number', data['card_number'].strip()))
+
+
+def _month_totals(deltas: Dict[tuple, List[Decimal]]) -> Dict[tuple, List[Decimal]]:
+    """(car, year, month) -> [liters, amount] of all stored transactions of the given months, in one query."""
+    tz = timezone.get_current_timezone()
+    months_q = Q()
+    for car_id, year, month in deltas:
+        start = timezone.make_aware(datetime(year, month, 1), tz)
+        end = timezone.make_aware(datetime(year + month // 12, month % 12 + 1, 1), tz)
+        months_q |= Q(car_id=car_id, occurred_at__gte=start, occurred_at__lt=end)
+    grouped = (
+        FuelTransaction.objects.filter(months_q)
+        .annotate(period_year=ExtractYear('occurred_at', tzinfo=tz), period_month=ExtractMonth('occurred_at', tzinfo=tz))
+        .order_by()
+        .values('car_id', 'period_year', 'period_month')
+        .annotate(liters_total=Sum('liters'), amount_total=Sum('amount'))
+    )
+    return {
+        (row['car_id'], row['period_year'], row['period_month']): [row['liters_total'], row['amount_total']]
+        for row in grouped
+    }
+
+
+def _apply_monthly_deltas(company_id: int, transactions: List[FuelTransaction]) -> List[Fuel]:
+    """
+    Add the batch totals to the monthly Fuel rows: one INSERT for missing months
+    and one UPDATE ... SET liters = liters + CASE ... for all of them.
+
+    Months hold whole numbers, so the increment is the change of the rounded
+    month total of all transactions (batch rounding does not accumulate).
+    """
+    deltas: Dict[tuple, List[Decimal]] = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    for txn in transactions:
+        occurred = timezone.localtime(txn.occurred_at)
+        delta = deltas[(txn.car_id, occurred.year, occurred.month)]
+        delta[0] += txn.liters
+        delta[1] += txn.amount
+
+    # The batch is already stored: the total before it is the total minus the batch
+    totals = _month_totals(deltas)
+    increments = {
+        key: [_whole(total) - _whole(total - delta) for total, delta in zip(totals[key], delta_pair)]
+        for key, delta_pair in deltas.items()
+    }
+
+    keys_q = _fuel_keys_q(deltas)
+    existing = set(Fuel.objects.filter(keys_q).values_list('car_id', 'year', 'month'))
+    Fuel.objects.bulk_create(
+        [
+            Fuel(car_id=car_id, company_id=company_id, year=year, month=month, month_name=Fuel._month_name(month))
+            for car_id, year, month in deltas.keys() - existing
+        ],
+        ignore_conflicts=True,
+    )
+
+    def per_month(index):
+        return Case(
+            *[
+                When(car_id=car_id, year=year, month=month, then=Value(increment[index]))
+                for (car_id, year, month), increment in increments.items()
+            ],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+    liters = F('liters') + per_month(0)
+    # SET expressions read the old column values, so the new liters are recomputed here
+    consumption = Case(
+        When(monthly_mileage__gt=0, then=Round(Cast(liters, FloatField()) * 100.0 / F('monthly_mileage'), 2)),
+        default=Value(0),
+        output_field=DecimalField(max_digits=7, decimal_places=2),
+    )
+    Fuel.objects.filter(keys_q).update(
+        liters=liters,
+        total_cost=F('total_cost') + per_month(1),
+        consumption=consumption,
+        updated_at=timezone.now(),
+    )
+
+    # The car is read by the activity feed of every row
+    fuels = [
+        fuel for fuel in Fuel.objects.filter(keys_q).select_related('car')
+        if (fuel.car_id, fuel.year, fuel.month) in deltas
+    ]
+    created = {fuel.pk for fuel in fuels if (fuel.car_id, fuel.year, fuel.month) not in existing}
+    # update() skips post_save: rollup, activity feed and cache version
+    bulk_saved.send(sender=Fuel, company_id=company_id, instances=fuels, created=created)
+    return fuels
+
+
+def ingest_fuel_transactions(*, company_id: int, rows: List[dict]) -> FuelTransactionResult:
+    """
+    Прием транзакций топливных карт пачкой.
+
+    Строки валидируются, машины сопоставляются одним запросом, повторы по
+    ID транзакции провайдера (в пачке и в базе) пропускаются. Новые
+    транзакции пишутся через bulk_create, а помесячные строки Fuel
+    увеличиваются на изменение округленных сумм месяца одним UPDATE.
+    """
+    results: List[Optional[BulkRowResult]] = [None] * len(rows)
+    valid: Dict[str, tuple] = {}  # txn_id -> (index, data)
+    for index, row in enumerate(rows):
+        serializer = FuelTransactionRowSerializer(data=row)
+        if not serializer.is_valid():
+            results[index] = _row_error(index, serializer.errors)
+            continue
+        data = serializer.validated_data
+        if data['txn_id'] in valid:
+            results[index] = {'index': index, 'status': 'duplicate', 'id': None, 'errors': None}
+            continue
+        valid[data['txn_id']] = (index, data)
+
+    refs = _resolve_transaction_cars(company_id, [data for _, data in valid.values()])
+    pending: Dict[str, tuple] = {}
+    for txn_id, (index, data) in valid.items():
+        car = _match_car(refs, data)
+        if car is None:
+            results[index] = _row_error(index, {'car': ['No car of your company matches this transaction']})
+            continue
+        pending[txn_id] = (index, FuelTransaction(
+            car=car,
+            company_id=company_id,
+            provider_txn_id=txn_id,
+            occurred_at=data['occurred_at'],
+            liters=data['liters'],
+            amount=data['amount'],
+            card_number=data.get('card_number') or '',
+            station=data.get('station') or '',
+        ))
+
+    fuels = []
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                seen = set(
+                    FuelTransaction.objects.filter(company_id=company_id, provider_txn_id__in=pending)
+                    .values_list('provider_txn_id', flat=True)
+                )
+                new = [txn for txn_id, (_, txn) in pending.items() if txn_id not in seen]
+                FuelTransaction.objects.bulk_create(new, batch_size=FUEL_TXN_CHUNK_SIZE)
+                if new:
+                    fuels = _apply_monthly_deltas(company_id, new)
+            break
+        except IntegrityError:
+            # Another ingestion stored some of these IDs meanwhile: re-check once
+            if attempt:
+                raise
+
+    for txn_id, (index, txn) in pending.items():
+        if txn_id in seen:
+            results[index] = {'index': index, 'status': 'duplicate', 'id': None, 'errors': None}
+        else:
+            results[index] = {'index': index, 'status': 'created', 'id': txn.pk, 'errors': None}
+
+    statuses = [result['status'] for result in results]
+    return {
+        'created': statuses.count('created'),
+        'duplicates': statuses.count('duplicate'),
+        'failed': statuses.count('error'),
+        'months_updated': len(fuels),
+        'results': results,
+    }
@@ -0,0 +1,51 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+
+from core.cache import bump_data_version_on_commit
+
+# Sent after bulk writes that bypass post_save (bulk_create with upsert, bulk_update).
+# Arguments: company_id, instances (saved objects with pk and car set),
+# created (set of pks that were inserted rather than updated) and optionally
+# previous (copies of updated objects as they were before the update).
+bulk_saved = Signal()
+
+TELEMETRY_MODEL_NAMES = ('telemetrybucket', 'dailymileage', 'monthlymileage')
+
+
+def _company_id(instance):
+    company_id = getattr(instance, 'company_id', None)
+    if company_id is not None:
+        return company_id
+    car_id = getattr(instance, 'car_id', None)
+    if car_id is None:
+        return None
+    from .models import Car
+
+    return Car.objects.filter(pk=car_id).values_list('company_id', flat=True).first()
+
+
+def _bump_company_version(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    company_id = _company_id(instance)
+    if company_id is not None:
+        bump_data_version_on_commit(company_id)
+
+
+def _bump_after_bulk_save(sender, company_id, **kwargs):
+    bump_data_version_on_commit(company_id)
+
+
+def connect_signals():
+    bulk_saved.connect(_bump_after_bulk_save, dispatch_uid='fleet_data_version_bulk_saved')
+    for model in apps.get_app_config('fleet').get_models():
+        if model._meta.model_name == 'tombstone':
+            # Written by deletes that already bump the version
+            continue
+        if model._meta.model_name in TELEMETRY_MODEL_NAMES:
+            # Tracker writes are bulk and frequent; only the Fuel mileage they feed bumps the version
+            continue
+        uid = f'fleet_data_version_{model.__name__}'
+        post_save.connect(_bump_company_version, sender=model, dispatch_uid=f'{uid}_post_save')
+        post_delete.connect(_bump_company_version, sender=model, dispatch_uid=f'{uid}_post_delete')
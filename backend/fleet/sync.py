@@ -0,0 +1,182 @@
+"""
+Инкрементальная синхронизация автопарка (GET /sync/?since=<token>).
+
+Изменения выбираются по индексам (company, updated_at, id) каждой модели,
+удаления — из таблицы Tombstone, которая пополняется по post_delete.
+Токен непрозрачный: в нем хранятся позиции (updated_at, id) по каждой
+модели и по удалениям, поэтому повторный запрос стоит O(изменений).
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, TypedDict
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import post_delete
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Accumulator, Car, Fuel, Inspection, Insurance, Spare, Tires, Tombstone, exclude_deleted_cars
+from .serializers import (
+    AccumulatorDetailSerializer,
+    CarDetailSerializer,
+    FuelDetailSerializer,
+    InspectionDetailSerializer,
+    InsuranceDetailSerializer,
+    SpareDetailSerializer,
+    TiresDetailSerializer,
+)
+
+SYNC_PAGE_SIZE = 500
+SYNC_TOKEN_VERSION = 1
+
+# name (as in the API routes) -> model and serializer of the synced rows
+SYNC_MODELS = {
+    'cars': (Car, CarDetailSerializer),
+    'spares': (Spare, SpareDetailSerializer),
+    'tires': (Tires, TiresDetailSerializer),
+    'accumulators': (Accumulator, AccumulatorDetailSerializer),
+    'fuel': (Fuel, FuelDetailSerializer),
+    'insurances': (Insurance, InsuranceDetailSerializer),
+    'inspections': (Inspection, InspectionDetailSerializer),
+}
+SYNC_MODEL_NAMES = {model: name for name, (model, _) in SYNC_MODELS.items()}
+
+
+class SyncResult(TypedDict):
+    changes: Dict[str, List[Dict[str, Any]]]
+    deleted: Dict[str, List[int]]
+    next_token: str
+    has_more: bool
+    reset: bool
+
+
+def settle_seconds() -> int:
+    """
+    Changes newer than this are left for the next sync.
+
+    ``updated_at`` is set before the transaction commits, so a row may become
+    visible after newer rows were already handed out; the settle window keeps
+    the watermark behind transactions that are still in flight.
+    """
+    return getattr(settings, 'SYNC_SETTLE_SECONDS', 5)
+
+
+def tombstone_retention() -> timedelta:
+    return timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+def _encode_token(positions: Dict[str, Optional[list]], issued_at: datetime) -> str:
+    raw = json.dumps(
+        {'v': SYNC_TOKEN_VERSION, 'issued': issued_at.isoformat(), 'positions': positions},
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_token(token: str):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+        if payload['v'] != SYNC_TOKEN_VERSION:
+            raise ValueError
+        positions = {}
+        for name, position in payload['positions'].items():
+            if position is not None:
+                updated_at, pk = position
+                position = (datetime.fromisoformat(updated_at), int(pk))
+            positions[name] = position
+        return positions
+    except Exception:
+        raise ValidationError({'since': 'Invalid sync token'})
+
+
+def _after(field: str, position) -> Q:
+    updated_at, pk = position
+    return Q(**{f'{field}__gt': updated_at}) | Q(**{field: updated_at, 'pk__gt': pk})
+
+
+def _page(queryset, field: str, position, horizon, limit: int):
+    queryset = queryset.filter(**{f'{field}__lt': horizon})
+    if position is not None:
+        queryset = queryset.filter(_after(field, position))
+    rows = list(queryset.order_by(field, 'pk')[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def get_changes(*, company_id: int, since: Optional[str], limit: int = SYNC_PAGE_SIZE, context=None) -> SyncResult:
+    """
+    Записи компании, созданные, измененные или удаленные после ``since``.
+
+    Без токена (или если позиция удалений в токене старше срока их хранения,
+    т.е. часть надгробий могла быть уже удалена) возвращает все
+    записи и ``reset=True``: клиент должен заменить локальный кэш. При
+    ``has_more=True`` следующую порцию нужно запросить с ``next_token``.
+    """
+    now = timezone.now()
+    horizon = now - timedelta(seconds=settle_seconds())
+    positions, reset = {}, True
+    if since:
+        positions = _decode_token(since)
+        # Every page re-issues the token, but only a caught-up page advances
+        # the deletions position: that is what the purge may have overtaken
+        deleted_position = positions.get('deleted')
+        reset = deleted_position is None or deleted_position[0] < now - tombstone_retention()
+        if reset:
+            positions = {}
+    if reset:
+        # Deletions before the full snapshot are already reflected in it
+        positions = {name: None for name in SYNC_MODELS}
+        positions['deleted'] = (horizon, 0)
+
+    has_more = False
+    changes = {}
+    for name, (model, serializer_class) in SYNC_MODELS.items():
+        position = positions.get(name)
+        queryset = model.objects.filter(company_id=company_id)
+        if model is not Car:
+            # Records of soft-deleted cars are hidden until the purge sends their tombstones
+            queryset = exclude_deleted_cars(queryset, company_id)
+        rows, more = _page(queryset, 'updated_at', position, horizon, limit)
+        has_more |= more
+        if rows:
+            positions[name] = (rows[-1].updated_at, rows[-1].pk)
+        changes[name] = serializer_class(rows, many=True, context=context or {}).data
+
+    tombstones, more = _page(
+        Tombstone.objects.filter(company_id=company_id), 'deleted_at', positions.get('deleted') or (horizon, 0),
+        horizon, limit,
+    )
+    has_more |= more
+    deleted = {name: [] for name in SYNC_MODELS}
+    for tombstone in tombstones:
+        deleted.setdefault(tombstone.model, []).append(tombstone.object_id)
+    if more:
+        positions['deleted'] = (tombstones[-1].deleted_at, tombstones[-1].pk)
+    else:
+        # All deletions up to the horizon are handed out: without this a client
+        # with no deletions for a while would get a needless full resync
+        positions['deleted'] = (horizon, 0)
+
+    encoded = {
+        name: None if position is None else [position[0].isoformat(), position[1]]
+        for name, position in positions.items()
+    }
+    return {
+        'changes': changes,
+        'deleted': deleted,
+        'next_token': _encode_token(encoded, now),
+        'has_more': has_more,
+        'reset': reset,
+    }
+
+
+def _record_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(company_id=instance.company_id, model=SYNC_MODEL_NAMES[sender], object_id=instance.pk)
+
+
+def connect_signals():
+    for model, name in SYNC_MODEL_NAMES.items():
+        post_delete.connect(_record_tombstone, sender=model, dispatch_uid=f'fleet_sync_tombstone_{name}')
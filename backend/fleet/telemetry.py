@@ -0,0 +1,326 @@
+"""
+Телеметрия трекеров: прием показаний одометра/GPS и суточный/месячный пробег.
+
+Показания машины за локальный час хранятся одной строкой TelemetryBucket:
+отсчеты упакованы в ``samples`` по 16 байт (см. SAMPLE). Пачка показаний
+записывается несколькими запросами независимо от своего размера, затем
+затронутые сутки пересчитываются в DailyMileage, месяцы — в MonthlyMileage,
+а при включенном TELEMETRY_FEEDS_FUEL_MILEAGE (по умолчанию выключен)
+пробег месяца записывается в Fuel.monthly_mileage вместо введенного вручную.
+"""
+from __future__ import annotations
+
+import math
+import struct
+from collections import defaultdict
+from copy import copy
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Set, Tuple, TypedDict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear, TruncDate
+from django.utils import timezone
+
+from .models import DailyMileage, Fuel, MonthlyMileage, TelemetryBucket
+from .serializers import TelemetryPointSerializer
+from .services import BulkRowResult, _fuel_keys_q, _match_car, _resolve_transaction_cars, _row_error
+from .signals import bulk_saved
+
+TELEMETRY_MAX_POINTS = 5000
+TELEMETRY_CHUNK_SIZE = 500
+
+# Second of the hour, odometer (m), lat, lon, speed (0.1 km/h); NaN / NO_SPEED when not reported
+SAMPLE = struct.Struct('<HIffH')
+NO_SPEED = 0xFFFF
+
+
+class TelemetrySample(TypedDict):
+    ts: datetime
+    odometer: int  # meters
+    lat: Optional[float]
+    lon: Optional[float]
+    speed: Optional[float]  # km/h
+
+
+class TelemetryResult(TypedDict):
+    accepted: int
+    duplicates: int
+    failed: int
+    buckets: int
+    days_updated: int
+    months_updated: int
+    fuel_updated: int
+    errors: List[BulkRowResult]
+
+
+def _bucket_start(moment: datetime) -> datetime:
+    # Local hours, so that every bucket belongs to exactly one local day
+    return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def _day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _sample_values(data) -> tuple:
+    lat, lon, speed = data.get('lat'), data.get('lon'), data.get('speed')
+    return (
+        int(data['odometer'] * 1000),
+        math.nan if lat is None else lat,
+        math.nan if lon is None else lon,
+        NO_SPEED if speed is None else round(speed * 10),
+    )
+
+
+def _pack(samples: Dict[int, tuple]) -> bytes:
+    return b''.join(SAMPLE.pack(offset, *samples[offset]) for offset in sorted(samples))
+
+
+def _unpack(raw) -> Dict[int, tuple]:
+    return {offset: values for offset, *values in SAMPLE.iter_unpack(bytes(raw))}
+
+
+def unpack_samples(bucket: TelemetryBucket) -> List[TelemetrySample]:
+    """Readings of a bucket in time order."""
+    samples = []
+    for offset, (odometer, lat, lon, speed) in sorted(_unpack(bucket.samples).items()):
+        samples.append({
+            'ts': bucket.bucket_start + timedelta(seconds=offset),
+            'odometer': odometer,
+            'lat': None if math.isnan(lat) else lat,
+            'lon': None if math.isnan(lon) else lon,
+            'speed': None if speed == NO_SPEED else speed / 10,
+        })
+    return samples
+
+
+def _write_buckets(company_id: int, incoming: Dict[tuple, Dict[int, tuple]]) -> Tuple[int, int, Dict[int, Set[date]]]:
+    """
+    Merge the readings into their hour buckets: one locking SELECT, one INSERT
+    and one UPDATE. Returns (new readings, written buckets, touched days per car).
+    """
+    existing = {
+        (bucket.car_id, bucket.bucket_start): bucket
+        for bucket in TelemetryBucket.objects.select_for_update().filter(
+            car_id__in={car_id for car_id, _ in incoming},
+            bucket_start__in={start for _, start in incoming},
+        )
+    }
+    now = timezone.now()
+    created, updated = [], []
+    added = 0
+    touched: Dict[int, Set[date]] = defaultdict(set)
+    for (car_id, start), samples in incoming.items():
+        bucket = existing.get((car_id, start))
+        merged = _unpack(bucket.samples) if bucket is not None else {}
+        count = len(merged)
+        # A repeated second replaces the stored reading
+        merged.update(samples)
+        packed = _pack(merged)
+        if bucket is None:
+            bucket = TelemetryBucket(car_id=car_id, company_id=company_id, bucket_start=start)
+            created.append(bucket)
+        elif packed == bytes(bucket.samples):
+            continue
+        else:
+            updated.append(bucket)
+        added += len(merged) - count
+        odometers = [values[0] for values in merged.values()]
+        bucket.samples = packed
+        bucket.sample_count = len(merged)
+        bucket.odometer_min = min(odometers)
+        bucket.odometer_max = max(odometers)
+        bucket.updated_at = now
+        touched[car_id].add(start.date())
+
+    TelemetryBucket.objects.bulk_create(created, batch_size=TELEMETRY_CHUNK_SIZE)
+    TelemetryBucket.objects.bulk_update(
+        updated, ['samples', 'sample_count', 'odometer_min', 'odometer_max', 'updated_at'],
+        batch_size=TELEMETRY_CHUNK_SIZE,
+    )
+    return added, len(created) + len(updated), touched
+
+
+def _rollup_days(company_id: int, touched: Dict[int, Set[date]]) -> int:
+    """
+    Odometer range of the touched days from the bucket summaries, then the
+    distance of every day from the first touched one on: a day's distance
+    starts at the previous day's end reading, so kilometres driven while the
+    tracker was offline are counted too (unless the odometer went back).
+    Returns the number of days written.
+    """
+    window = Q()
+    for car_id, days in touched.items():
+        window |= Q(car_id=car_id, bucket_start__gte=_day_start(min(days)),
+                    bucket_start__lt=_day_start(max(days) + timedelta(days=1)))
+    day_rows = (
+        TelemetryBucket.objects.filter(window)
+        .annotate(day=TruncDate('bucket_start'))
+        .values('car_id', 'day')
+        .annotate(start=Min('odometer_min'), end=Max('odometer_max'), sample_total=Sum('sample_count'))
+        .order_by()
+    )
+    rows = [
+        DailyMileage(
+            car_id=row['car_id'], company_id=company_id, date=row['day'],
+            start_odometer=row['start'], end_odometer=row['end'], samples=row['sample_total'],
+        )
+        for row in day_rows if row['day'] in touched[row['car_id']]
+    ]
+    DailyMileage.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['car', 'date'],
+        update_fields=['start_odometer', 'end_odometer', 'samples', 'updated_at'],
+        batch_size=TELEMETRY_CHUNK_SIZE,
+    )
+
+    following = Q()
+    for car_id, days in touched.items():
+        following |= Q(car_id=car_id, date__gte=min(days))
+    previous_end = (
+        DailyMileage.objects.filter(car_id=OuterRef('car_id'), date__lt=OuterRef('date'))
+        .order_by('-date').values('end_odometer')[:1]
+    )
+    now = timezone.now()
+    changed = []
+    for day in DailyMileage.objects.filter(following).annotate(previous_end=Subquery(previous_end)):
+        base = day.previous_end
+        if base is None or base > day.end_odometer:
+            base = day.start_odometer
+        distance = day.end_odometer - base
+        if distance != day.distance:
+            day.distance = distance
+            day.updated_at = now
+            changed.append(day)
+    DailyMileage.objects.bulk_update(changed, ['distance', 'updated_at'], batch_size=TELEMETRY_CHUNK_SIZE)
+    return len(rows)
+
+
+def _rollup_months(company_id: int, touched: Dict[int, Set[date]]) -> Dict[tuple, int]:
+    """Re-sum the months from the first touched one on; returns (car_id, year, month) -> meters of the changed ones."""
+    window = Q()
+    for car_id, days in touched.items():
+        window |= Q(car_id=car_id, date__gte=min(days).replace(day=1))
+    sums = {
+        (row['car_id'], row['year'], row['month']): (row['total'], row['days'])
+        for row in DailyMileage.objects.filter(window)
+        .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+        .values('car_id', 'year', 'month')
+        .annotate(total=Sum('distance'), days=Count('id', filter=Q(distance__gt=0)))
+        .order_by()
+    }
+    stored = {
+        (row.car_id, row.year, row.month): (row.distance, row.active_days)
+        for row in MonthlyMileage.objects.filter(_fuel_keys_q(sums))
+    }
+    changed = {key: value for key, value in sums.items() if stored.get(key) != value}
+    MonthlyMileage.objects.bulk_create(
+        [
+            MonthlyMileage(
+                car_id=car_id, company_id=company_id, year=year, month=month,
+                distance=distance, active_days=active_days,
+            )
+            for (car_id, year, month), (distance, active_days) in changed.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['car', 'year', 'month'],
+        update_fields=['distance', 'active_days', 'updated_at'],
+        batch_size=TELEMETRY_CHUNK_SIZE,
+    )
+    return {key: distance for key, (distance, _) in changed.items()}
+
+
+def _feed_fuel_mileage(company_id: int, months: Dict[tuple, int]) -> List[Fuel]:
+    """Write the monthly distance (whole km) into Fuel.monthly_mileage and recompute consumption."""
+    fuels = {(fuel.car_id, fuel.year, fuel.month): fuel for fuel in Fuel.objects.filter(_fuel_keys_q(months))}
+    now = timezone.now()
+    created, updated, previous = [], [], []
+    for (car_id, year, month), distance in months.items():
+        kilometres = (distance + 500) // 1000
+        fuel = fuels.get((car_id, year, month))
+        if fuel is None:
+            if kilometres:
+                fuel = Fuel(car_id=car_id, company_id=company_id, year=year, month=month, monthly_mileage=kilometres)
+                fuel.normalize()
+                created.append(fuel)
+            continue
+        if fuel.monthly_mileage == kilometres:
+            continue
+        previous.append(copy(fuel))
+        fuel.monthly_mileage = kilometres
+        fuel.normalize()
+        fuel.updated_at = now
+        updated.append(fuel)
+
+    Fuel.objects.bulk_create(created)
+    Fuel.objects.bulk_update(updated, ['monthly_mileage', 'consumption', 'updated_at'])
+    if created or updated:
+        # Bulk writes skip post_save: rollup, activity feed and cache version
+        bulk_saved.send(
+            sender=Fuel, company_id=company_id, instances=created + updated,
+            created={fuel.pk for fuel in created}, previous=previous,
+        )
+    return created + updated
+
+
+def ingest_telemetry(*, company_id: int, points: List[dict]) -> TelemetryResult:
+    """
+    Прием показаний трекеров пачкой.
+
+    Показания валидируются, машины сопоставляются одним запросом (по ID или
+    госномеру), раскладываются по часовым корзинам и дописываются в них;
+    повтор показания за ту же секунду заменяет сохраненное. Затем в той же
+    транзакции пересчитываются суточный и месячный пробег затронутых машин.
+    """
+    errors: List[BulkRowResult] = []
+    valid = []
+    for index, point in enumerate(points):
+        serializer = TelemetryPointSerializer(data=point)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors.append(_row_error(index, serializer.errors))
+
+    refs = _resolve_transaction_cars(company_id, [data for _, data in valid])
+    # (car_id, bucket start) -> second of the hour -> sample values
+    incoming: Dict[tuple, Dict[int, tuple]] = defaultdict(dict)
+    matched = 0
+    for index, data in valid:
+        car = _match_car(refs, data)
+        if car is None:
+            errors.append(_row_error(index, {'car': ['No car of your company matches this reading']}))
+            continue
+        start = _bucket_start(data['ts'])
+        incoming[(car.pk, start)][int((data['ts'] - start).total_seconds())] = _sample_values(data)
+        matched += 1
+
+    added, buckets, days, months, fuels = 0, 0, 0, {}, []
+    if incoming:
+        for attempt in range(2):
+            try:
+                with transaction.atomic():
+                    added, buckets, touched = _write_buckets(company_id, incoming)
+                    if touched:
+                        days = _rollup_days(company_id, touched)
+                        months = _rollup_months(company_id, touched)
+                        if months and getattr(settings, 'TELEMETRY_FEEDS_FUEL_MILEAGE', False):
+                            fuels = _feed_fuel_mileage(company_id, months)
+                break
+            except IntegrityError:
+                # A concurrent batch created one of these buckets or Fuel rows: retry once
+                if attempt:
+                    raise
+
+    return {
+        'accepted': added,
+        'duplicates': matched - added,
+        'failed': len(errors),
+        'buckets': buckets,
+        'days_updated': days,
+        'months_updated': len(months),
+        'fuel_updated': len(fuels),
+        'errors': sorted(errors, key=lambda error: error['index']),
+    }
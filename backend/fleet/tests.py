@@ -1,3 +1,1086 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import date, datetime, timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import Workbook
+from PIL import Image
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from companies.models import Company
+
+from dashboard.models import ActivityEvent, ActivityType
+from reports.models import CompanyMonthlyCost
+
+from .images import variant_names
+from .importers import IMPORT_ENCODING_SAMPLE
+from .models import (
+    Accumulator,
+    Car,
+    CarPhoto,
+    DailyMileage,
+    Fuel,
+    FuelTransaction,
+    Inspection,
+    Insurance,
+    MonthlyMileage,
+    Spare,
+    TelemetryBucket,
+    Tires,
+    Tombstone,
+)
+from .purge import soft_delete_car
+from .sync import SYNC_PAGE_SIZE, get_changes
+from .telemetry import SAMPLE, unpack_samples
+
+BISHKEK = ZoneInfo('Asia/Bishkek')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CarRelatedCountsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        cls.user = User.objects.create_user(username='u', password='p', company=cls.company, role='COMPANY_ADMIN')
+        car_fields = dict(region='Бишкек', brand='Toyota', title='Camry', fueltype='Бензин', type='Легковой')
+        cls.car = Car.objects.create(company=cls.company, numplate='01KG001AAA', **car_fields)
+        Car.objects.create(company=cls.company, numplate='01KG002AAA', **car_fields)
+
+        Fuel.objects.create(car=cls.car, year=2026, month=1, liters=50, total_cost=3000, monthly_mileage=500)
+        Fuel.objects.create(car=cls.car, year=2026, month=2, liters=50, total_cost=3000, monthly_mileage=500)
+        cls.spare = Spare.objects.create(car=cls.car, title='Filter', part_price=300, job_price=200, installed_at='2026-01-10')
+        Inspection.objects.create(car=cls.car, number='T-1', inspected_at='2026-01-01')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_annotated_counts(self):
+        with self.assertNumQueries(1):
+            car = Car.objects.with_related_counts().get(pk=self.car.pk)
+        self.assertEqual(car.related_counts(), {
+            'fuel_records': 2, 'spares': 1, 'insurances': 0, 'inspections': 1,
+            'tires': 0, 'accumulators': 0, 'photos': 0, 'total': 4,
+        })
+
+    def test_list_with_counts(self):
+        response = self.client.get('/api/v1/cars/?with_counts=1')
+        results = response.json()['data']['results']
+        counts = {row['id']: row['related_counts']['total'] for row in results}
+        self.assertEqual(counts, {self.car.id: 4, self.car.id + 1: 0})
+
+        response = self.client.get('/api/v1/cars/')
+        self.assertNotIn('related_counts', response.json()['data']['results'][0])
+
+    def test_stats_action(self):
+        response = self.client.get(f'/api/v1/cars/{self.car.id}/stats/')
+        self.assertEqual(response.json()['data']['fuel_records'], 2)
+        self.assertEqual(response.json()['data']['total'], 4)
+
+    def test_sparse_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/cars/?fields=id,numplate')
+        rows = response.json()['data']['results']
+        self.assertEqual(rows[0], {'id': self.car.id + 1, 'numplate': '01KG002AAA'})
+        select = next(query['sql'] for query in queries if 'FROM "fleet_car"' in query['sql'] and 'COUNT' not in query['sql'])
+        self.assertNotIn('"fleet_car"."vin"', select)
+
+        response = self.client.get('/api/v1/spares/?fields=id,car_numplate')
+        self.assertEqual(response.json()['data']['results'], [{'id': self.spare.id, 'car_numplate': '01KG001AAA'}])
+
+        response = self.client.get('/api/v1/cars/?fields=id,nope')
+        self.assertEqual(response.status_code, 400)
+
+    def test_include_related(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/v1/cars/{self.car.id}/?include=fuel_records,inspections,insurances')
+        data = response.json()['data']
+        self.assertEqual([row['month'] for row in data['fuel_records']], [2, 1])
+        self.assertEqual(data['fuel_records'][0]['car_numplate'], '01KG001AAA')
+        self.assertEqual([row['number'] for row in data['inspections']], ['T-1'])
+        self.assertEqual(data['insurances'], [])
+        self.assertNotIn('spares', data)
+
+        response = self.client.get(f'/api/v1/cars/{self.car.id}/?include=owners')
+        self.assertEqual(response.status_code, 400)
+
+    def test_destroy(self):
+        response = self.client.delete(f'/api/v1/cars/{self.car.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Car.objects.filter(pk=self.car.pk).exists())
+
+
+class CarRecordCompanyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        cls.user = User.objects.create_user(username='u', password='p', company=cls.company, role='COMPANY_ADMIN')
+        cls.car = Car.objects.create(
+            company=cls.company, region='Бишкек', brand='Toyota', title='Camry',
+            numplate='01KG001AAA', fueltype='Бензин', type='Легковой',
+        )
+
+    def test_company_is_set_from_car(self):
+        spare = Spare.objects.create(car=self.car, title='Filter', installed_at='2026-01-10')
+        fuel = Fuel.objects.create(car=self.car, year=2026, month=1, liters=10)
+        self.assertEqual((spare.company_id, fuel.company_id), (self.company.id, self.company.id))
+
+    def test_tenant_filter_uses_own_column(self):
+        Spare.objects.create(car=self.car, title='Filter', installed_at='2026-01-10')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/v1/spares/?fields=id,title')
+        self.assertEqual(len(response.json()['data']['results']), 1)
+        sql = next(query['sql'] for query in queries if 'FROM "fleet_spare"' in query['sql'])
+        self.assertIn('"fleet_spare"."company_id" =', sql)
+        self.assertNotIn('JOIN "fleet_car"', sql)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class FuelBulkUpsertTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        other = Company.objects.create(name='Other Fleet', slug='other-fleet')
+        cls.user = User.objects.create_user(username='u', password='p', company=cls.company, role='COMPANY_ADMIN')
+        car_fields = dict(region='Бишкек', brand='Toyota', title='Camry', fueltype='Бензин', type='Легковой')
+        cls.car = Car.objects.create(company=cls.company, numplate='01KG001AAA', **car_fields)
+        cls.other_car = Car.objects.create(company=other, numplate='01KG002AAA', **car_fields)
+        cls.existing = Fuel.objects.create(car=cls.car, year=2026, month=1, liters=10, total_cost=500, monthly_mileage=100)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_upsert(self):
+        rows = [
+            {'car': self.car.id, 'year': 2026, 'month': 1, 'liters': 50, 'total_cost': 3000, 'monthly_mileage': 500},
+            {'car': self.car.id, 'year': 2026, 'month': 2, 'liters': 80, 'total_cost': 4000, 'monthly_mileage': 1000},
+            {'car': self.other_car.id, 'year': 2026, 'month': 2, 'liters': 1},
+            {'car': self.car.id, 'year': 2026, 'month': 13},
+            {'car': self.car.id, 'year': 2026, 'month': 2, 'liters': 1},
+        ]
+        response = self.client.post('/api/v1/fuel/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+
+        self.assertEqual((data['created'], data['updated'], data['failed']), (1, 1, 3))
+        self.assertEqual([row['status'] for row in data['results']], ['updated', 'created', 'error', 'error', 'error'])
+        self.assertEqual(data['results'][0]['id'], self.existing.id)
+        self.assertIn('car', data['results'][2]['errors'])
+
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.liters, 50)
+        self.assertEqual(float(self.existing.consumption), 10.0)
+        created = Fuel.objects.get(pk=data['results'][1]['id'])
+        self.assertEqual((created.month_name, float(created.consumption)), ('February', 8.0))
+
+        # Side effects of post_save are applied for the whole batch
+        rollup = dict(CompanyMonthlyCost.objects.filter(car=self.car).values_list('month', 'amount'))
+        self.assertEqual(rollup, {1: 3000, 2: 4000})
+        fuel_events = ActivityEvent.objects.filter(company=self.company, event_type=ActivityType.FUEL)
+        self.assertEqual(sorted(fuel_events.values_list('object_id', flat=True)), sorted([self.existing.id, created.id]))
+
+    def test_rejects_empty_payload(self):
+        response = self.client.post('/api/v1/fuel/bulk/', {'rows': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class FleetBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        other = Company.objects.create(name='Other Fleet', slug='other-fleet')
+        cls.user = User.objects.create_user(username='u', password='p', company=cls.company, role='COMPANY_ADMIN')
+        car_fields = dict(region='Бишкек', brand='Toyota', title='Camry', fueltype='Бензин', type='Легковой')
+        cls.cars = [
+            Car.objects.create(company=cls.company, numplate=f'01KG{number:03d}AAA', **car_fields)
+            for number in range(1, 11)
+        ]
+        cls.other_car = Car.objects.create(company=other, numplate='01KG999AAA', **car_fields)
+        cls.spare = Spare.objects.create(car=cls.cars[0], title='Filter', part_price=300, installed_at='2026-01-10')
+        cls.old_spare = Spare.objects.create(car=cls.cars[0], title='Pads', part_price=900, installed_at='2025-10-01')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _post(self, operations):
+        return self.client.post('/api/v1/fleet/batch/', {'operations': operations}, format='json')
+
+    def test_mixed_operations(self):
+        response = self._post([
+            {'op': 'update', 'model': 'cars', 'id': self.cars[1].id, 'data': {'status': 'MAINTENANCE'}},
+            {'op': 'create', 'model': 'spares', 'data': {
+                'car': self.cars[1].id, 'title': 'Belt', 'part_price': 1200, 'installed_at': '2026-02-03',
+            }},
+            {'op': 'update', 'model': 'spares', 'id': self.spare.id, 'data': {'installed_at': '2026-02-20'}},
+            {'op': 'delete', 'model': 'spares', 'id': self.old_spare.id},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        self.assertEqual((data['created'], data['updated'], data['deleted']), (1, 2, 1))
+        self.assertEqual([row['status'] for row in data['results']], ['updated', 'created', 'updated', 'deleted'])
+
+        self.cars[1].refresh_from_db()
+        self.assertEqual(self.cars[1].status, 'MAINTENANCE')
+        created = Spare.objects.get(pk=data['results'][1]['id'])
+        self.assertEqual(created.company_id, self.company.id)
+        self.assertFalse(Spare.objects.filter(pk=self.old_spare.id).exists())
+
+        # The updated spare moved from January to February
+        rollup = dict(CompanyMonthlyCost.objects.filter(car=self.cars[0]).values_list('month', 'amount'))
+        self.assertEqual(rollup, {2: 300})
+
+    def test_invalid_operation_applies_nothing(self):
+        response = self._post([
+            {'op': 'update', 'model': 'cars', 'id': self.cars[1].id, 'data': {'status': 'MAINTENANCE'}},
+            {'op': 'create', 'model': 'spares', 'data': {
+                'car': self.other_car.id, 'title': 'Belt', 'installed_at': '2026-02-03',
+            }},
+            {'op': 'delete', 'model': 'cars', 'id': self.other_car.id},
+            {'op': 'update', 'model': 'spares', 'id': self.spare.id, 'data': {'car': self.cars[1].id}},
+        ])
+        self.assertEqual(response.status_code, 400)
+        results = response.json()['errors']['results']
+        self.assertEqual([row['status'] for row in results], ['skipped', 'error', 'error', 'error'])
+        self.assertIn('car', results[1]['errors'])
+        self.cars[1].refresh_from_db()
+        self.assertEqual(self.cars[1].status, 'ACTIVE')
+        self.assertTrue(Car.objects.filter(pk=self.other_car.id).exists())
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def count(cars):
+            operations = [
+                {'op': 'update', 'model': 'cars', 'id': car.id, 'data': {'status': 'INACTIVE'}} for car in cars
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                response = self._post(operations)
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        self.assertEqual(count(self.cars[:2]), count(self.cars))
+
+    def test_created_records_of_many_cars_need_no_query_per_car(self):
+        def operations(cars):
+            return [
+                {'op': 'create', 'model': 'spares', 'data': {
+                    'car': car.id, 'title': 'Belt', 'part_price': 100, 'installed_at': '2026-02-03',
+                }}
+                for car in cars
+            ]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._post(operations(self.cars[:2])).status_code, 200)
+        with self.assertNumQueries(len(queries)):
+            self.assertEqual(self._post(operations(self.cars)).status_code, 200)
+        events = ActivityEvent.objects.filter(company=self.company, event_type=ActivityType.MAINTENANCE, title='Maintenance: Belt')
+        self.assertEqual(
+            sorted(events.values_list('car_numplate', flat=True)),
+            sorted([car.numplate for car in self.cars[:2]] + [car.numplate for car in self.cars]),
+        )
+
+    def test_delete_with_null_data(self):
+        response = self._post([{'op': 'delete', 'model': 'spares', 'id': self.old_spare.id, 'data': None}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['deleted'], 1)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class FuelTransactionIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        other = Company.objects.create(name='Other Fleet', slug='other-fleet')
+        cls.user = User.objects.create_user(username='u', password='p', company=cls.company, role='COMPANY_ADMIN')
+        car_fields = dict(region='Бишкек', brand='Toyota', title='Camry', fueltype='Бензин', type='Легковой')
+        cls.car = Car.objects.create(company=cls.company, numplate='01KG001AAA', fuel_card='CARD-1', **car_fields)
+        cls.truck = Car.objects.create(company=cls.company, numplate='01KG002AAA', **car_fields)
+        Car.objects.create(company=other, numplate='01KG003AAA', fuel_card='CARD-9', **car_fields)
+        cls.january = Fuel.objects.create(
+            car=cls.car, year=2026, month=1, liters=100, total_cost=5000, monthly_mileage=2000,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _post(self, rows):
+        response = self.client.post('/api/v1/fuel/transactions/', rows, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def test_transactions_increment_monthly_rows(self):
+        rows = [
+            {'txn_id': 'T1', 'occurred_at': '2026-01-15T10:00:00', 'liters': '40.4', 'amount': '2000', 'card_number': 'CARD-1'},
+            {'txn_id': 'T2', 'occurred_at': '2026-01-20T10:00:00', 'liters': '60.3', 'amount': '3000.50', 'numplate': '01kg001aaa'},
+            {'txn_id': 'T3', 'occurred_at': '2026-02-02T08:00:00', 'liters': '30', 'amount': '1500', 'car': self.truck.id},
+            {'txn_id': 'T1', 'occurred_at': '2026-01-15T10:00:00', 'liters': '40.4', 'amount': '2000', 'card_number': 'CARD-1'},
+            {'txn_id': 'T4', 'occurred_at': '2026-01-15T10:00:00', 'liters': '10', 'amount': '500', 'card_number': 'CARD-9'},
+            {'txn_id': 'T5', 'occurred_at': '2026-01-15T10:00:00', 'liters': '10', 'amount': '500'},
+        ]
+        data = self._post(rows)
+        self.assertEqual((data['created'], data['duplicates'], data['failed']), (3, 1, 2))
+        self.assertEqual(
+            [row['status'] for row in data['results']], ['created', 'created', 'created', 'duplicate', 'error', 'error'],
+        )
+        self.assertEqual(data['months_updated'], 2)
+
+        self.january.refresh_from_db()
+        self.assertEqual((self.january.liters, self.january.total_cost), (201, 10001))
+        self.assertEqual(float(self.january.consumption), 10.05)
+        february = Fuel.objects.get(car=self.truck, year=2026, month=2)
+        self.assertEqual((february.liters, february.total_cost, february.month_name), (30, 1500, 'February'))
+        self.assertEqual(february.company_id, self.company.id)
+
+        rollup = dict(CompanyMonthlyCost.objects.filter(company=self.company).values_list('car_id', 'amount'))
+        self.assertEqual(rollup, {self.car.id: 10001, self.truck.id: 1500})
+
+        # Re-sending the same file changes nothing
+        data = self._post(rows[:3])
+        self.assertEqual((data['created'], data['duplicates']), (0, 3))
+        self.assertEqual(FuelTransaction.objects.filter(company=self.company).count(), 3)
+        self.january.refresh_from_db()
+        self.assertEqual(self.january.liters, 201)
+
+    def test_rounding_does_not_accumulate_across_batches(self):
+        for number in range(5):
+            self._post([{
+                'txn_id': f'F{number}', 'occurred_at': '2026-03-10T10:00:00',
+                'liters': '0.4', 'amount': '0.4', 'car': self.truck.id,
+            }])
+        march = Fuel.objects.get(car=self.truck, year=2026, month=3)
+        self.assertEqual((march.liters, march.total_cost), (2, 2))
+
+        # Bishkek is UTC+6: this one belongs to March in local time, not to February
+        self._post([{'txn_id': 'F9', 'occurred_at': '2026-02-28T20:00:00Z', 'liters': '0.5', 'amount': '0.5',
+                     'car': self.truck.id}])
+        march.refresh_from_db()
+        self.assertEqual((march.liters, march.total_cost), (3, 3))
+        self.assertFalse(Fuel.objects.filter(car=self.truck, year=2026, month=2).exists())
+
+    def test_query_count_does_not_grow_with_cars(self):
+        car_fields = dict(region='Бишкек', brand='Toyota', title='Camry', fueltype='Бензин', type='Легковой')
+        cars = [
+            Car.objects.create(company=self.company, numplate=f'01KG1{number:02d}AAA', **car_fields)
+            for number in range(6)
+        ]
+
+        def count(batch_cars, offset):
+            rows = [
+                {'txn_id': f'Q{offset + number}', 'occurred_at': '2026-04-10T10:00:00',
+                 'liters': '5', 'amount': '250', 'car': car.id}
+                for number, car in enumerate(batch_cars)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                self._post(rows)
+            return len(queries)
+
+        self.assertEqual(count(cars[:2], 0), count(cars[2:], 100))
+
+    def test_monthly_update_is_set_based(self):
+        def count(size, offset):
+            rows = [
+                {'txn_id': f'T{offset + number}', 'occurred_at': f'2026-0{1 + number % 3}-10T10:00:00',
+                 'liters': '5', 'amount': '250', 'card_number': 'CARD-1'}
+                for number in range(size)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                self._post(rows)
+            return len([query for query in queries if 'fleet_fuel"' in query['sql'] and 'UPDATE' in query['sql']])
+
+        self.assertEqual(count(3, 0), 1)
+        self.assertEqual(count(30, 100), 1)
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as file:
+            file.write('transaction_id;datetime;volume;total;card\n')
+            file.write('P1;2026-01-05 09:00:00;20;1000;CARD-1\n')
+            file.write('P2;2026-01-06 09:00:00;30;1500;CARD-1\n')
+            file.write('P3;2026-01-06 09:00:00;30;1500;UNKNOWN\n')
+        self.addCleanup(os.remove, file.name)
+        out, err = StringIO(), StringIO()
+        call_command('ingest_fuel_transactions', file.name, company=self.company.id, stdout=out, stderr=err)
+        self.assertIn('Created 2, duplicates 0, failed 1', out.getvalue())
+        self.assertIn('Row 4', err.getvalue())
+        self.january.refresh_from_db()
+        self.assertEqual(self.january.liters, 150)
+
+
+class TelemetryIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        other = Company.objects.create(name='Other Fleet', slug='other-fleet')
+        cls.user = User.objects.create_user(username='u', password='p', company=cls.company, role='COMPANY_ADMIN')
+        car_fields = dict(region='Бишкек', brand='Toyota', title='Camry', fueltype='Бензин', type='Легковой')
+        cls.car = Car.objects.create(company=cls.company, numplate='01KG001AAA', **car_fields)
+        cls.truck = Car.objects.create(company=cls.company, numplate='01KG002AAA', **car_fields)
+        cls.foreign = Car.objects.create(company=other, numplate='01KG003AAA', **car_fields)
+        cls.march = Fuel.objects.create(car=cls.car, year=2026, month=3, liters=40, total_cost=2000, monthly_mileage=500)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _post(self, points):
+        response = self.client.post('/api/v1/telemetry/points/', {'points': points}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def _reading(self, ts, odometer, car=None, **extra):
+        return {'car': car or self.car.id, 'ts': ts, 'odometer': odometer, **extra}
+
+    @override_settings(TELEMETRY_FEEDS_FUEL_MILEAGE=True)
+    def test_points_are_bucketed_and_rolled_up(self):
+        points = [
+            self._reading('2026-03-10T08:00:00', '1000', lat=42.87, lon=74.59, speed=35.5),
+            self._reading('2026-03-10T08:00:30', '1000.5'),
+            self._reading('2026-03-10T09:15:00', '1010'),
+            # Tracker offline overnight: the 40 km before the first reading count for the 11th
+            self._reading('2026-03-11T07:00:00', '1050'),
+            self._reading('2026-03-11T18:00:00', '1080.25'),
+            {'numplate': '01kg002aaa', 'ts': '2026-03-10T10:00:00', 'odometer': '5000'},
+            {'numplate': '01kg002aaa', 'ts': '2026-03-10T10:30:00', 'odometer': '5012.4'},
+            self._reading('2026-03-10T10:00:00', '1', car=self.foreign.id),
+            self._reading('2026-03-10T10:00:00', None),
+        ]
+        data = self._post(points)
+        self.assertEqual((data['accepted'], data['duplicates'], data['failed']), (7, 0, 2))
+        self.assertEqual([error['index'] for error in data['errors']], [7, 8])
+        self.assertEqual((data['buckets'], data['days_updated'], data['months_updated'], data['fuel_updated']), (5, 3, 2, 2))
+
+        bucket = TelemetryBucket.objects.get(car=self.car, bucket_start=datetime(2026, 3, 10, 8, tzinfo=BISHKEK))
+        self.assertEqual(bucket.sample_count, 2)
+        self.assertEqual(len(bytes(bucket.samples)), 2 * SAMPLE.size)
+        first, second = unpack_samples(bucket)
+        self.assertEqual((first['odometer'], first['speed']), (1000000, 35.5))
+        self.assertAlmostEqual(first['lat'], 42.87, places=5)
+        self.assertEqual((second['ts'] - first['ts']).seconds, 30)
+        self.assertIsNone(second['lat'])
+
+        days = dict(DailyMileage.objects.filter(car=self.car).values_list('date', 'distance'))
+        self.assertEqual(days, {date(2026, 3, 10): 10000, date(2026, 3, 11): 70250})
+        month = MonthlyMileage.objects.get(car=self.car, year=2026, month=3)
+        self.assertEqual((month.distance, month.active_days, month.company_id), (80250, 2, self.company.id))
+
+        self.march.refresh_from_db()
+        self.assertEqual((self.march.monthly_mileage, float(self.march.consumption)), (80, 50.0))
+        truck_march = Fuel.objects.get(car=self.truck, year=2026, month=3)
+        self.assertEqual((truck_march.monthly_mileage, truck_march.liters), (12, 0))
+        rollup = dict(CompanyMonthlyCost.objects.filter(company=self.company).values_list('car_id', 'mileage'))
+        self.assertEqual(rollup, {self.car.id: 80, self.truck.id: 12})
+
+        # A retried upload changes nothing
+        data = self._post(points[:7])
+        self.assertEqual((data['accepted'], data['duplicates'], data['buckets'], data['fuel_updated']), (0, 7, 0, 0))
+
+    @override_settings(TELEMETRY_FEEDS_FUEL_MILEAGE=True)
+    def test_late_readings_recompute_following_days(self):
+        self._post([self._reading('2026-03-11T07:00:00', '1050'), self._reading('2026-03-11T18:00:00', '1080.25')])
+        self.assertEqual(DailyMileage.objects.get(car=self.car, date=date(2026, 3, 11)).distance, 30250)
+
+        self._post([self._reading('2026-03-10T08:00:00', '1000'), self._reading('2026-03-10T09:15:00', '1010')])
+        days = dict(DailyMileage.objects.filter(car=self.car).values_list('date', 'distance'))
+        self.assertEqual(days, {date(2026, 3, 10): 10000, date(2026, 3, 11): 70250})
+
+        # Odometer reset (tracker replaced): the day counts from its own first reading
+        self._post([self._reading('2026-03-12T08:00:00', '5'), self._reading('2026-03-12T20:00:00', '25')])
+        self.assertEqual(DailyMileage.objects.get(car=self.car, date=date(2026, 3, 12)).distance, 20000)
+        self.march.refresh_from_db()
+        self.assertEqual(self.march.monthly_mileage, 100)
+
+    def test_fuel_feed_is_opt_in(self):
+        data = self._post([self._reading('2026-03-10T08:00:00', '1000'), self._reading('2026-03-10T09:15:00', '1010')])
+        self.assertEqual((data['months_updated'], data['fuel_updated']), (1, 0))
+        self.march.refresh_from_db()
+        self.assertEqual(self.march.monthly_mileage, 500)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        def count(month, readings):
+            points = [
+                self._reading(f'2026-{month:02d}-{1 + number // 24:02d}T{number % 24:02d}:{number % 60:02d}:00', str(1000 + number))
+                for number in range(readings)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                self._post(points)
+            return len(queries)
+
+        self.assertEqual(count(4, 5), count(5, 120))
+
+    def test_rejects_empty_and_oversized_batches(self):
+        response = self.client.post('/api/v1/telemetry/points/', {'points': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/v1/telemetry/points/', [{}] * 5001, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class FleetImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        cls.user = User.objects.create_user(username='u', password='p', company=cls.company, role='COMPANY_ADMIN')
+        cls.car = Car.objects.create(
+            company=cls.company, region='Бишкек', brand='Toyota', title='Camry',
+            numplate='01KG001AAA', fueltype='Бензин', type='Легковой',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _post(self, kind, name, content, **data):
+        upload = SimpleUploadedFile(name, content)
+        return self.client.post(f'/api/v1/import/{kind}/', {'file': upload, **data}, format='multipart')
+
+    def test_csv_cars(self):
+        content = (
+            'Numplate;Brand;Model;Region;Fuel type;Type;Driver;Status\n'
+            ' 01kg002bbb ;Honda;Fit;Ош;Бензин;Легковой;ivan  petrov;active\n'
+            '01KG001AAA;Toyota;Camry;Бишкек;Бензин;Легковой;;\n'
+            '01KG002BBB;Honda;Fit;Ош;Бензин;Легковой;;\n'
+            '01KG003CCC;;Fit;Ош;Бензин;Легковой;;\n'
+        ).encode()
+
+        response = self._post('cars', 'cars.csv', content, dry_run='1')
+        data = response.json()['data']
+        self.assertEqual((data['total_rows'], data['imported'], data['failed']), (4, 1, 3))
+        self.assertEqual(data['preview'][0]['numplate'], '01KG002BBB')
+        self.assertEqual(data['preview'][0]['driver'], 'Ivan Petrov')
+        self.assertEqual(Car.objects.count(), 1)
+
+        response = self._post('cars', 'cars.csv', content)
+        data = response.json()['data']
+        self.assertEqual(data['imported'], 1)
+        self.assertEqual([error['row'] for error in data['errors']], [3, 4, 5])
+        self.assertIn('numplate', data['errors'][0]['errors'])
+        self.assertIn('brand', data['errors'][2]['errors'])
+        car = Car.objects.get(numplate='01KG002BBB')
+        self.assertEqual((car.company_id, car.status), (self.company.id, 'ACTIVE'))
+        self.assertIsNotNone(car.commissioned_at)
+
+        report = self.client.get(data['error_report'])
+        self.assertEqual(report.status_code, 200)
+        lines = report.content.decode().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].startswith('3,numplate:'))
+
+    def test_xlsx_spares(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['car', 'title', 'part_price', 'job_price', 'installed_at'])
+        sheet.append(['01kg001aaa', 'Filter', 300, 200, '2026-01-10'])
+        sheet.append([self.car.id, 'Oil', 1000.0, 0, '2026-01-11'])
+        sheet.append(['01KG999ZZZ', 'Belt', 100, 100, '2026-01-12'])
+        buffer = BytesIO()
+        workbook.save(buffer)
+
+        response = self._post('spares', 'spares.xlsx', buffer.getvalue())
+        data = response.json()['data']
+        self.assertEqual((data['imported'], data['failed']), (2, 1))
+        self.assertEqual(data['errors'][0], {'row': 4, 'errors': {'car': ['Car not found in your company']}})
+        self.assertEqual(sorted(Spare.objects.filter(car=self.car).values_list('title', flat=True)), ['Filter', 'Oil'])
+        self.assertEqual(
+            ActivityEvent.objects.filter(company=self.company, event_type=ActivityType.MAINTENANCE).count(), 2,
+        )
+
+    def test_rejects_unknown_format(self):
+        response = self._post('cars', 'cars.txt', b'numplate\n')
+        self.assertEqual(response.status_code, 400)
+
+    def test_csv_cp1251(self):
+        content = 'Номер;Марка;Модель;Регион;Топливо;Тип\n01KG002BBB;Лада;Веста;Ош;Бензин;Легковой\n'.encode('cp1251')
+
+        response = self._post('cars', 'cars.csv', content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['imported'], 1)
+        self.assertEqual(Car.objects.get(numplate='01KG002BBB').region, 'Ош')
+
+    def test_invalid_text_after_sample_is_rejected(self):
+        rows = ''.join(f'01KG{index:03d}XYZ;Honda;Fit;Ош;Бензин;Легковой\n' for index in range(2000))
+        content = f'numplate;brand;model;region;fueltype;type\n{rows}'.encode() + b'\xff\xfe;;;;;\n'
+        self.assertGreater(len(content), IMPORT_ENCODING_SAMPLE)
+
+        response = self._post('cars', 'cars.csv', content)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file', response.json()['errors']['errors'])
+        self.assertEqual(Car.objects.count(), 1)
+
+    def test_rejects_broken_xlsx(self):
+        for content in (b'not a zip archive', self._zip_without_workbook()):
+            response = self._post('cars', 'cars.xlsx', content)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('file', response.json()['errors']['errors'])
+
+    @staticmethod
+    def _zip_without_workbook():
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('readme.txt', 'hello')
+        return buffer.getvalue()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class FuzzySearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        cls.user = User.objects.create_user(username='u', password='p', company=cls.company, role='COMPANY_ADMIN')
+        car_fields = dict(region='Бишкек', brand='Toyota', fueltype='Бензин', type='Легковой')
+        cls.camry = Car.objects.create(company=cls.company, numplate='01KG001AAA', title='Camry', driver='Асан', **car_fields)
+        cls.corolla = Car.objects.create(company=cls.company, numplate='01KG002BBB', title='Corolla', **car_fields)
+        Spare.objects.create(car=cls.camry, title='Масляный фильтр', part_price=300, installed_at='2026-01-10')
+        Spare.objects.create(car=cls.camry, title='Тормозные колодки', part_price=900, installed_at='2026-01-11')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _search(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()['data']['results']], queries
+
+    def test_substring_search_uses_fts5(self):
+        ids, queries = self._search('/api/v1/cars/?search=kg002')
+        self.assertEqual(ids, [self.corolla.id])
+        self.assertTrue(any('MATCH' in query['sql'] for query in queries))
+
+        ids, _ = self._search('/api/v1/cars/?search=асан camry')
+        self.assertEqual(ids, [self.camry.id])
+
+    def test_index_follows_writes(self):
+        self.corolla.driver = 'Бакыт'
+        self.corolla.save()
+        ids, _ = self._search('/api/v1/cars/?search=бакыт')
+        self.assertEqual(ids, [self.corolla.id])
+
+        ids, _ = self._search('/api/v1/spares/?search=фильтр')
+        self.assertEqual(len(ids), 1)
+        Spare.objects.filter(pk=ids[0]).delete()
+        ids, _ = self._search('/api/v1/spares/?search=фильтр')
+        self.assertEqual(ids, [])
+
+    def test_short_terms_fall_back_to_icontains(self):
+        ids, _ = self._search('/api/v1/cars/?search=bb')
+        self.assertEqual(ids, [self.corolla.id])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CarTimelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        other = Company.objects.create(name='Other Fleet', slug='other-fleet')
+        cls.user = User.objects.create_user(username='u', password='p', company=cls.company, role='COMPANY_ADMIN')
+        car_fields = dict(region='Бишкек', brand='Toyota', title='Camry', fueltype='Бензин', type='Легковой')
+        cls.car = Car.objects.create(company=cls.company, numplate='01KG001AAA', **car_fields)
+        cls.other_car = Car.objects.create(company=other, numplate='01KG002AAA', **car_fields)
+        Spare.objects.create(car=cls.car, title='Filter', part_price=300, job_price=200, installed_at='2026-03-10')
+        Spare.objects.create(car=cls.car, title='Pads', part_price=900, installed_at='2026-03-01')
+        Tires.objects.create(car=cls.car, model='Nokian', size='205/55 R16', price=4000, installed_at='2026-03-01')
+        Accumulator.objects.create(car=cls.car, model='Varta', price=2500, installed_at='2026-01-15')
+        Fuel.objects.create(car=cls.car, year=2026, month=2, liters=50, total_cost=3000, monthly_mileage=600)
+        Insurance.objects.create(
+            car=cls.car, number='POL-1', start_date='2026-01-20', end_date='2027-01-19', cost=1500,
+        )
+        Inspection.objects.create(car=cls.car, number='TO-1', inspected_at='2025-12-05', cost=700)
+        Spare.objects.create(car=cls.other_car, title='Foreign', installed_at='2026-03-20')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _timeline(self, query=''):
+        response = self.client.get(f'/api/v1/cars/{self.car.id}/timeline/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def test_merges_all_record_types_by_date(self):
+        data = self._timeline()
+        self.assertEqual(
+            [(item['type'], item['date']) for item in data['results']],
+            [
+                ('spare', '2026-03-10'),
+                ('tires', '2026-03-01'),
+                ('spare', '2026-03-01'),
+                ('fuel', '2026-02-01'),
+                ('insurance', '2026-01-20'),
+                ('accumulator', '2026-01-15'),
+                ('inspection', '2025-12-05'),
+            ],
+        )
+        self.assertEqual((data['results'][0]['title'], data['results'][0]['cost']), ('Filter', 500))
+        self.assertEqual(data['results'][3]['title'], 'February 2026')
+        self.assertIsNone(data['next_cursor'])
+
+    def test_keyset_pages_with_one_query_each(self):
+        full = [(item['type'], item['id']) for item in self._timeline()['results']]
+        seen = []
+        query = '?page_size=2'
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                data = self._timeline(query)
+            self.assertEqual(sum('UNION ALL' in q['sql'] for q in queries), 1)
+            seen += [(item['type'], item['id']) for item in data['results']]
+            if not data['next_cursor']:
+                break
+            query = f"?page_size=2&cursor={data['next_cursor']}"
+        self.assertEqual(seen, full)
+
+    def test_type_and_date_filters(self):
+        data = self._timeline('?type=spare,tires&from=2026-03-01&to=2026-03-05')
+        self.assertEqual([item['type'] for item in data['results']], ['tires', 'spare'])
+
+        response = self.client.get(f'/api/v1/cars/{self.car.id}/timeline/?type=photos')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(f'/api/v1/cars/{self.car.id}/timeline/?cursor=broken')
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_company_car_is_not_found(self):
+        response = self.client.get(f'/api/v1/cars/{self.other_car.id}/timeline/')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    SYNC_SETTLE_SECONDS=0,
+)
+class DeltaSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        other = Company.objects.create(name='Other Fleet', slug='other-fleet')
+        cls.user = User.objects.create_user(username='u', password='p', company=cls.company, role='COMPANY_ADMIN')
+        car_fields = dict(region='Бишкек', brand='Toyota', title='Camry', fueltype='Бензин', type='Легковой')
+        cls.car = Car.objects.create(company=cls.company, numplate='01KG001AAA', **car_fields)
+        cls.other_car = Car.objects.create(company=other, numplate='01KG002AAA', **car_fields)
+        cls.fuel = Fuel.objects.create(car=cls.car, year=2026, month=1, liters=10)
+        Fuel.objects.create(car=cls.other_car, year=2026, month=1, liters=10)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _sync(self, token=None):
+        url = '/api/v1/sync/' + (f'?since={token}' if token else '')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def test_initial_sync_returns_snapshot(self):
+        data = self._sync()
+        self.assertTrue(data['reset'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual([row['id'] for row in data['changes']['cars']], [self.car.id])
+        self.assertEqual([row['id'] for row in data['changes']['fuel']], [self.fuel.id])
+
+    def test_incremental_changes_and_tombstones(self):
+        token = self._sync()['next_token']
+        data = self._sync(token)
+        self.assertFalse(data['reset'])
+        self.assertTrue(all(not rows for rows in data['changes'].values()))
+        token = data['next_token']
+
+        spare = Spare.objects.create(car=self.car, title='Filter', installed_at='2026-01-10')
+        self.fuel.liters = 20
+        self.fuel.save()
+        data = self._sync(token)
+        self.assertEqual([row['id'] for row in data['changes']['spares']], [spare.id])
+        self.assertEqual([row['liters'] for row in data['changes']['fuel']], [20])
+        self.assertEqual(data['changes']['cars'], [])
+        token = data['next_token']
+
+        car_id = self.car.id
+        self.car.delete()
+        data = self._sync(token)
+        self.assertEqual(data['deleted']['cars'], [car_id])
+        self.assertEqual(data['deleted']['spares'], [spare.id])
+        self.assertEqual(data['deleted']['fuel'], [self.fuel.id])
+        self.assertEqual(self._sync(data['next_token'])['deleted']['cars'], [])
+
+    def test_snapshot_skips_records_of_soft_deleted_cars(self):
+        soft_delete_car(self.car)
+        data = self._sync()
+        self.assertEqual(data['changes']['cars'], [])
+        self.assertEqual(data['changes']['fuel'], [])
+
+    def test_pages_with_has_more(self):
+        Spare.objects.bulk_create([
+            Spare(car=self.car, company=self.company, title=f'Part {number}', installed_at='2026-01-10')
+            for number in range(5)
+        ])
+        result = get_changes(company_id=self.company.id, since=None, limit=2)
+        seen = [row['id'] for row in result['changes']['spares']]
+        while result['has_more']:
+            result = get_changes(company_id=self.company.id, since=result['next_token'], limit=2)
+            seen += [row['id'] for row in result['changes']['spares']]
+        self.assertEqual(sorted(seen), sorted(Spare.objects.values_list('id', flat=True)))
+        self.assertEqual(len(seen), 5)
+
+    def test_invalid_token(self):
+        response = self.client.get('/api/v1/sync/?since=garbage')
+        self.assertEqual(response.status_code, 400)
+
+    def _changes_at(self, moment, token, limit=SYNC_PAGE_SIZE):
+        with patch('fleet.sync.timezone.now', return_value=moment):
+            return get_changes(company_id=self.company.id, since=token, limit=limit)
+
+    def test_slow_paging_past_the_purge_resets(self):
+        now = timezone.now()
+        token = self._changes_at(now - timedelta(days=41), None)['next_token']
+        spares = Spare.objects.bulk_create([
+            Spare(car=self.car, company=self.company, title=f'Part {number}', installed_at='2026-01-10')
+            for number in range(3)
+        ])
+        pks = [spare.pk for spare in spares]
+        for pk, age in zip(pks, (40, 39, 1)):
+            Spare.objects.get(pk=pk).delete()
+            Tombstone.objects.filter(model='spares', object_id=pk).update(deleted_at=now - timedelta(days=age))
+
+        # The token is re-issued 20 days ago, but its deletions position is 40 days old
+        result = self._changes_at(now - timedelta(days=20), token, limit=1)
+        self.assertEqual((result['reset'], result['has_more'], result['deleted']['spares']), (False, True, pks[:1]))
+        call_command('purge_sync_tombstones', stdout=StringIO())
+        self.assertTrue(get_changes(company_id=self.company.id, since=result['next_token'])['reset'])
+
+    def test_idle_client_without_deletions_keeps_its_token(self):
+        now = timezone.now()
+        token = self._changes_at(now - timedelta(days=25), None)['next_token']
+        token = self._changes_at(now - timedelta(days=10), token)['next_token']
+        self.assertFalse(self._changes_at(now + timedelta(days=10), token)['reset'])
+
+    def test_purge_keeps_recent_tombstones(self):
+        Spare.objects.create(car=self.car, title='Filter', installed_at='2026-01-10').delete()
+        call_command('purge_sync_tombstones', stdout=StringIO())
+        self.assertEqual(Tombstone.objects.filter(company=self.company).count(), 1)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TenantExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        other = Company.objects.create(name='Other Fleet', slug='other-fleet')
+        cls.user = User.objects.create_user(username='u', password='p', company=cls.company, role='COMPANY_ADMIN')
+        car_fields = dict(region='Бишкек', brand='Toyota', title='Camry', fueltype='Бензин', type='Легковой')
+        cls.car = Car.objects.create(company=cls.company, numplate='01KG001AAA', **car_fields)
+        other_car = Car.objects.create(company=other, numplate='01KG002AAA', **car_fields)
+        Fuel.objects.create(car=cls.car, year=2025, month=12, liters=10)
+        Fuel.objects.create(car=cls.car, year=2026, month=1, liters=20)
+        Spare.objects.create(car=cls.car, title='Filter', installed_at='2026-01-10')
+        Fuel.objects.create(car=other_car, year=2026, month=1, liters=30)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _export(self, query='', **headers):
+        response = self.client.get(f'/api/v1/export/tenant.ndjson{query}', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_streams_every_model_of_the_company(self):
+        response, body = self._export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        counts = {}
+        for row in rows:
+            counts[row['type']] = counts.get(row['type'], 0) + 1
+        self.assertEqual(counts, {'cars': 1, 'fuel': 2, 'spares': 1})
+        self.assertEqual(rows[0]['data']['numplate'], '01KG001AAA')
+
+    def test_model_filters(self):
+        _, body = self._export('?models=fuel&fuel.year__gte=2026')
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([(row['type'], row['data']['liters']) for row in rows], [('fuel', 20)])
+
+        response = self.client.get('/api/v1/export/tenant.ndjson?fuel.liters=1')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/v1/export/tenant.ndjson?models=owners', HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+
+    def test_gzip(self):
+        response, body = self._export('?models=cars', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(body))['data']['id'], self.car.id)
+
+    def test_requires_company_admin(self):
+        dispatcher = User.objects.create_user(username='d', password='p', company=self.company, role='DISPATCHER')
+        self.client.force_authenticate(dispatcher)
+        self.assertEqual(self.client.get('/api/v1/export/tenant.ndjson').status_code, 403)
+
+
+def _png(size=(2000, 1500)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ImageVariantsTestMixin:
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root,
+            IMAGE_VARIANT_WORKERS=0,
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        self.user = User.objects.create_user(username='u', password='p', company=self.company, role='COMPANY_ADMIN')
+        self.car = Car.objects.create(
+            company=self.company, region='Бишкек', brand='Toyota', title='Camry',
+            numplate='01KG001AAA', fueltype='Бензин', type='Легковой',
+        )
+
+
+class ImageVariantsTests(ImageVariantsTestMixin, TestCase):
+    def test_variants_rendered_after_upload(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        upload = SimpleUploadedFile('photo.png', _png(), content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(f'/api/v1/cars/{self.car.id}/photos/', {'image': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        # Rendered after commit: the upload response itself has no variants yet
+        self.assertIsNone(response.json()['data']['image_variants'])
+
+        photo = CarPhoto.objects.get()
+        self.assertEqual(set(photo.image_variants), {'source', 'thumb', 'medium'})
+        with Image.open(photo.image.storage.path(photo.image_variants['thumb']['webp'])) as thumb:
+            self.assertEqual((thumb.format, thumb.size), ('WEBP', (320, 240)))
+        with Image.open(photo.image.storage.path(photo.image_variants['medium']['jpeg'])) as medium:
+            self.assertEqual((medium.format, medium.size), ('JPEG', (1024, 768)))
+
+        row = client.get(f'/api/v1/cars/{self.car.id}/photos/').json()['data'][0]
+        self.assertEqual(row['image_variants']['thumb']['webp'], '/media/car_photos/variants/photo_thumb.webp')
+        self.assertEqual(row['image_variants']['medium']['jpeg'], '/media/car_photos/variants/photo_medium.jpeg')
+
+    def _photo_with_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            photo = CarPhoto.objects.create(car=self.car, image=SimpleUploadedFile('photo.png', _png()))
+        photo.refresh_from_db()
+        return photo, variant_names(photo.image_variants)
+
+    def test_replaced_image_variants_are_deleted(self):
+        photo, old_names = self._photo_with_variants()
+        storage = photo.image.storage
+
+        with self.captureOnCommitCallbacks(execute=True):
+            photo.image = SimpleUploadedFile('photo.png', _png((400, 300)))
+            photo.save()
+        photo.refresh_from_db()
+        self.assertEqual(photo.image_variants['source'], photo.image.name)
+        self.assertTrue(all(storage.exists(name) for name in variant_names(photo.image_variants)))
+        self.assertFalse(any(storage.exists(name) for name in old_names))
+
+        tires = Tires.objects.create(car=self.car, model='Nokian', size='205/55 R16', price=100, installed_at='2026-01-10')
+        with self.captureOnCommitCallbacks(execute=True):
+            tires.photo = SimpleUploadedFile('tires.png', _png())
+            tires.save()
+        tires.refresh_from_db()
+        old_names = variant_names(tires.photo_variants)
+        with self.captureOnCommitCallbacks(execute=True):
+            tires.photo = None
+            tires.save()
+        tires.refresh_from_db()
+        self.assertEqual(tires.photo_variants, {})
+        self.assertFalse(any(storage.exists(name) for name in old_names))
+
+    def test_deleted_record_variants_are_deleted(self):
+        photo, names = self._photo_with_variants()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            photo.delete()
+        self.assertFalse(any(photo.image.storage.exists(name) for name in names))
+
+
+class GenerateImageVariantsCommandTests(ImageVariantsTestMixin, TransactionTestCase):
+    def test_backfills_missing_variants(self):
+        photo = CarPhoto.objects.create(car=self.car, image=SimpleUploadedFile('old.png', _png((800, 600))))
+        CarPhoto.objects.filter(pk=photo.pk).update(image_variants={})
+
+        out = StringIO()
+        call_command('generate_image_variants', stdout=out)
+        self.assertIn('CarPhoto: 1 generated, 0 up to date, 0 failed', out.getvalue())
+        photo.refresh_from_db()
+        self.assertEqual(photo.image_variants['source'], photo.image.name)
+
+        out = StringIO()
+        call_command('generate_image_variants', '--model', 'carphoto', stdout=out)
+        self.assertIn('CarPhoto: 0 generated, 1 up to date, 0 failed', out.getvalue())
+
+
+class CarSoftDeleteTests(ImageVariantsTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        settings_override = override_settings(CAR_PURGE_WORKERS=0, SYNC_SETTLE_SECONDS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.spare = Spare.objects.create(car=self.car, title='Filter', part_price=300, installed_at='2026-01-10')
+        Fuel.objects.create(car=self.car, year=2026, month=1, liters=10, total_cost=500)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.photo = CarPhoto.objects.create(
+                car=self.car, image=SimpleUploadedFile('photo.png', _png((800, 600)), content_type='image/png'),
+            )
+        self.photo.refresh_from_db()
+        self.files = [self.photo.image.name, self.photo.image_variants['thumb']['webp']]
+
+    def test_destroy_hides_car_then_purges_in_background(self):
+        # Purge callbacks are collected, not run: the car is only soft-deleted
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.delete(f'/api/v1/cars/{self.car.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Car.objects.filter(pk=self.car.pk).exists())
+        self.assertTrue(Car.all_objects.filter(pk=self.car.pk, deleted_at__isnull=False).exists())
+        self.assertEqual(self.client.get(f'/api/v1/cars/{self.car.id}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/v1/spares/').json()['data']['results'], [])
+        # The numplate can be reused before the purge
+        Car.objects.create(
+            company=self.company, region='Бишкек', brand='Toyota', title='Camry',
+            numplate='01KG001AAA', fueltype='Бензин', type='Легковой',
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for callback in callbacks:
+                callback()
+        self.assertFalse(Car.all_objects.filter(pk=self.car.pk).exists())
+        self.assertFalse(Spare.objects.filter(pk=self.spare.pk).exists())
+        self.assertFalse(CompanyMonthlyCost.objects.filter(car_id=self.car.pk).exists())
+        for name in self.files:
+            self.assertFalse(self.photo.image.storage.exists(name))
+        self.assertEqual(
+            set(Tombstone.objects.values_list('model', flat=True)), {'cars', 'spares', 'fuel'},
+        )
+
+    def test_purge_command_picks_up_leftovers(self):
+        with self.captureOnCommitCallbacks():
+            self.client.delete(f'/api/v1/cars/{self.car.id}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('purge_deleted_cars', stdout=StringIO())
+        self.assertFalse(Car.all_objects.filter(pk=self.car.pk).exists())
+        self.assertFalse(CarPhoto.objects.exists())
@@ -0,0 +1,174 @@
+"""
+Единая история машины: все типы записей одним UNION ALL запросом.
+"""
+from __future__ import annotations
+
+import base64
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple, TypedDict
+
+from django.db.models import CharField, DateField, F, Func, IntegerField, Q, Value
+from django.db.models.functions import Cast, Concat
+from rest_framework.exceptions import ValidationError
+
+from .models import Accumulator, Fuel, Inspection, Insurance, Spare, Tires
+
+TIMELINE_MAX_PAGE_SIZE = 100
+
+
+class PeriodStart(Func):
+    """First day of (year, month) as a DATE."""
+    function = 'make_date'
+    template = '%(function)s(%(expressions)s, 1)'
+    output_field = DateField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        (year, year_params), (month, month_params) = (
+            compiler.compile(expression) for expression in self.get_source_expressions()
+        )
+        return f"date({year} || '-' || substr('0' || {month}, -2) || '-01')", (*year_params, *month_params)
+
+
+# type -> (model, date expression, title, description, cost)
+TIMELINE_SOURCES = {
+    'accumulator': (Accumulator, F('installed_at'), F('model'), F('serial_number'), F('price')),
+    'fuel': (
+        Fuel,
+        PeriodStart('year', 'month'),
+        Concat('month_name', Value(' '), Cast('year', CharField())),
+        Concat(Cast('liters', CharField()), Value(' L, '), Cast('monthly_mileage', CharField()), Value(' km')),
+        F('total_cost'),
+    ),
+    'inspection': (Inspection, F('inspected_at'), F('number'), Cast('valid_until', CharField()), F('cost')),
+    'insurance': (Insurance, F('start_date'), F('insurance_type'), F('number'), F('cost')),
+    'spare': (Spare, F('installed_at'), F('title'), F('job_description'), F('part_price') + F('job_price')),
+    'tires': (Tires, F('installed_at'), F('model'), F('size'), F('price')),
+}
+
+
+class TimelineItem(TypedDict):
+    type: str
+    id: int
+    date: str
+    title: str
+    description: str
+    cost: int
+
+
+def _encode_cursor(item: dict) -> str:
+    raw = f"{item['entry_date'].isoformat()}|{item['entry_type']}|{item['entry_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[date, str, int]:
+    try:
+        entry_date, entry_type, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return date.fromisoformat(entry_date), entry_type, int(entry_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValidationError({'cursor': 'Invalid cursor'})
+
+
+def _after_cursor(entry_type: str, cursor: Tuple[date, str, int]) -> Q:
+    """Rows of one branch after the cursor in (date, type, id) DESC order; type is constant per branch."""
+    cursor_date, cursor_type, cursor_id = cursor
+    if entry_type < cursor_type:
+        return Q(entry_date__lte=cursor_date)
+    if entry_type == cursor_type:
+        return Q(entry_date__lt=cursor_date) | Q(entry_date=cursor_date, pk__lt=cursor_id)
+    return Q(entry_date__lt=cursor_date)
+
+
+def _branch(entry_type: str, car_id: int, date_from, date_to, cursor):
+    model, entry_date, title, description, cost = TIMELINE_SOURCES[entry_type]
+    # Same annotation order in every branch: it defines the UNION column order
+    qs = model.objects.filter(car_id=car_id).annotate(
+        entry_type=Value(entry_type, output_field=CharField()),
+        entry_id=F('pk'),
+        entry_date=entry_date,
+        entry_title=Cast(title, CharField()),
+        entry_description=Cast(description, CharField()),
+        entry_cost=Cast(cost, IntegerField()),
+    )
+    if date_from is not None:
+        qs = qs.filter(entry_date__gte=date_from)
+    if date_to is not None:
+        qs = qs.filter(entry_date__lte=date_to)
+    if cursor is not None:
+        qs = qs.filter(_after_cursor(entry_type, cursor))
+    return qs.order_by().values(
+        'entry_type', 'entry_id', 'entry_date', 'entry_title', 'entry_description', 'entry_cost',
+    )
+
+
+def get_car_timeline(
+    *,
+    car_id: int,
+    limit: int,
+    types: Optional[Iterable[str]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    cursor: Optional[str] = None,
+) -> Tuple[List[TimelineItem], Optional[str]]:
+    """
+    История машины (топливо, запчасти, шины, АКБ, страховки, техосмотры).
+
+    Один запрос UNION ALL, сортировка по (date, type, id) по убыванию и
+    keyset-пагинация по этой тройке. Возвращает элементы страницы и курсор
+    следующей страницы (или None).
+    """
+    types = sorted(set(types or TIMELINE_SOURCES))
+    decoded = _decode_cursor(cursor) if cursor else None
+
+    branches = [_branch(entry_type, car_id, date_from, date_to, decoded) for entry_type in types]
+    qs = branches[0].union(*branches[1:], all=True).order_by('-entry_date', '-entry_type', '-entry_id')
+
+    rows = list(qs[:limit + 1])
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+
+    items = [
+        {
+            'type': row['entry_type'],
+            'id': row['entry_id'],
+            'date': row['entry_date'].isoformat(),
+            'title': row['entry_title'] or '',
+            'description': row['entry_description'] or '',
+            'cost': row['entry_cost'] or 0,
+        }
+        for row in rows[:limit]
+    ]
+    return items, next_cursor
+
+
+def parse_timeline_params(params) -> Dict[str, object]:
+    """Validate ``type``, ``from``, ``to`` and ``page_size`` query parameters."""
+    errors = {}
+    types = None
+    if params.get('type'):
+        types = [name.strip() for name in params['type'].split(',') if name.strip()]
+        unknown = set(types) - set(TIMELINE_SOURCES)
+        if unknown:
+            errors['type'] = f"Unknown types: {', '.join(sorted(unknown))}"
+
+    bounds = {}
+    for param in ('from', 'to'):
+        value = params.get(param)
+        try:
+            bounds[param] = date.fromisoformat(value) if value else None
+        except ValueError:
+            errors[param] = 'Expected a date in YYYY-MM-DD format'
+
+    try:
+        limit = min(max(int(params.get('page_size', 20)), 1), TIMELINE_MAX_PAGE_SIZE)
+    except ValueError:
+        errors['page_size'] = 'Expected an integer'
+        limit = None
+
+    if errors:
+        raise ValidationError(errors)
+    return {
+        'types': types,
+        'date_from': bounds['from'],
+        'date_to': bounds['to'],
+        'limit': limit,
+        'cursor': params.get('cursor') or None,
+    }
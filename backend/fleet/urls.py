@@ -8,6 +8,8 @@ from .views import CarSpareListCreateView, SpareViewSet
 from .views import CarTiresListCreateView, TiresViewSet
 from .views import AccumulatorViewSet, CarAccumulatorListCreateView
 from .views import FuelViewSet
+from .views import FleetBatchView, FleetImportErrorReportView, FleetImportView, SyncView, TenantExportView
+from .views import TelemetryPointsView
 from .views import InsuranceViewSet, InspectionViewSet
 
 
@@ -26,6 +28,12 @@ urlpatterns = [
     path('cars/<int:car_id>/tires/', CarTiresListCreateView.as_view(), name='car-tires'),
     path('cars/<int:car_id>/accumulators/', CarAccumulatorListCreateView.as_view(), name='car-accumulators'),
     path('cars/photos/<int:photo_id>/', CarPhotoDeleteView.as_view(), name='car-photo-delete'),
+    path('fleet/batch/', FleetBatchView.as_view(), name='fleet-batch'),
+    path('export/tenant.ndjson', TenantExportView.as_view(), name='fleet-tenant-export'),
+    path('sync/', SyncView.as_view(), name='fleet-sync'),
+    path('telemetry/points/', TelemetryPointsView.as_view(), name='fleet-telemetry-points'),
+    path('import/errors/<str:token>/', FleetImportErrorReportView.as_view(), name='fleet-import-errors'),
+    path('import/<str:kind>/', FleetImportView.as_view(), name='fleet-import'),
 ]
 
 urlpatterns += router.urls
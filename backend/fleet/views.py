@@ -1,23 +1,47 @@
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
-from core.permissions import IsCompanyAdminOrDispatcher, IsCompanyMember
+from core.permissions import IsCompanyAdmin, IsCompanyAdminOrDispatcher, IsCompanyMember
+from core.renderers import NDJSONRenderer, StandardJSONRenderer
 from core.viewsets import CompanyScopedModelViewSet
 
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 
+from .export import accepts_gzip, parse_export_filters, stream_tenant_export
+from .importers import IMPORT_SPECS, error_report_key, run_import
 from .models import Accumulator, Car, CarPhoto, Fuel, Insurance, Inspection, Spare, Tires
+from .search import SEARCH_FIELDS
+from .purge import soft_delete_car
+from .services import (
+    BATCH_MAX_OPERATIONS,
+    FUEL_BULK_MAX_ROWS,
+    FUEL_TXN_MAX_ROWS,
+    apply_batch,
+    bulk_upsert_fuel,
+    ingest_fuel_transactions,
+)
+from .sync import get_changes
+from .telemetry import TELEMETRY_MAX_POINTS, ingest_telemetry
+from .timeline import get_car_timeline, parse_timeline_params
 from .serializers import (
     AccumulatorCreateUpdateSerializer,
     AccumulatorDetailSerializer,
     AccumulatorListSerializer,
     CarCreateUpdateSerializer,
     CarDetailSerializer,
+    CarDetailWithCountsSerializer,
     CarListSerializer,
+    CarListWithCountsSerializer,
     CarPhotoSerializer,
     CarRelatedStatsSerializer,
     FuelCreateUpdateSerializer,
@@ -48,20 +72,42 @@ logger = logging.getLogger(__name__)
 class CarViewSet(CompanyScopedModelViewSet):
     queryset = Car.objects.select_related('company').all()
     filterset_fields = ['region', 'type', 'brand', 'numplate', 'status']
-    search_fields = ['numplate', 'vin', 'driver', 'title', 'drivers_phone', 'fuel_card']
+    search_fields = SEARCH_FIELDS[Car]
     ordering_fields = ['id', 'numplate', 'brand', 'status', 'commissioned_at', 'created_at']
     ordering = ['-id']
+    # ?include= for the car detail page: one prefetch query per relation
+    include_relations = {
+        'insurances': (InsuranceListSerializer, Insurance.objects.all()),
+        'inspections': (InspectionListSerializer, Inspection.objects.all()),
+        'fuel_records': (FuelListSerializer, Fuel.objects.order_by('-year', '-month', '-id')),
+        'spares': (SpareListSerializer, Spare.objects.all()),
+        'tires': (TiresListSerializer, Tires.objects.all()),
+        'accumulators': (AccumulatorListSerializer, Accumulator.objects.all()),
+        'photos': (CarPhotoSerializer, CarPhoto.objects.all()),
+    }
 
     def get_permissions(self):
         if self.request.method in ('GET', 'HEAD', 'OPTIONS'):
             return [IsCompanyMember()]
         return [IsCompanyAdminOrDispatcher()]
 
+    def _with_counts(self):
+        if self.action in ('destroy', 'stats'):
+            return True
+        return self.action in ('list', 'retrieve') and self.request.query_params.get('with_counts') in ('1', 'true')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self._with_counts():
+            # All related counts in the same query as the cars themselves
+            queryset = queryset.with_related_counts()
+        return queryset
+
     def get_serializer_class(self):
         if self.action == 'list':
-            return CarListSerializer
+            return CarListWithCountsSerializer if self._with_counts() else CarListSerializer
         if self.action == 'retrieve':
-            return CarDetailSerializer
+            return CarDetailWithCountsSerializer if self._with_counts() else CarDetailSerializer
         return CarCreateUpdateSerializer
 
     def perform_create(self, serializer):
@@ -71,15 +117,7 @@ class CarViewSet(CompanyScopedModelViewSet):
         instance = self.get_object()
         
         # Подсчет связанных записей перед удалением
-        related_counts = {
-            'fuel_records': instance.fuel_records.count(),
-            'spares': instance.spares.count(),
-            'insurances': instance.insurances.count(),
-            'inspections': instance.inspections.count(),
-            'tires': instance.tires.count(),
-            'accumulators': instance.accumulators.count(),
-            'photos': instance.photos.count(),
-        }
+        related_counts = instance.related_counts()
         
         # Логирование удаления
         logger.info(
@@ -87,7 +125,8 @@ class CarViewSet(CompanyScopedModelViewSet):
             f"(ID={instance.id}). Related records: {related_counts}"
         )
         
-        response = super().destroy(request, *args, **kwargs)
+        self.perform_destroy(instance)
+        response = Response(status=status.HTTP_204_NO_CONTENT)
         
         logger.info(
             f"Car {instance.numplate} (ID={instance.id}) successfully deleted "
@@ -96,25 +135,29 @@ class CarViewSet(CompanyScopedModelViewSet):
         
         return response
 
+    def perform_destroy(self, instance):
+        # Hidden right away; records and photos are purged in the background
+        soft_delete_car(instance)
+
     @action(detail=True, methods=['get'])
     def stats(self, request, pk=None):
         """Получить статистику связанных записей автомобиля"""
         instance = self.get_object()
-        
-        stats = {
-            'fuel_records': instance.fuel_records.count(),
-            'spares': instance.spares.count(),
-            'insurances': instance.insurances.count(),
-            'inspections': instance.inspections.count(),
-            'tires': instance.tires.count(),
-            'accumulators': instance.accumulators.count(),
-            'photos': instance.photos.count(),
-        }
-        stats['total'] = sum(stats.values())
-        
-        serializer = CarRelatedStatsSerializer(stats)
+        serializer = CarRelatedStatsSerializer(instance.related_counts())
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """История автомобиля: все записи одной лентой (?type=, ?from=, ?to=, ?cursor=)"""
+        # Not get_object(): the car list filters would consume ?type=
+        instance = get_object_or_404(self.get_queryset().only('id', 'company_id'), pk=pk)
+        self.check_object_permissions(request, instance)
+        items, next_cursor = get_car_timeline(car_id=instance.pk, **parse_timeline_params(request.query_params))
+        next_link = None
+        if next_cursor is not None:
+            next_link = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+        return Response({'results': items, 'next_cursor': next_cursor, 'next': next_link})
+
 
 class CarPhotoListCreateView(APIView):
     parser_classes = (MultiPartParser, FormParser)
@@ -148,7 +191,7 @@ class SpareViewSet(CompanyScopedModelViewSet):
         'car': ['exact'],
         'installed_at': ['exact', 'gte', 'lte'],
     }
-    search_fields = ['title', 'description', 'job_description']
+    search_fields = SEARCH_FIELDS[Spare]
     ordering_fields = ['id', 'installed_at', 'created_at']
     ordering = ['-installed_at', '-id']
 
@@ -287,6 +330,38 @@ class FuelViewSet(CompanyScopedModelViewSet):
             raise ValidationError({'car': 'Changing car is not allowed'})
         serializer.save()
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Массовая загрузка топлива: создание или обновление по (car, year, month).
+
+        Тело: список строк или {"rows": [...]}; ответ содержит результат по каждой строке.
+        """
+        rows = request.data.get('rows') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            raise ValidationError({'rows': 'Expected a non-empty list of rows'})
+        if len(rows) > FUEL_BULK_MAX_ROWS:
+            raise ValidationError({'rows': f'At most {FUEL_BULK_MAX_ROWS} rows per request'})
+
+        result = bulk_upsert_fuel(company_id=request.user.company_id, rows=rows)
+        return Response(result)
+
+    @action(detail=False, methods=['post'])
+    def transactions(self, request):
+        """
+        Прием транзакций топливных карт (дубли по txn_id пропускаются).
+
+        Тело: список транзакций или {"rows": [...]}; суммы добавляются к помесячным записям топлива.
+        """
+        rows = request.data.get('rows') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            raise ValidationError({'rows': 'Expected a non-empty list of rows'})
+        if len(rows) > FUEL_TXN_MAX_ROWS:
+            raise ValidationError({'rows': f'At most {FUEL_TXN_MAX_ROWS} rows per request'})
+
+        result = ingest_fuel_transactions(company_id=request.user.company_id, rows=rows)
+        return Response(result)
+
 
 class CarSpareListCreateView(APIView):
     def get(self, request, car_id: int):
@@ -311,7 +386,7 @@ class TiresViewSet(CompanyScopedModelViewSet):
         'installed_at': ['exact', 'gte', 'lte'],
         'expires_at': ['exact', 'gte', 'lte'],
     }
-    search_fields = ['model', 'size']
+    search_fields = SEARCH_FIELDS[Tires]
     ordering_fields = ['id', 'installed_at', 'expires_at', 'created_at']
     ordering = ['-installed_at', '-id']
 
@@ -366,7 +441,7 @@ class AccumulatorViewSet(CompanyScopedModelViewSet):
         'installed_at': ['exact', 'gte', 'lte'],
         'expires_at': ['exact', 'gte', 'lte'],
     }
-    search_fields = ['model', 'serial_number', 'capacity']
+    search_fields = SEARCH_FIELDS[Accumulator]
     ordering_fields = ['id', 'installed_at', 'expires_at', 'created_at']
     ordering = ['-installed_at', '-id']
 
@@ -412,3 +487,137 @@ class CarAccumulatorListCreateView(APIView):
         serializer.is_valid(raise_exception=True)
         serializer.save(car=car)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class FleetBatchView(APIView):
+    """
+    Пакетные изменения автопарка: POST /fleet/batch/.
+
+    Тело: {"operations": [{"op": "create"|"update"|"delete", "model": "cars", "id": 1, "data": {...}}]}.
+    Все операции применяются в одной транзакции или (при любой ошибке) ни одна;
+    ответ содержит результат по каждой операции.
+    """
+
+    def post(self, request):
+        IsCompanyAdminOrDispatcher().has_permission(request, self) or self.permission_denied(request)
+        operations = request.data.get('operations') if isinstance(request.data, dict) else request.data
+        if not isinstance(operations, list) or not operations:
+            raise ValidationError({'operations': 'Expected a non-empty list of operations'})
+        if len(operations) > BATCH_MAX_OPERATIONS:
+            raise ValidationError({'operations': f'At most {BATCH_MAX_OPERATIONS} operations per request'})
+
+        result = apply_batch(company_id=request.user.company_id, operations=operations)
+        return Response(result, status=status.HTTP_200_OK if result['applied'] else status.HTTP_400_BAD_REQUEST)
+
+
+class SyncView(APIView):
+    """
+    Дельта-синхронизация: GET /sync/?since=<token>.
+
+    Возвращает записи автопарка, измененные после токена, ID удаленных
+    записей и новый токен. Без токена — полный снимок (reset=true).
+    """
+
+    def get(self, request):
+        IsCompanyMember().has_permission(request, self) or self.permission_denied(request)
+        result = get_changes(
+            company_id=request.user.company_id,
+            since=request.query_params.get('since') or None,
+            context={'request': request},
+        )
+        return Response(result)
+
+
+class TelemetryPointsView(APIView):
+    """
+    Прием показаний трекеров: POST /telemetry/points/.
+
+    Тело: список показаний или {"points": [...]}; каждое — car или numplate,
+    ts, odometer (км) и необязательные lat, lon, speed (км/ч). Суточный и
+    месячный пробег пересчитываются сразу.
+    """
+
+    def post(self, request):
+        IsCompanyAdminOrDispatcher().has_permission(request, self) or self.permission_denied(request)
+        points = request.data.get('points') if isinstance(request.data, dict) else request.data
+        if not isinstance(points, list) or not points:
+            raise ValidationError({'points': 'Expected a non-empty list of points'})
+        if len(points) > TELEMETRY_MAX_POINTS:
+            raise ValidationError({'points': f'At most {TELEMETRY_MAX_POINTS} points per request'})
+
+        result = ingest_telemetry(company_id=request.user.company_id, points=points)
+        return Response(result)
+
+
+class TenantExportView(APIView):
+    """
+    Полная выгрузка автопарка компании: GET /export/tenant.ndjson.
+
+    Ответ потоковый, по строке NDJSON на запись. Сжимается gzip, если клиент
+    его принимает (или ?gzip=1 / ?gzip=0). Фильтры: ?models=, ?updated_since=,
+    ?<model>.<field>[__gte|__lte|__in]=.
+    """
+    renderer_classes = (StandardJSONRenderer, NDJSONRenderer)
+
+    def get(self, request):
+        IsCompanyAdmin().has_permission(request, self) or self.permission_denied(request)
+        filters = parse_export_filters(request.query_params)
+        gzip = accepts_gzip(request, request.query_params.get('gzip'))
+
+        company_id = request.user.company_id
+        response = StreamingHttpResponse(
+            stream_tenant_export(company_id=company_id, filters=filters, gzip=gzip),
+            content_type='application/x-ndjson; charset=utf-8',
+        )
+        filename = f'tenant-{company_id}-{timezone.localdate():%Y%m%d}.ndjson'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['Vary'] = 'Accept-Encoding'
+        if gzip:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
+
+class FleetImportView(APIView):
+    """
+    Импорт из CSV/XLSX: POST /import/<kind>/ с полем file (multipart).
+
+    kind: cars, spares, insurances, inspections. С dry_run=1 строки только
+    проверяются и возвращается предпросмотр.
+    """
+    parser_classes = (MultiPartParser, FormParser)
+
+    def post(self, request, kind: str):
+        IsCompanyAdminOrDispatcher().has_permission(request, self) or self.permission_denied(request)
+        if kind not in IMPORT_SPECS:
+            raise ValidationError({'kind': f"Expected one of: {', '.join(IMPORT_SPECS)}"})
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'This field is required'})
+
+        try:
+            result, token = run_import(
+                kind=kind,
+                company_id=request.user.company_id,
+                file=upload,
+                filename=upload.name,
+                dry_run=str(request.data.get('dry_run', '')).lower() in ('1', 'true'),
+            )
+        except DjangoValidationError as exc:
+            raise ValidationError(exc.message_dict)
+
+        if token is not None:
+            result['error_report'] = request.build_absolute_uri(
+                reverse('fleet-import-errors', kwargs={'token': token})
+            )
+        return Response(result)
+
+
+class FleetImportErrorReportView(APIView):
+    def get(self, request, token: str):
+        IsCompanyAdminOrDispatcher().has_permission(request, self) or self.permission_denied(request)
+        report = cache.get(error_report_key(request.user.company_id, token))
+        if report is None:
+            raise Http404
+        response = HttpResponse(report, content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="import_errors.csv"'
+        return response
@@ -0,0 +1,17 @@
+"""Rebuild CompanyMonthlyCost rollup from fleet records"""
+from django.core.management.base import BaseCommand
+
+from reports.rollups import rebuild_company_costs
+
+
+class Command(BaseCommand):
+    help = 'Rebuild monthly cost rollup (all companies or one with --company)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, default=None, help='Company ID to rebuild')
+
+    def handle(self, *args, **options):
+        company_id = options['company']
+        count = rebuild_company_costs(company_id=company_id)
+        scope = f'company {company_id}' if company_id else 'all companies'
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt cost rollup for {scope}: {count} rows'))
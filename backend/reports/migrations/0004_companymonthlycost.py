@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('fleet', '0008_auto_20260402_2340'),
+        ('reports', '0003_alter_savedreport_report_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyMonthlyCost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('category', models.CharField(choices=[('fuel', 'Fuel'), ('spare', 'Spare parts'), ('insurance', 'Insurance'), ('inspection', 'Inspection'), ('tires', 'Tires'), ('accumulator', 'Accumulator')], max_length=20)),
+                ('amount', models.BigIntegerField(default=0, help_text='Total cost for the month')),
+                ('liters', models.BigIntegerField(default=0, help_text='Fuel liters (fuel category only)')),
+                ('mileage', models.BigIntegerField(default=0, help_text='Mileage in km (fuel category only)')),
+                ('records_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_costs', to='fleet.car')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_costs', to='companies.company')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company', 'year', 'month', 'category'], name='reports_com_company_d73819_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='companymonthlycost',
+            constraint=models.UniqueConstraint(fields=('car', 'year', 'month', 'category'), name='uq_monthly_cost_car_period_category'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+# Same sources as reports.rollups.ROLLUP_SOURCES, on the historical models
+SOURCES = (
+    ('Fuel', 'fuel', None, F('total_cost')),
+    ('Spare', 'spare', 'installed_at', F('part_price') + F('job_price')),
+    ('Insurance', 'insurance', 'start_date', F('cost')),
+    ('Inspection', 'inspection', 'inspected_at', F('cost')),
+    ('Tires', 'tires', 'installed_at', F('price')),
+    ('Accumulator', 'accumulator', 'installed_at', F('price')),
+)
+BATCH_SIZE = 1000
+
+
+def backfill_company_monthly_cost(apps, schema_editor):
+    """Build the rollup for existing data, one company at a time (same as rebuild_cost_rollup)."""
+    Company = apps.get_model('companies', 'Company')
+    CompanyMonthlyCost = apps.get_model('reports', 'CompanyMonthlyCost')
+
+    for company_id in Company.objects.values_list('id', flat=True).iterator():
+        rows = []
+        for model_name, category, date_field, amount in SOURCES:
+            model = apps.get_model('fleet', model_name)
+            qs = model.objects.filter(car__company_id=company_id)
+            if date_field is None:
+                qs = qs.annotate(period_year=F('year'), period_month=F('month'))
+            else:
+                qs = qs.annotate(period_year=ExtractYear(date_field), period_month=ExtractMonth(date_field))
+            aggregates = {'amount_total': Sum(amount), 'records': Count('id')}
+            if category == 'fuel':
+                aggregates.update(liters_total=Sum('liters'), mileage_total=Sum('monthly_mileage'))
+            grouped = qs.order_by().values('car_id', 'period_year', 'period_month').annotate(**aggregates)
+            for row in grouped.iterator():
+                rows.append(CompanyMonthlyCost(
+                    company_id=company_id,
+                    car_id=row['car_id'],
+                    year=row['period_year'],
+                    month=row['period_month'],
+                    category=category,
+                    amount=row['amount_total'] or 0,
+                    liters=row.get('liters_total') or 0,
+                    mileage=row.get('mileage_total') or 0,
+                    records_count=row['records'],
+                ))
+        CompanyMonthlyCost.objects.filter(company_id=company_id).delete()
+        CompanyMonthlyCost.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0001_initial'),
+        ('fleet', '0008_auto_20260402_2340'),
+        ('reports', '0004_companymonthlycost'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_company_monthly_cost, migrations.RunPython.noop),
+    ]
@@ -141,3 +141,55 @@ class ExportLog(models.Model):
 
     def __str__(self):
         return f"{self.report_type} ({self.export_format}) - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+class CostCategory(models.TextChoices):
+    FUEL = 'fuel', 'Fuel'
+    SPARE = 'spare', 'Spare parts'
+    INSURANCE = 'insurance', 'Insurance'
+    INSPECTION = 'inspection', 'Inspection'
+    TIRES = 'tires', 'Tires'
+    ACCUMULATOR = 'accumulator', 'Accumulator'
+
+
+class CompanyMonthlyCost(models.Model):
+    """
+    Rollup of fleet costs per company, month and category.
+
+    Rows are split per car so that per-vehicle reports can read the rollup too;
+    company-wide charts sum over the (company, year, month) index range.
+    Maintained by signals in reports.signals, rebuilt by `rebuild_cost_rollup`.
+    """
+
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        related_name='monthly_costs'
+    )
+    car = models.ForeignKey(
+        'fleet.Car',
+        on_delete=models.CASCADE,
+        related_name='monthly_costs'
+    )
+    year = models.PositiveIntegerField()
+    month = models.PositiveSmallIntegerField()
+    category = models.CharField(max_length=20, choices=CostCategory.choices)
+    amount = models.BigIntegerField(default=0, help_text='Total cost for the month')
+    liters = models.BigIntegerField(default=0, help_text='Fuel liters (fuel category only)')
+    mileage = models.BigIntegerField(default=0, help_text='Mileage in km (fuel category only)')
+    records_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['car', 'year', 'month', 'category'],
+                name='uq_monthly_cost_car_period_category',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['company', 'year', 'month', 'category']),
+        ]
+
+    def __str__(self):
+        return f"{self.category} {self.year}-{self.month:02d} car_id={self.car_id}: {self.amount}"
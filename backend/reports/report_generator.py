@@ -7,7 +7,10 @@ from collections import defaultdict
 
 from django.db.models import Sum, Avg, Count, Q
 from companies.models import Company
-from fleet.models import Car, Fuel, Insurance, Inspection, Spare
+from fleet.models import Car, Fuel, Insurance, Inspection, Spare, exclude_deleted_cars
+
+from .models import CostCategory
+from .rollups import get_range_costs
 
 
 class ReportGenerator:
@@ -76,11 +79,11 @@ class FuelConsumptionReportGenerator:
     @staticmethod
     def generate(from_date, to_date, company, car_ids, filters):
         # Base queryset
-        qs = Fuel.objects.filter(
-            car__company=company,
+        qs = exclude_deleted_cars(Fuel.objects.filter(
+            company=company,
             year__gte=from_date.year,
             year__lte=to_date.year
-        )
+        ), company.id)
 
         # Filter by cars if specified
         if car_ids:
@@ -418,7 +421,7 @@ class VehicleUtilizationReportGenerator:
     @staticmethod
     def generate(from_date, to_date, company, car_ids, filters):
         # Get fuel records for mileage data
-        qs = Fuel.objects.filter(car__company=company)
+        qs = exclude_deleted_cars(Fuel.objects.filter(company=company), company.id)
         if car_ids:
             qs = qs.filter(car_id__in=car_ids)
 
@@ -514,11 +517,6 @@ class CostAnalysisReportGenerator:
 
     @staticmethod
     def generate(from_date, to_date, company, car_ids, filters):
-        # Aggregate costs from different sources
-        from decimal import Decimal
-        from django.db.models import Sum
-        from datetime import date
-        
         # Handle string dates
         if isinstance(from_date, str):
             from_date = date.fromisoformat(from_date)
@@ -529,70 +527,32 @@ class CostAnalysisReportGenerator:
         if car_ids:
             qs_cars = qs_cars.filter(id__in=car_ids)
 
+        # Costs per car and category: rollup for whole months, source tables for edge days
+        costs = get_range_costs(
+            company_id=company.id,
+            start=from_date,
+            end=to_date,
+            categories=[CostCategory.FUEL, CostCategory.SPARE, CostCategory.INSURANCE, CostCategory.INSPECTION],
+            car_filters={'id__in': car_ids} if car_ids else None,
+        )
+
         data = []
-        for car in qs_cars:
-            try:
-                # Fuel costs - filter by date range
-                fuel_agg = Fuel.objects.filter(
-                    car=car,
-                    year__gte=from_date.year,
-                    year__lte=to_date.year
-                ).aggregate(total=Sum('total_cost'))
-                fuel_cost = float(fuel_agg['total']) if fuel_agg['total'] else 0.0
-
-                # Maintenance costs (spares) - filter by date range
-                spare_agg = Spare.objects.filter(
-                    car=car,
-                    installed_at__gte=from_date,
-                    installed_at__lte=to_date
-                ).aggregate(
-                    part_total=Sum('part_price'),
-                    job_total=Sum('job_price')
-                )
-                spare_cost = float((spare_agg['part_total'] or 0) + (spare_agg['job_total'] or 0))
-
-                # Insurance costs - filter by date range (active during the period)
-                insurance_agg = Insurance.objects.filter(
-                    car=car,
-                    start_date__lte=to_date,
-                    end_date__gte=from_date
-                ).aggregate(total=Sum('cost'))
-                insurance_cost = float(insurance_agg['total']) if insurance_agg['total'] else 0.0
-
-                # Inspection costs - filter by date range
-                # Inspection is valid for 1 year from inspected_at
-                inspection_agg = Inspection.objects.filter(
-                    car=car,
-                    inspected_at__lte=to_date
-                ).aggregate(total=Sum('cost'))
-                inspection_cost = float(inspection_agg['total']) if inspection_agg['total'] else 0.0
-
-                total = fuel_cost + spare_cost + insurance_cost + inspection_cost
+        for car_id, numplate in qs_cars.values_list('id', 'numplate'):
+            car_costs = costs.get(car_id, {})
+            fuel_cost = float(car_costs.get(CostCategory.FUEL, 0))
+            spare_cost = float(car_costs.get(CostCategory.SPARE, 0))
+            insurance_cost = float(car_costs.get(CostCategory.INSURANCE, 0))
+            inspection_cost = float(car_costs.get(CostCategory.INSPECTION, 0))
 
-                data.append({
-                    'car_id': car.id,
-                    'car_numplate': car.numplate,
-                    'fuel_cost': fuel_cost,
-                    'maintenance_cost': spare_cost,
-                    'insurance_cost': insurance_cost,
-                    'inspection_cost': inspection_cost,
-                    'total_cost': total,
-                })
-            except Exception as e:
-                # Log error but continue with other cars
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"Error processing car {car.id}: {e}")
-                # Still add the car with 0 costs
-                data.append({
-                    'car_id': car.id,
-                    'car_numplate': car.numplate,
-                    'fuel_cost': 0.0,
-                    'maintenance_cost': 0.0,
-                    'insurance_cost': 0.0,
-                    'inspection_cost': 0.0,
-                    'total_cost': 0.0,
-                })
+            data.append({
+                'car_id': car_id,
+                'car_numplate': numplate,
+                'fuel_cost': fuel_cost,
+                'maintenance_cost': spare_cost,
+                'insurance_cost': insurance_cost,
+                'inspection_cost': inspection_cost,
+                'total_cost': fuel_cost + spare_cost + insurance_cost + inspection_cost,
+            })
 
         summary = {
             'total_vehicles': len(data),
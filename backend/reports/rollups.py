@@ -0,0 +1,324 @@
+"""
+Помесячная сводка затрат (CompanyMonthlyCost).
+
+Каждая ячейка (машина, год, месяц, категория) пересчитывается из исходной
+таблицы одним агрегатом по индексу (car, <дата>), поэтому обновление
+идемпотентно и не зависит от порядка сигналов.
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from fleet.models import Accumulator, Fuel, Inspection, Insurance, Spare, Tires, exclude_deleted_cars
+
+from .models import CompanyMonthlyCost, CostCategory
+
+# model -> (category, date field or None for Fuel year/month, amount expression)
+ROLLUP_SOURCES = {
+    Fuel: (CostCategory.FUEL, None, F('total_cost')),
+    Spare: (CostCategory.SPARE, 'installed_at', F('part_price') + F('job_price')),
+    Insurance: (CostCategory.INSURANCE, 'start_date', F('cost')),
+    Inspection: (CostCategory.INSPECTION, 'inspected_at', F('cost')),
+    Tires: (CostCategory.TIRES, 'installed_at', F('price')),
+    Accumulator: (CostCategory.ACCUMULATOR, 'installed_at', F('price')),
+}
+
+Period = Tuple[int, int]
+
+
+def _month_bounds(year: int, month: int) -> Tuple[date, date]:
+    if month == 12:
+        return date(year, month, 1), date(year + 1, 1, 1)
+    return date(year, month, 1), date(year, month + 1, 1)
+
+
+def _aggregates(model) -> dict:
+    _, _, amount = ROLLUP_SOURCES[model]
+    aggregates = {
+        'amount_total': Sum(amount),
+        'records': Count('id'),
+    }
+    if model is Fuel:
+        aggregates['liters_total'] = Sum('liters')
+        aggregates['mileage_total'] = Sum('monthly_mileage')
+    return aggregates
+
+
+def get_period(instance) -> Optional[Period]:
+    """Return (year, month) bucket of a fleet record."""
+    _, date_field, _ = ROLLUP_SOURCES[type(instance)]
+    if date_field is None:
+        if not instance.year or not instance.month:
+            return None
+        return int(instance.year), int(instance.month)
+    value = getattr(instance, date_field)
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.year, value.month
+
+
+def refresh_cell(model, car_id: int, year: int, month: int) -> None:
+    """Recompute one rollup row from the source table."""
+    category, date_field, _ = ROLLUP_SOURCES[model]
+
+    qs = model.objects.filter(car_id=car_id)
+    if date_field is None:
+        qs = qs.filter(year=year, month=month)
+    else:
+        start, end = _month_bounds(year, month)
+        qs = qs.filter(**{f'{date_field}__gte': start, f'{date_field}__lt': end})
+
+    totals = qs.aggregate(owner_company_id=Max('company_id'), **_aggregates(model))
+    lookup = {'car_id': car_id, 'year': year, 'month': month, 'category': category}
+
+    if not totals['records']:
+        CompanyMonthlyCost.objects.filter(**lookup).delete()
+        return
+
+    CompanyMonthlyCost.objects.update_or_create(
+        **lookup,
+        defaults={
+            'company_id': totals['owner_company_id'],
+            'amount': totals['amount_total'] or 0,
+            'liters': totals.get('liters_total') or 0,
+            'mileage': totals.get('mileage_total') or 0,
+            'records_count': totals['records'],
+        },
+    )
+
+
+def _annotate_period(qs, date_field):
+    if date_field is None:
+        return qs.annotate(period_year=F('year'), period_month=F('month'))
+    return qs.annotate(period_year=ExtractYear(date_field), period_month=ExtractMonth(date_field))
+
+
+def _grouped_rows(model, qs) -> List[CompanyMonthlyCost]:
+    """Rollup rows for ``qs`` grouped by car and month (one query)."""
+    category, date_field, _ = ROLLUP_SOURCES[model]
+    grouped = (
+        _annotate_period(qs, date_field)
+        .order_by()
+        .values('car_id', 'company_id', 'period_year', 'period_month')
+        .annotate(**_aggregates(model))
+    )
+    return [
+        CompanyMonthlyCost(
+            company_id=row['company_id'],
+            car_id=row['car_id'],
+            year=row['period_year'],
+            month=row['period_month'],
+            category=category,
+            amount=row['amount_total'] or 0,
+            liters=row.get('liters_total') or 0,
+            mileage=row.get('mileage_total') or 0,
+            records_count=row['records'],
+        )
+        for row in grouped
+    ]
+
+
+def refresh_cells(model, cells: Iterable[Tuple[int, int, int]]) -> None:
+    """
+    Recompute many rollup rows (car_id, year, month) of one model set-based.
+
+    Used after bulk writes that bypass post_save: one grouped aggregate, one
+    upsert and one delete instead of refresh_cell() per record.
+    """
+    cells = set(cells)
+    if not cells:
+        return
+    category, date_field, _ = ROLLUP_SOURCES[model]
+    periods = {(year, month) for _, year, month in cells}
+
+    qs = model.objects.filter(car_id__in={car_id for car_id, _, _ in cells})
+    if date_field is None:
+        period_q = Q()
+        for year, month in periods:
+            period_q |= Q(year=year, month=month)
+        qs = qs.filter(period_q)
+    else:
+        start, _ = _month_bounds(*min(periods))
+        _, end = _month_bounds(*max(periods))
+        qs = qs.filter(**{f'{date_field}__gte': start, f'{date_field}__lt': end})
+
+    rows = [row for row in _grouped_rows(model, qs) if (row.car_id, row.year, row.month) in cells]
+    missing = cells - {(row.car_id, row.year, row.month) for row in rows}
+
+    with transaction.atomic():
+        CompanyMonthlyCost.objects.bulk_create(
+            rows,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['car', 'year', 'month', 'category'],
+            update_fields=['company', 'amount', 'liters', 'mileage', 'records_count', 'updated_at'],
+        )
+        if missing:
+            missing_q = Q()
+            for car_id, year, month in missing:
+                missing_q |= Q(car_id=car_id, year=year, month=month)
+            CompanyMonthlyCost.objects.filter(missing_q, category=category).delete()
+
+
+def rebuild_company_costs(company_id: Optional[int] = None) -> int:
+    """
+    Rebuild the rollup from scratch (for one company or for all of them).
+
+    Returns number of rows written.
+    """
+    rows: List[CompanyMonthlyCost] = []
+    for model in ROLLUP_SOURCES:
+        qs = model.objects.all()
+        if company_id is not None:
+            qs = qs.filter(company_id=company_id)
+        rows.extend(_grouped_rows(model, qs))
+
+    with transaction.atomic():
+        existing = CompanyMonthlyCost.objects.all()
+        if company_id is not None:
+            existing = existing.filter(company_id=company_id)
+        existing.delete()
+        CompanyMonthlyCost.objects.bulk_create(rows, batch_size=1000)
+
+    return len(rows)
+
+
+def period_range_q(start: Optional[Period], end: Optional[Period]) -> Q:
+    """Q for rollup rows with start <= (year, month) <= end (bounds are optional)."""
+    q = Q()
+    if start is not None:
+        start_year, start_month = start
+        q &= Q(year__gt=start_year) | Q(year=start_year, month__gte=start_month)
+    if end is not None:
+        end_year, end_month = end
+        q &= Q(year__lt=end_year) | Q(year=end_year, month__lte=end_month)
+    return q
+
+
+def _next_period(year: int, month: int) -> Period:
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _previous_period(year: int, month: int) -> Period:
+    return (year - 1, 12) if month == 1 else (year, month - 1)
+
+
+def _split_range(start: Optional[date], end: Optional[date]):
+    """
+    Split [start, end] into whole months (rollup bounds, None = open) and the
+    partial edge months as day ranges.
+    """
+    first = None
+    if start is not None:
+        first = (start.year, start.month) if start.day == 1 else _next_period(start.year, start.month)
+    last = None
+    if end is not None:
+        month_end = (end + timedelta(days=1)).day == 1
+        last = (end.year, end.month) if month_end else _previous_period(end.year, end.month)
+
+    if first is not None and last is not None and first > last:
+        return None, [(start, end)]
+    days = []
+    if start is not None and start.day != 1:
+        days.append((start, _month_bounds(start.year, start.month)[1] - timedelta(days=1)))
+    if end is not None and (end.year, end.month) != last:
+        days.append((date(end.year, end.month, 1), end))
+    return (first, last), days
+
+
+def get_range_costs(
+    *,
+    company_id: int,
+    start: Optional[date],
+    end: Optional[date],
+    categories: Iterable[str],
+    car_filters: Optional[dict] = None,
+) -> Dict[int, Dict[str, int]]:
+    """
+    Cost totals per car and category between two dates (inclusive).
+
+    Whole months are read from the rollup; the partial months at the edges
+    are summed from the source tables by day, so the bounds stay exact.
+    Fuel is recorded per month: every month the range touches counts.
+    Returns {car_id: {category: amount, ..., 'fuel_mileage': km}}.
+    """
+    categories = set(categories)
+    car_lookups = {f'car__{lookup}': value for lookup, value in (car_filters or {}).items()}
+    months, days = _split_range(start, end)
+
+    rollup_q = Q()
+    if CostCategory.FUEL in categories:
+        rollup_q |= Q(category=CostCategory.FUEL) & period_range_q(
+            start and (start.year, start.month), end and (end.year, end.month),
+        )
+    if months is not None:
+        rollup_q |= Q(category__in=categories - {CostCategory.FUEL}) & period_range_q(*months)
+
+    totals: Dict[int, Dict[str, int]] = {}
+    if rollup_q:
+        rollup = CompanyMonthlyCost.objects.filter(rollup_q, company_id=company_id, **car_lookups)
+        rows = (
+            exclude_deleted_cars(rollup, company_id)
+            .values('car_id', 'category')
+            .annotate(amount_total=Sum('amount'), mileage_total=Sum('mileage'))
+            .order_by()
+        )
+        for row in rows:
+            car_totals = totals.setdefault(row['car_id'], {})
+            car_totals[row['category']] = row['amount_total'] or 0
+            if row['category'] == CostCategory.FUEL:
+                car_totals['fuel_mileage'] = row['mileage_total'] or 0
+
+    for model, (category, date_field, amount) in ROLLUP_SOURCES.items():
+        if date_field is None or category not in categories or not days:
+            continue
+        days_q = Q()
+        for first_day, last_day in days:
+            days_q |= Q(**{f'{date_field}__gte': first_day, f'{date_field}__lte': last_day})
+        records = model.objects.filter(days_q, company_id=company_id, **car_lookups)
+        rows = (
+            exclude_deleted_cars(records, company_id)
+            .values('car_id')
+            .annotate(amount_total=Sum(amount))
+            .order_by()
+        )
+        for row in rows:
+            car_totals = totals.setdefault(row['car_id'], {})
+            car_totals[category] = car_totals.get(category, 0) + (row['amount_total'] or 0)
+    return totals
+
+
+def get_monthly_totals(company_id: int, periods: Iterable[Period]) -> Dict[Period, dict]:
+    """
+    Company totals per month and category for the given periods.
+
+    Returns {(year, month): {category: amount, ..., 'fuel_liters': liters}}.
+    """
+    periods = list(periods)
+    if not periods:
+        return {}
+
+    rows = (
+        exclude_deleted_cars(CompanyMonthlyCost.objects.filter(company_id=company_id), company_id)
+        .filter(period_range_q(min(periods), max(periods)))
+        .values('year', 'month', 'category')
+        .annotate(amount_total=Sum('amount'), liters_total=Sum('liters'))
+        .order_by()
+    )
+
+    totals: Dict[Period, dict] = {period: {} for period in periods}
+    for row in rows:
+        bucket = totals.get((row['year'], row['month']))
+        if bucket is None:
+            continue
+        bucket[row['category']] = row['amount_total'] or 0
+        if row['category'] == CostCategory.FUEL:
+            bucket['fuel_liters'] = row['liters_total'] or 0
+    return totals
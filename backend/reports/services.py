@@ -5,7 +5,7 @@ from typing import Any, Dict, List, Optional, TypedDict
 from django.db.models import F, IntegerField, Sum
 from django.db.models.functions import Coalesce
 
-from fleet.models import Spare
+from fleet.models import Spare, exclude_deleted_cars
 
 
 class MaintenanceCostsFilters(TypedDict, total=False):
@@ -35,7 +35,7 @@ class MaintenanceCostsReport(TypedDict):
 
 
 def get_maintenance_costs_report(*, company_id: int, from_date: str | None, to_date: str | None, car_id: int | None) -> MaintenanceCostsReport:
-    qs = Spare.objects.filter(car__company_id=company_id)
+    qs = exclude_deleted_cars(Spare.objects.filter(company_id=company_id), company_id)
 
     if from_date:
         qs = qs.filter(installed_at__gte=from_date)
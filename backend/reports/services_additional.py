@@ -10,7 +10,7 @@ from django.db.models import Sum, Count, Q
 from django.db.models.functions import Coalesce
 from django.utils import timezone
 
-from fleet.models import Fuel, Insurance, Inspection
+from fleet.models import Fuel, Insurance, Inspection, exclude_deleted_cars
 
 
 # --- Fuel Report Types ---
@@ -43,7 +43,7 @@ def get_fuel_consumption_report(
         to_date: Дата окончания периода (YYYY-MM-DD)
         car_id: ID машины (опционально)
     """
-    qs = Fuel.objects.filter(car__company_id=company_id)
+    qs = exclude_deleted_cars(Fuel.objects.filter(company_id=company_id), company_id)
 
     # Фильтрация по датам (используем year и month для фильтрации)
     if from_date:
@@ -124,7 +124,7 @@ class InsuranceInspectionReport(TypedDict):
 
 
 def get_insurance_inspection_report(
-    *, company_id: int, status_filter: str | None = None, car_id: int | None = None
+    *, company_id: int, status_filter: str | None = None, car_id: int | None = None, today: date | None = None
 ) -> InsuranceInspectionReport:
     """
     Отчет по страховкам и техосмотрам.
@@ -133,34 +133,47 @@ def get_insurance_inspection_report(
         company_id: ID компании
         status_filter: Фильтр по статусу ('active', 'expiring_soon', 'expired')
         car_id: ID машины (опционально)
+        today: Дата, от которой считаются статусы (по умолчанию сегодня)
     """
-    today = timezone.now().date()
+    today = today or timezone.localdate()
     expiring_threshold = today + timedelta(days=30)  # Скоро истекает = в течение 30 дней
 
+    # Статус определяется диапазоном даты окончания, поэтому фильтр
+    # выполняется в БД по индексам (car, end_date) и (car, valid_until)
+    status_ranges = {
+        'expired': lambda field: Q(**{f'{field}__lt': today}),
+        'expiring_soon': lambda field: Q(**{f'{field}__gte': today, f'{field}__lte': expiring_threshold}),
+        'active': lambda field: Q(**{f'{field}__gt': expiring_threshold}),
+    }
+
+    def _status(end_date):
+        if end_date < today:
+            return 'expired'
+        if end_date <= expiring_threshold:
+            return 'expiring_soon'
+        return 'active'
+
     # Страховки
-    insurance_qs = Insurance.objects.filter(car__company_id=company_id)
+    insurance_qs = exclude_deleted_cars(Insurance.objects.filter(company_id=company_id), company_id)
     if car_id:
         insurance_qs = insurance_qs.filter(car_id=car_id)
 
     # Техосмотры
-    inspection_qs = Inspection.objects.filter(car__company_id=company_id)
+    inspection_qs = exclude_deleted_cars(Inspection.objects.filter(company_id=company_id), company_id)
     if car_id:
         inspection_qs = inspection_qs.filter(car_id=car_id)
 
+    if status_filter in status_ranges:
+        insurance_qs = insurance_qs.filter(status_ranges[status_filter]('end_date'))
+        inspection_qs = inspection_qs.filter(status_ranges[status_filter]('valid_until'))
+    elif status_filter:
+        insurance_qs = insurance_qs.none()
+        inspection_qs = inspection_qs.none()
+
     items = []
     
     # Обработка страховок
     for ins in insurance_qs.select_related('car'):
-        if ins.end_date < today:
-            status = 'expired'
-        elif ins.end_date <= expiring_threshold:
-            status = 'expiring_soon'
-        else:
-            status = 'active'
-
-        if status_filter and status != status_filter:
-            continue
-
         items.append({
             'type': 'insurance',
             'car_id': ins.car_id,
@@ -169,33 +182,20 @@ def get_insurance_inspection_report(
             'start_date': str(ins.start_date) if ins.start_date else None,
             'end_date': str(ins.end_date),
             'cost': ins.cost,
-            'status': status,
+            'status': _status(ins.end_date),
         })
 
-    # Обработка техосмотров (предполагаем, что inspected_at - это дата окончания действия)
+    # Обработка техосмотров (действуют до valid_until)
     for insp in inspection_qs.select_related('car'):
-        # Техосмотр действует 1 год от даты проведения
-        end_date = insp.inspected_at + timedelta(days=365)
-        
-        if end_date < today:
-            status = 'expired'
-        elif end_date <= expiring_threshold:
-            status = 'expiring_soon'
-        else:
-            status = 'active'
-
-        if status_filter and status != status_filter:
-            continue
-
         items.append({
             'type': 'inspection',
             'car_id': insp.car_id,
             'car__numplate': insp.car.numplate,
             'number': insp.number,
             'start_date': str(insp.inspected_at),
-            'end_date': str(end_date),
+            'end_date': str(insp.valid_until),
             'cost': insp.cost,
-            'status': status,
+            'status': _status(insp.valid_until),
         })
 
     # Сортировка по дате окончания
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+import calendar
+from datetime import date
 from typing import Any, Dict, List, Optional, TypedDict
-from datetime import datetime, timedelta
-from django.db.models import F, IntegerField, Sum, FloatField, Q
-from django.db.models.functions import Coalesce
 
-from fleet.models import Fuel, Spare, Insurance, Inspection
+from fleet.models import Car
+
+from .models import CostCategory
+from .rollups import get_range_costs
 
 
 class CostPerKmFilters(TypedDict, total=False):
@@ -45,6 +47,21 @@ class CostPerKmReport(TypedDict):
     by_vehicle: List[CostPerKmVehicleRow]
 
 
+def _parse_bound(value: str | None, *, end: bool = False) -> Optional[date]:
+    """'YYYY[-MM[-DD]]' -> date (the last day of the year/month for an end bound)."""
+    if not value:
+        return None
+    if len(value) >= 10:
+        return date.fromisoformat(value[:10])
+    year = int(value[:4])
+    if len(value) < 7:
+        return date(year, 12, 31) if end else date(year, 1, 1)
+    month = int(value[5:7])
+    if not end:
+        return date(year, month, 1)
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+
 def get_cost_per_km_report(
     *,
     company_id: int,
@@ -61,88 +78,50 @@ def get_cost_per_km_report(
     divided by total distance traveled for each vehicle.
     """
     
-    # Build base querysets filtered by company
-    fuel_qs = Fuel.objects.filter(car__company_id=company_id)
-    spare_qs = Spare.objects.filter(car__company_id=company_id)
-    insurance_qs = Insurance.objects.filter(car__company_id=company_id)
-    inspection_qs = Inspection.objects.filter(car__company_id=company_id)
-    
-    # Apply date filters
-    if start_date:
-        fuel_qs = fuel_qs.filter(year__gte=int(start_date[:4]), month__gte=int(start_date[5:7]) if len(start_date) >= 7 else 1)
-        spare_qs = spare_qs.filter(installed_at__gte=start_date)
-        insurance_qs = insurance_qs.filter(start_date__gte=start_date)
-        inspection_qs = inspection_qs.filter(inspected_at__gte=start_date)
-    
-    if end_date:
-        fuel_qs = fuel_qs.filter(year__lte=int(end_date[:4]), month__lte=int(end_date[5:7]) if len(end_date) >= 7 else 12)
-        spare_qs = spare_qs.filter(installed_at__lte=end_date)
-        insurance_qs = insurance_qs.filter(end_date__lte=end_date)
-        inspection_qs = inspection_qs.filter(inspected_at__lte=end_date)
-    
-    # Apply vehicle filters
+    # Costs and distance per vehicle: rollup for whole months, source tables for edge days
+    car_filters = {}
     if vehicle_ids:
-        fuel_qs = fuel_qs.filter(car_id__in=vehicle_ids)
-        spare_qs = spare_qs.filter(car_id__in=vehicle_ids)
-        insurance_qs = insurance_qs.filter(car_id__in=vehicle_ids)
-        inspection_qs = inspection_qs.filter(car_id__in=vehicle_ids)
-    
-    # Apply vehicle type filter
+        car_filters['id__in'] = vehicle_ids
     if vehicle_type:
-        fuel_qs = fuel_qs.filter(car__type=vehicle_type)
-        spare_qs = spare_qs.filter(car__type=vehicle_type)
-        insurance_qs = insurance_qs.filter(car__type=vehicle_type)
-        inspection_qs = inspection_qs.filter(car__type=vehicle_type)
-    
-    # Apply region filter
+        car_filters['type'] = vehicle_type
     if region:
-        fuel_qs = fuel_qs.filter(car__region=region)
-        spare_qs = spare_qs.filter(car__region=region)
-        insurance_qs = insurance_qs.filter(car__region=region)
-        inspection_qs = inspection_qs.filter(car__region=region)
+        car_filters['region'] = region
+    costs = get_range_costs(
+        company_id=company_id,
+        start=_parse_bound(start_date),
+        end=_parse_bound(end_date, end=True),
+        categories=[CostCategory.FUEL, CostCategory.SPARE, CostCategory.INSURANCE, CostCategory.INSPECTION],
+        car_filters=car_filters,
+    )
+    cars = Car.objects.filter(pk__in=list(costs)).values('id', 'numplate', 'brand', 'title')
     
-    # Get unique vehicle IDs from fuel records (has mileage data)
-    vehicle_ids_with_data = list(fuel_qs.values_list('car_id', flat=True).distinct())
+    vehicles: Dict[int, Dict[str, Any]] = {}
+    for car in cars:
+        car_costs = costs[car['id']]
+        vehicles[car['id']] = {
+            **car_costs,
+            'numplate': car['numplate'],
+            'brand': car['brand'],
+            'model': car['title'],
+            'distance': int(car_costs.get('fuel_mileage', 0)),
+            'has_fuel': CostCategory.FUEL in car_costs,
+        }
     
     # Calculate costs by vehicle
     by_vehicle = []
     total_cost_all = 0
     total_distance_all = 0
     
-    for car_id in vehicle_ids_with_data:
-        # Get car info
-        from fleet.models import Car
-        try:
-            car = Car.objects.get(id=car_id)
-        except Car.DoesNotExist:
+    for car_id, vehicle in vehicles.items():
+        # Only vehicles with fuel records have mileage data
+        if not vehicle['has_fuel']:
             continue
         
-        # Fuel costs and distance
-        fuel_data = fuel_qs.filter(car_id=car_id).aggregate(
-            fuel_cost=Coalesce(Sum('total_cost'), 0, output_field=IntegerField()),
-            distance=Coalesce(Sum('monthly_mileage'), 0, output_field=IntegerField()),
-        )
-        fuel_cost = int(fuel_data.get('fuel_cost') or 0)
-        distance = int(fuel_data.get('distance') or 0)
-        
-        # Maintenance costs
-        maintenance_data = spare_qs.filter(car_id=car_id).aggregate(
-            maintenance_cost=Coalesce(Sum('part_price'), 0, output_field=IntegerField()) 
-                          + Coalesce(Sum('job_price'), 0, output_field=IntegerField()),
-        )
-        maintenance_cost = int(maintenance_data.get('maintenance_cost') or 0)
-        
-        # Insurance costs (prorated by months in period)
-        insurance_data = insurance_qs.filter(car_id=car_id).aggregate(
-            insurance_cost=Coalesce(Sum('cost'), 0, output_field=IntegerField()),
-        )
-        insurance_cost = int(insurance_data.get('insurance_cost') or 0)
-        
-        # Inspection costs
-        inspection_data = inspection_qs.filter(car_id=car_id).aggregate(
-            inspection_cost=Coalesce(Sum('cost'), 0, output_field=IntegerField()),
-        )
-        inspection_cost = int(inspection_data.get('inspection_cost') or 0)
+        fuel_cost = vehicle.get(CostCategory.FUEL, 0)
+        maintenance_cost = vehicle.get(CostCategory.SPARE, 0)
+        insurance_cost = vehicle.get(CostCategory.INSURANCE, 0)
+        inspection_cost = vehicle.get(CostCategory.INSPECTION, 0)
+        distance = vehicle['distance']
         
         # Totals
         vehicle_total_cost = fuel_cost + maintenance_cost + insurance_cost + inspection_cost
@@ -156,9 +135,9 @@ def get_cost_per_km_report(
         
         by_vehicle.append({
             'vehicle_id': car_id,
-            'numplate': car.numplate,
-            'brand': car.brand,
-            'model': car.title,
+            'numplate': vehicle['numplate'],
+            'brand': vehicle['brand'],
+            'model': vehicle['model'],
             'fuel_cost': fuel_cost,
             'maintenance_cost': maintenance_cost,
             'insurance_cost': insurance_cost,
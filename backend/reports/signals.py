@@ -0,0 +1,48 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from fleet.signals import bulk_saved
+
+from .rollups import ROLLUP_SOURCES, get_period, refresh_cell, refresh_cells
+
+
+def _remember_previous_period(sender, instance, raw=False, **kwargs):
+    """Store the bucket the record belonged to before the update."""
+    instance._rollup_previous = None
+    if raw or instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._rollup_previous = (previous.car_id, get_period(previous))
+
+
+def _refresh_rollup(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    cells = {(instance.car_id, get_period(instance))}
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous is not None:
+        cells.add(previous)
+    for car_id, period in cells:
+        if car_id is not None and period is not None:
+            refresh_cell(sender, car_id, *period)
+
+
+def _refresh_rollup_bulk(sender, instances, previous=(), **kwargs):
+    if sender not in ROLLUP_SOURCES:
+        return
+    cells = set()
+    # Updated records may have left their previous month
+    for instance in [*instances, *previous]:
+        period = get_period(instance)
+        if period is not None:
+            cells.add((instance.car_id, *period))
+    refresh_cells(sender, cells)
+
+
+def connect_signals():
+    bulk_saved.connect(_refresh_rollup_bulk, dispatch_uid='reports_rollup_bulk_saved')
+    for model in ROLLUP_SOURCES:
+        uid = f'reports_rollup_{model.__name__}'
+        pre_save.connect(_remember_previous_period, sender=model, dispatch_uid=f'{uid}_pre_save')
+        post_save.connect(_refresh_rollup, sender=model, dispatch_uid=f'{uid}_post_save')
+        post_delete.connect(_refresh_rollup, sender=model, dispatch_uid=f'{uid}_post_delete')
@@ -1,3 +1,211 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from companies.models import Company
+from fleet.models import Car, Fuel, Inspection, Insurance, Spare
+from fleet.purge import soft_delete_car
+
+from .models import CompanyMonthlyCost, CostCategory
+from .report_generator import CostAnalysisReportGenerator, ReportGenerator
+from .rollups import get_monthly_totals, get_range_costs, rebuild_company_costs
+from .services_additional import get_insurance_inspection_report
+from .services_cost_per_km import get_cost_per_km_report
+
+
+class CompanyMonthlyCostRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        cls.car = Car.objects.create(
+            company=cls.company, region='Бишкек', brand='Toyota', title='Camry',
+            numplate='01KG001AAA', fueltype='Бензин', type='Легковой',
+        )
+
+    def _snapshot(self):
+        return sorted(
+            CompanyMonthlyCost.objects.values_list('car_id', 'year', 'month', 'category', 'amount', 'liters', 'mileage')
+        )
+
+    def test_signals_keep_rollup_in_sync(self):
+        Fuel.objects.create(car=self.car, year=2026, month=1, liters=50, total_cost=3000, monthly_mileage=500)
+        spare = Spare.objects.create(car=self.car, title='Filter', part_price=300, job_price=200, installed_at=date(2026, 1, 10))
+        Spare.objects.create(car=self.car, title='Oil', part_price=100, job_price=0, installed_at=date(2026, 1, 20))
+
+        totals = get_monthly_totals(self.company.id, [(2026, 1)])[(2026, 1)]
+        self.assertEqual(totals[CostCategory.FUEL], 3000)
+        self.assertEqual(totals[CostCategory.SPARE], 600)
+        self.assertEqual(totals['fuel_liters'], 50)
+
+        # Moving a record to another month updates both buckets
+        spare.installed_at = date(2026, 2, 1)
+        spare.save()
+        totals = get_monthly_totals(self.company.id, [(2026, 1), (2026, 2)])
+        self.assertEqual(totals[(2026, 1)][CostCategory.SPARE], 100)
+        self.assertEqual(totals[(2026, 2)][CostCategory.SPARE], 500)
+
+        spare.delete()
+        self.assertFalse(CompanyMonthlyCost.objects.filter(year=2026, month=2).exists())
+
+        incremental = self._snapshot()
+        rebuild_company_costs(company_id=self.company.id)
+        self.assertEqual(self._snapshot(), incremental)
+
+
+class CostRangeBoundsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        cls.car = Car.objects.create(
+            company=cls.company, region='Бишкек', brand='Toyota', title='Camry',
+            numplate='01KG001AAA', fueltype='Бензин', type='Легковой',
+        )
+        for day, price in ((date(2026, 1, 5), 1), (date(2026, 1, 20), 10), (date(2026, 2, 10), 100),
+                           (date(2026, 3, 5), 1000), (date(2026, 3, 25), 10000)):
+            Spare.objects.create(car=cls.car, title='Part', part_price=price, job_price=0, installed_at=day)
+        for month in (1, 2, 3, 4):
+            Fuel.objects.create(car=cls.car, year=2026, month=month, liters=10, total_cost=500, monthly_mileage=100)
+
+    def test_edge_months_are_filtered_by_day(self):
+        costs = get_range_costs(
+            company_id=self.company.id, start=date(2026, 1, 15), end=date(2026, 3, 10),
+            categories=[CostCategory.FUEL, CostCategory.SPARE],
+        )
+        self.assertEqual(costs[self.car.id], {CostCategory.SPARE: 1110, CostCategory.FUEL: 1500, 'fuel_mileage': 300})
+
+        # Both bounds inside one month
+        costs = get_range_costs(
+            company_id=self.company.id, start=date(2026, 3, 1), end=date(2026, 3, 10), categories=[CostCategory.SPARE],
+        )
+        self.assertEqual(costs[self.car.id], {CostCategory.SPARE: 1000})
+
+        # Whole months only come from the rollup
+        costs = get_range_costs(
+            company_id=self.company.id, start=date(2026, 1, 1), end=date(2026, 2, 28), categories=[CostCategory.SPARE],
+        )
+        self.assertEqual(costs[self.car.id], {CostCategory.SPARE: 111})
+
+    def test_reports_use_day_bounds(self):
+        report = CostAnalysisReportGenerator.generate('2026-01-15', '2026-03-10', self.company, None, {})
+        self.assertEqual(report['data'][0]['maintenance_cost'], 1110.0)
+        self.assertEqual(report['data'][0]['fuel_cost'], 1500.0)
+
+        report = get_cost_per_km_report(company_id=self.company.id, start_date='2026-01-15', end_date='2026-03-10')
+        row = report['by_vehicle'][0]
+        self.assertEqual((row['maintenance_cost'], row['fuel_cost'], row['total_distance']), (1110, 1500, 300))
+
+        report = get_cost_per_km_report(company_id=self.company.id, start_date='2026-03', end_date='2026-03')
+        row = report['by_vehicle'][0]
+        self.assertEqual((row['maintenance_cost'], row['total_distance']), (11000, 100))
+
+
+class InsuranceInspectionReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        car = Car.objects.create(
+            company=cls.company, region='Бишкек', brand='Toyota', title='Camry',
+            numplate='01KG001AAA', fueltype='Бензин', type='Легковой',
+        )
+        today = timezone.now().date()
+        Insurance.objects.create(car=car, number='I-1', start_date=today, end_date=today + timedelta(days=10), cost=100)
+        Insurance.objects.create(car=car, number='I-2', start_date=today, end_date=today + timedelta(days=200), cost=100)
+        cls.expired = Inspection.objects.create(car=car, number='T-1', inspected_at=today - timedelta(days=400), cost=50)
+        Inspection.objects.create(car=car, number='T-2', inspected_at=today - timedelta(days=350), cost=50)
+
+    def test_valid_until_is_stored(self):
+        self.assertEqual(self.expired.valid_until, self.expired.inspected_at + timedelta(days=365))
+
+    @override_settings(INSPECTION_VALIDITY_DAYS=730)
+    def test_valid_until_follows_update_fields(self):
+        self.expired.inspected_at = date(2026, 1, 1)
+        self.expired.save(update_fields=['inspected_at'])
+        self.expired.refresh_from_db()
+        self.assertEqual(self.expired.valid_until, date(2028, 1, 1))
+
+    def test_status_filter(self):
+        report = get_insurance_inspection_report(company_id=self.company.id, status_filter='expiring_soon')
+        self.assertEqual(sorted(item['number'] for item in report['items']), ['I-1', 'T-2'])
+        self.assertEqual(report['summary'], {'active': 0, 'expiring_soon': 2, 'expired': 0})
+
+        report = get_insurance_inspection_report(company_id=self.company.id)
+        self.assertEqual(report['summary'], {'active': 1, 'expiring_soon': 2, 'expired': 1})
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    SWR_REFRESH_WORKERS=0,
+)
+class ReportEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Test Fleet', slug='test-fleet')
+        cls.user = User.objects.create_user(username='u', password='p', company=cls.company, role='COMPANY_ADMIN')
+        cls.car = Car.objects.create(
+            company=cls.company, region='Бишкек', brand='Toyota', title='Camry',
+            numplate='01KG001AAA', fueltype='Бензин', type='Легковой',
+        )
+        cls.today = timezone.localdate()
+        Fuel.objects.create(car=cls.car, year=cls.today.year, month=cls.today.month, liters=10, total_cost=100, monthly_mileage=100)
+        Spare.objects.create(car=cls.car, title='Filter', part_price=5, job_price=5, installed_at=cls.today)
+        Insurance.objects.create(car=cls.car, number='I-1', start_date=cls.today, end_date=cls.today, cost=7)
+        Inspection.objects.create(car=cls.car, number='T-1', inspected_at=cls.today, cost=3)
+
+    def setUp(self):
+        # Cached widgets would outlive the rolled back data of the previous test
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _get(self, path):
+        response = self.client.get(f'/api/v1/{path}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def test_generator(self):
+        start = date(self.today.year, 1, 1)
+        [row] = ReportGenerator.generate('cost_analysis', start, self.today, self.company)['data']
+        self.assertEqual(
+            (row['fuel_cost'], row['maintenance_cost'], row['insurance_cost'], row['inspection_cost'], row['total_cost']),
+            (100, 10, 7, 3, 120),
+        )
+
+        [row] = ReportGenerator.generate('cost_per_km', start, self.today, self.company)['data']
+        self.assertEqual((row['total_cost'], row['total_distance'], row['cost_per_km']), (120, 100, 1.2))
+
+    def test_soft_deleted_car_is_not_counted(self):
+        soft_delete_car(self.car)
+        start = date(self.today.year, 1, 1)
+
+        self.assertEqual(ReportGenerator.generate('cost_analysis', start, self.today, self.company)['data'], [])
+        self.assertEqual(get_monthly_totals(self.company.id, [(self.today.year, self.today.month)]), {
+            (self.today.year, self.today.month): {},
+        })
+        self.assertEqual(self._get('maintenance-costs/')['totals']['total'], 0)
+        self.assertEqual(self._get('insurance-inspection/')['items'], [])
+        self.assertEqual(self._get('cost-per-km/')['by_vehicle'], [])
+
+    def test_maintenance_costs(self):
+        data = self._get('maintenance-costs/')
+        self.assertEqual(data['totals'], {'part_total': 5, 'job_total': 5, 'total': 10})
+
+    def test_insurance_inspection(self):
+        data = self._get('insurance-inspection/')
+        self.assertEqual(data['summary'], {'active': 1, 'expiring_soon': 1, 'expired': 0})
+
+        # Statuses move on at midnight without any data change
+        tomorrow = self.today + timedelta(days=1)
+        with patch('reports.views.timezone.localdate', return_value=tomorrow):
+            data = self._get('insurance-inspection/')
+        self.assertEqual(data['summary'], {'active': 1, 'expiring_soon': 0, 'expired': 1})
+
+    def test_cost_per_km(self):
+        data = self._get('cost-per-km/')
+        self.assertEqual(data['summary']['total_cost'], 120)
+        self.assertEqual(data['summary']['avg_cost_per_km'], 1.2)
+        self.assertEqual([row['vehicle_id'] for row in data['by_vehicle']], [self.car.id])
@@ -6,6 +6,9 @@ from rest_framework.decorators import action
 from rest_framework import serializers
 from datetime import datetime
 
+from django.utils import timezone
+
+from core.cache import stale_while_revalidate
 from core.permissions import IsCompanyStaff
 
 from .services import get_maintenance_costs_report
@@ -20,6 +23,12 @@ from .exporters import (
 )
 from .report_generator import ReportGenerator
 
+# Report data per company and filters, served stale while a single worker refreshes it
+_maintenance_costs_report = stale_while_revalidate('report_maintenance_costs')(get_maintenance_costs_report)
+_fuel_consumption_report = stale_while_revalidate('report_fuel_consumption')(get_fuel_consumption_report)
+_insurance_inspection_report = stale_while_revalidate('report_insurance_inspection')(get_insurance_inspection_report)
+_cost_per_km_report = stale_while_revalidate('report_cost_per_km')(get_cost_per_km_report)
+
 
 class ReportTypesView(APIView):
     """Get available report types"""
@@ -66,7 +75,7 @@ class MaintenanceCostsReportView(APIView):
         car_id = int(car_id_raw) if car_id_raw else None
         export_format = request.query_params.get('export')  # csv, xlsx, pdf, json
 
-        data = get_maintenance_costs_report(
+        data = _maintenance_costs_report(
             company_id=request.user.company_id,
             from_date=date_from,
             to_date=date_to,
@@ -152,7 +161,7 @@ class FuelConsumptionReportView(APIView):
         car_id = int(car_id_raw) if car_id_raw else None
         export_format = request.query_params.get('export')  # csv, xlsx, pdf, json
 
-        data = get_fuel_consumption_report(
+        data = _fuel_consumption_report(
             company_id=request.user.company_id,
             from_date=date_from,
             to_date=date_to,
@@ -235,10 +244,12 @@ class InsuranceInspectionReportView(APIView):
         car_id = int(car_id_raw) if car_id_raw else None
         export_format = request.query_params.get('export')  # csv, xlsx, pdf, json
 
-        data = get_insurance_inspection_report(
+        data = _insurance_inspection_report(
             company_id=request.user.company_id,
             status_filter=status_filter,
             car_id=car_id,
+            # Statuses change at midnight without a data change: the date is part of the cache key
+            today=timezone.localdate(),
         )
 
         if export_format in ['csv', 'xlsx', 'pdf', 'json']:
@@ -735,7 +746,7 @@ class CostPerKmReportView(APIView):
                 )
 
         # Generate report
-        data = get_cost_per_km_report(
+        data = _cost_per_km_report(
             company_id=request.user.company_id,
             start_date=start_date,
             end_date=end_date,